@@ -1,8 +1,10 @@
-import streamlit as st
-import yfinance as yf
-import pandas as pd
 import numpy as np
-import plotly.graph_objs as go
+import pandas as pd
+import streamlit as st
+
+from optsim.chains import get_expirations, get_option_chain as fetch_option_chain, get_underlying_price
+from optsim.monte_carlo import TerminalDistribution
+from optsim.simulate import SIMULATED_STRATEGIES, model_inputs, simulate
 
 st.set_page_config(page_title="期权策略模拟器", layout="wide")
 
@@ -13,14 +15,13 @@ symbol = st.text_input("请输入标的股票代码（如 AMD、AAPL、TSLA）:"
 
 # 拉取期权链数据函数
 def get_option_chain(ticker):
-    stock = yf.Ticker(ticker)
     try:
-        exps = stock.options
+        exps = get_expirations(ticker)
         if not exps:
             st.warning("未找到期权到期日")
             return None, None, None
         opt_date = st.selectbox("选择期权到期日:", exps)
-        opt_chain = stock.option_chain(opt_date)
+        opt_chain = fetch_option_chain(ticker, opt_date)
         return opt_chain.calls, opt_chain.puts, opt_date
     except Exception as e:
         st.error(f"获取期权链失败: {e}")
@@ -49,136 +50,46 @@ min_price = st.sidebar.number_input("模拟价格区间（最低）", value=90.0
 max_price = st.sidebar.number_input("模拟价格区间（最高）", value=140.0, step=0.5)
 step = st.sidebar.number_input("价格间隔", value=2.0, step=0.5)
 invest_limit = st.sidebar.number_input("最大投入金额 ($)：", value=500.0, step=10.0)
+top_k = int(st.sidebar.number_input("展示前 K 个策略", value=5, min_value=1, step=1))
+
+# 评分方式：解析 / 蒙特卡洛按到期价格的对数正态分布加权；均匀价格网格对每个价格等权
+score_mode = st.sidebar.radio("评分方式", ["解析期望（对数正态）", "蒙特卡洛（对数正态）", "均匀价格网格"])
+use_grid = score_mode == "均匀价格网格"
+use_mc = score_mode.startswith("蒙特卡洛")
+if not use_grid:
+    model_vol = st.sidebar.number_input("年化波动率（0 = 取平值隐含波动率）", value=0.0, min_value=0.0, step=0.05)
+if use_mc:
+    mc_paths = int(st.sidebar.number_input("模拟路径数", value=100_000, min_value=1_000, step=10_000))
+    mc_seed = int(st.sidebar.number_input("随机种子", value=42, step=1))
 
 if min_price >= max_price:
     st.sidebar.error("最低价格不能高于或等于最高价格")
     st.stop()
 
 # 策略类型选择
-strategy_type = st.sidebar.selectbox("选择策略类型", options=[
-    "Bull Call Spread",
-    "Sell Put",
-    "Sell Call",
-])
+strategy_type = st.sidebar.selectbox("选择策略类型", options=SIMULATED_STRATEGIES)
 
 # 用户持仓输入
 st.sidebar.header("持仓信息输入")
 current_position = st.sidebar.number_input("现有持仓股数（正多/负空）", value=0, step=100)
 position_cost = st.sidebar.number_input("持仓平均成本 ($/股)", value=0.0, step=0.1)
 
-# 策略模拟函数
-
-def simulate_bull_call_spreads(calls, price_range):
-    results = []
-    for i in range(len(calls)):
-        for j in range(i + 1, len(calls)):
-            buy = calls.iloc[i]
-            sell = calls.iloc[j]
-
-            debit = buy["ask"] - sell["bid"]
-            if np.isnan(debit) or debit <= 0 or debit > invest_limit:
-                continue
-
-            max_profit = sell["strike"] - buy["strike"] - debit
-            breakeven = buy["strike"] + debit
-
-            pnl = []
-            for price in price_range:
-                if price <= buy["strike"]:
-                    profit = -debit
-                elif price >= sell["strike"]:
-                    profit = max_profit
-                else:
-                    profit = price - buy["strike"] - debit
-                pnl.append(profit)
-
-            avg_return = np.mean([p / debit for p in pnl if debit != 0])
-            results.append({
-                "Buy Strike": buy["strike"],
-                "Sell Strike": sell["strike"],
-                "Cost": debit,
-                "Max Profit": max_profit,
-                "Breakeven": breakeven,
-                "Avg Return": avg_return,
-                "PnL": pnl
-            })
-    return sorted(results, key=lambda x: -x["Avg Return"])
-
-def simulate_sell_puts(puts, price_range):
-    results = []
-    for idx, put in puts.iterrows():
-        credit = put["bid"]
-        if np.isnan(credit) or credit <= 0 or credit > invest_limit:
-            continue
-
-        strike = put["strike"]
-        max_loss = strike - credit  # 理论最大亏损（假设标的跌至0）
-        breakeven = strike - credit
-
-        pnl = []
-        for price in price_range:
-            if price >= strike:
-                profit = credit
-            elif price <= 0:
-                profit = -max_loss
-            else:
-                profit = credit - (strike - price)
-            pnl.append(profit)
-
-        avg_return = np.mean([p / credit for p in pnl if credit != 0])
-        results.append({
-            "Strike": strike,
-            "Credit": credit,
-            "Max Loss": max_loss,
-            "Breakeven": breakeven,
-            "Avg Return": avg_return,
-            "PnL": pnl
-        })
-    return sorted(results, key=lambda x: -x["Avg Return"])
-
-def simulate_sell_calls(calls, price_range):
-    results = []
-    for idx, call in calls.iterrows():
-        credit = call["bid"]
-        if np.isnan(credit) or credit <= 0 or credit > invest_limit:
-            continue
-
-        strike = call["strike"]
-        max_loss = float('inf')  # 卖看涨理论亏损无上限
-        breakeven = strike + credit
-
-        pnl = []
-        for price in price_range:
-            if price <= strike:
-                profit = credit
-            else:
-                profit = credit - (price - strike)
-            pnl.append(profit)
-
-        avg_return = np.mean([p / credit for p in pnl if credit != 0])
-        results.append({
-            "Strike": strike,
-            "Credit": credit,
-            "Max Loss": max_loss,
-            "Breakeven": breakeven,
-            "Avg Return": avg_return,
-            "PnL": pnl
-        })
-    return sorted(results, key=lambda x: -x["Avg Return"])
-
 # 主程序模拟执行
 if st.button("▶️ 开始模拟"):
     prices = np.arange(min_price, max_price + step, step)
 
-    if strategy_type == "Bull Call Spread":
-        strategies = simulate_bull_call_spreads(calls, prices)
-    elif strategy_type == "Sell Put":
-        strategies = simulate_sell_puts(puts, prices)
-    elif strategy_type == "Sell Call":
-        strategies = simulate_sell_calls(calls, prices)
-    else:
-        st.error("未知策略")
-        st.stop()
+    model = None
+    if not use_grid:
+        model_spot, model_sigma, model_days = model_inputs(get_underlying_price(symbol), selected_exp, calls, puts, model_vol)
+        if use_mc:
+            model = TerminalDistribution.lognormal(model_spot, model_sigma, model_days, mc_paths, seed=mc_seed)
+            st.caption(f"蒙特卡洛：现价 ${model_spot:.2f}，波动率 {model_sigma:.1%}，剩余 {model_days} 天，{len(model):,} 条路径")
+        else:
+            model = (model_spot, model_sigma, model_days)
+            st.caption(f"解析期望：现价 ${model_spot:.2f}，波动率 {model_sigma:.1%}，剩余 {model_days} 天")
+
+    # 计算全部在 optsim.simulate 中完成，这里只负责展示
+    strategies = simulate(strategy_type, calls, puts, prices, top_k, model, invest_limit)
 
     if not strategies:
         st.warning("未找到合适的策略组合。")
@@ -203,7 +114,13 @@ if st.button("▶️ 开始模拟"):
         else:
             st.markdown(f"**最大亏损：** ${best['Max Loss']:.2f}")
 
-    st.markdown(f"**平均收益率：** {best['Avg Return']*100:.2f}%")
+    if use_mc:
+        st.markdown(f"**期望收益率：** {best['Avg Return']*100:.2f}%，盈利概率：{best['Win Prob']:.1%}，"
+                    f"最差 5% 平均盈亏：${best['Tail Loss']:.2f}")
+    elif not use_grid:
+        st.markdown(f"**期望收益率：** {best['Avg Return']*100:.2f}%，盈利概率：{best['Win Prob']:.1%}")
+    else:
+        st.markdown(f"**平均收益率：** {best['Avg Return']*100:.2f}%")
 
     # 持仓盈亏估算
     if current_position != 0:
@@ -212,7 +129,9 @@ if st.button("▶️ 开始模拟"):
         st.markdown(f"**当前持仓：** {current_position} 股，成本 ${position_cost:.2f}，假设当前价格 ${current_price:.2f}")
         st.markdown(f"**持仓盈亏估计：** ${pos_pnl:.2f}")
 
-    # 盈亏图
+    # 盈亏图（plotly 只在这里用到，点了模拟才导入）
+    import plotly.graph_objs as go
+
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=prices, y=best["PnL"], mode='lines+markers', name='策略PnL'))
     fig.update_layout(title="策略盈亏图（模拟价格 vs 收益）",
@@ -221,10 +140,11 @@ if st.button("▶️ 开始模拟"):
                       template="plotly_white")
     st.plotly_chart(fig, use_container_width=True)
 
-    # 前5策略展示
-    st.subheader("📋 收益率前5策略")
-    top5 = pd.DataFrame(strategies[:5])
+    # 前 K 策略展示
+    st.subheader(f"📋 收益率前{top_k}策略")
+    top_df = pd.DataFrame(strategies)
+    model_cols = [] if use_grid else ["Expected PnL", "Win Prob"] + (["Tail Loss"] if use_mc else [])
     if strategy_type == "Bull Call Spread":
-        st.dataframe(top5[["Buy Strike", "Sell Strike", "Cost", "Max Profit", "Breakeven", "Avg Return"]].round(2))
+        st.dataframe(top_df[["Buy Strike", "Sell Strike", "Cost", "Max Profit", "Breakeven", "Avg Return"] + model_cols].round(2))
     else:
-        st.dataframe(top5[["Strike", "Credit", "Max Loss", "Breakeven", "Avg Return"]].round(2))
+        st.dataframe(top_df[["Strike", "Credit", "Max Loss", "Breakeven", "Avg Return"] + model_cols].round(2))
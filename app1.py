@@ -1,19 +1,44 @@
-import streamlit as st
-import yfinance as yf
+import time
+from datetime import date
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import streamlit as st
+
+from optsim.chains import default_cache, get_expirations, get_option_chain, get_underlying_price
+from optsim.greeks import GREEKS, chain_greeks, legs_greeks
+from optsim.implied_vol import repair_implied_vol
+from optsim.payoffs import Leg, compile_strategies, payoff_extremes, payoff_values, strategy_legs
+from optsim.plotting import pyplot
+from optsim.portfolio import PortfolioCurves, entry_key
+from optsim.pricing import chain_vols, legs_pnl, pack_legs
+from optsim.quotes import QuoteIndex
+from optsim.rerun import latency_log
+from optsim.shared import shared_cache
 
 st.set_page_config(page_title="Options Strategy Simulator", layout="wide")
 
 st.title("🧠 Options Strategy Simulator")
 
+run_started = time.perf_counter()
+latency = latency_log(st.session_state)
+
 # 初始化策略和持仓
 if "strategies" not in st.session_state:
     st.session_state.strategies = []
 if "positions" not in st.session_state:
     st.session_state.positions = []
 
+MAX_PLOTTED_CURVES = 20
+
+
+def portfolio_curves(name, spot_range):
+    # 每个会话一份曲线缓存；价格网格（随现价输入）变化时整体重建
+    curves = st.session_state.get(name)
+    if curves is None or not curves.matches(spot_range):
+        curves = st.session_state[name] = PortfolioCurves(spot_range)
+    return curves
+
 # ------------- 左侧：标的输入 + 期权链获取 + 策略参数 -------------
 with st.sidebar:
     st.header("Underlying & Option Chain Configuration")
@@ -23,11 +48,9 @@ with st.sidebar:
 
     # 获取期权到期日
     expirations = []
-    ticker = None
     if symbol:
         try:
-            ticker = yf.Ticker(symbol)
-            expirations = ticker.options
+            expirations = get_expirations(symbol)
         except Exception as e:
             st.error(f"Error fetching option expirations: {e}")
 
@@ -37,11 +60,6 @@ with st.sidebar:
     else:
         st.info("No expirations found or enter valid symbol")
 
-    st.markdown("---")
-    st.subheader("Filter Option Strike Price Range")
-    min_price = st.number_input("Min strike price", value=100.0)
-    max_price = st.number_input("Max strike price", value=200.0)
-
     st.markdown("---")
     st.header("Strategy & Position Configuration")
 
@@ -72,87 +90,136 @@ with st.sidebar:
         })
 
     st.divider()
-    st.subheader("Add Existing Stock Position")
-    cost_basis = st.number_input("Stock cost basis ($)", value=165.0)
-    shares = st.number_input("Number of shares held", value=100)
-    if st.button("📥 Add position"):
-        st.session_state.positions.append({"cost": cost_basis, "shares": shares})
-
-# ------------- 主区 -------------
-col1, col2 = st.columns([3, 2])
+    st.subheader("Pre-expiry Valuation (Black-Scholes)")
+    horizon_days = st.slider("Show value curve at T+N days", 0, 60, 7)
+    risk_free = st.number_input("Risk-free rate (%)", value=4.0, step=0.25) / 100
+    fallback_iv = st.number_input("Fallback IV if chain has none (%)", value=40.0, step=5.0) / 100
+
+# ------------- 期权链：拉取与 IV 修复只在整页 rerun 时执行 -------------
+calls = puts = call_greeks = put_greeks = None
+call_quotes, put_quotes = None, None
+chain_error = None
+if expiry:
+    try:
+        opt_chain = get_option_chain(symbol, expiry)
+        chain_days = max((date.fromisoformat(expiry) - date.today()).days, 0)
+        market_spot = get_underlying_price(symbol)
+        snapshot = default_cache.snapshot_key(symbol, expiry)
+
+        # Yahoo 的 impliedVolatility 缺失或陈旧时，用 bid/ask 中间价反解的 IV 代替；
+        # 只依赖快照、现价、天数和利率，所有会话共享一份，其他输入变化时直接复用
+        def repair_chain():
+            c = repair_implied_vol(opt_chain.calls, market_spot, chain_days, True, risk_free)
+            p = repair_implied_vol(opt_chain.puts, market_spot, chain_days, False, risk_free)
+            return c, p, QuoteIndex(c), QuoteIndex(p)
+
+        calls, puts, call_quotes, put_quotes = shared_cache.memo(
+            "repaired_chain", snapshot and (snapshot, market_spot, chain_days, risk_free), repair_chain)
+
+        # 整条链的 Greeks 与 IV 修复用同一个市场现价（而不是侧栏的情景价格），缓存键含该现价，
+        # 只在重新拉链或现价/利率变化时重算
+        call_greeks = chain_greeks(calls, market_spot, chain_days, True, risk_free, snapshot, fallback_iv)
+        put_greeks = chain_greeks(puts, market_spot, chain_days, False, risk_free, snapshot, fallback_iv)
+    except Exception as e:
+        chain_error = e
+
+
+@st.fragment
+def chain_panel(symbol, expiry, calls, puts, call_greeks, put_greeks):
+    """期权链表格。调整行权价过滤只重跑这一块，不重新拉链或重画收益图。"""
+    with latency.timed("chain"):
+        st.subheader("Filter Option Strike Price Range")
+        f1, f2 = st.columns(2)
+        min_price = f1.number_input("Min strike price", value=100.0)
+        max_price = f2.number_input("Max strike price", value=200.0)
+
+        calls_filtered = calls[(calls['strike'] >= min_price) & (calls['strike'] <= max_price)].join(call_greeks[list(GREEKS)])
+        puts_filtered = puts[(puts['strike'] >= min_price) & (puts['strike'] <= max_price)].join(put_greeks[list(GREEKS)])
+
+        st.subheader(f"Calls for {symbol} expiring on {expiry} (Strike {min_price} - {max_price})")
+        st.dataframe(calls_filtered[['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume', *GREEKS]])
+
+        st.subheader(f"Puts for {symbol} expiring on {expiry} (Strike {min_price} - {max_price})")
+        st.dataframe(puts_filtered[['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume', *GREEKS]])
+    st.caption(f"Chain panel rerun: {latency.summary()['chain']['last_ms']:.0f} ms")
+
+
+def remove_entry(i):
+    n_strats = len(st.session_state.strategies)
+    if i < n_strats:
+        st.session_state.strategies.pop(i)
+    else:
+        st.session_state.positions.pop(i - n_strats)
 
-# 期权链展示（Calls和Puts）
-with col1:
-    if expiry and ticker:
-        try:
-            opt_chain = ticker.option_chain(expiry)
-            calls = opt_chain.calls
-            puts = opt_chain.puts
 
-            calls_filtered = calls[(calls['strike'] >= min_price) & (calls['strike'] <= max_price)]
-            puts_filtered = puts[(puts['strike'] >= min_price) & (puts['strike'] <= max_price)]
+@st.fragment
+def portfolio_panel(call_quotes, put_quotes, underlying_price, horizon_days, risk_free, fallback_iv):
+    """正股持仓增删 + 收益图 + 明细。加减持仓只重跑这一块，期权链表格保持不动。"""
+    with latency.timed("chart"):
+        with st.expander("Add / remove positions"):
+            p1, p2 = st.columns(2)
+            cost_basis = p1.number_input("Stock cost basis ($)", value=165.0)
+            shares = p2.number_input("Number of shares held", value=100)
+            if st.button("📥 Add position"):
+                st.session_state.positions.append({"cost": cost_basis, "shares": shares})
 
-            st.subheader(f"Calls for {symbol} expiring on {expiry} (Strike {min_price} - {max_price})")
-            st.dataframe(calls_filtered[['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume']])
+            entries = [f"#{i + 1} {s['type']} {s['strike1']}" for i, s in enumerate(st.session_state.strategies)] + \
+                      [f"Stock {p['shares']} @ {p['cost']}" for p in st.session_state.positions]
+            if entries:
+                to_remove = st.selectbox("Remove from portfolio", range(len(entries)), format_func=lambda i: entries[i])
+                # 回调在本块重跑之前执行，下拉框和图表直接反映删除后的组合
+                st.button("🗑️ Remove", on_click=remove_entry, args=(to_remove,))
 
-            st.subheader(f"Puts for {symbol} expiring on {expiry} (Strike {min_price} - {max_price})")
-            st.dataframe(puts_filtered[['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume']])
+        st.subheader("📊 Strategy Profit Chart & Details")
+        portfolio_chart(call_quotes, put_quotes, underlying_price, horizon_days, risk_free, fallback_iv)
+    st.caption(f"Chart panel rerun: {latency.summary()['chart']['last_ms']:.0f} ms")
 
-        except Exception as e:
-            st.error(f"Error fetching option chain data: {e}")
-    else:
-        st.info("Enter valid symbol and select expiration date to view option chain.")
-
-# 策略收益图及策略明细
-with col2:
-    st.subheader("📊 Strategy Profit Chart & Details")
 
+def portfolio_chart(call_quotes, put_quotes, underlying_price, horizon_days, risk_free, fallback_iv):
     # 画策略收益图
     if st.session_state.strategies:
         spot_range = np.linspace(underlying_price * 0.7, underlying_price * 1.3, 200)
-        total_pnl = np.zeros_like(spot_range)
-
-        for strat in st.session_state.strategies:
-            pnl = np.zeros_like(spot_range)
-            mult = strat["qty"] * 100
-
-            if strat["type"] == "Sell Put":
-                pnl = np.where(
-                    spot_range < strat["strike1"],
-                    (spot_range - strat["strike1"]) + strat["price1"],
-                    strat["price1"]
-                ) * mult
-
-            elif strat["type"] == "Sell Call":
-                pnl = np.where(
-                    spot_range > strat["strike1"],
-                    (strat["strike1"] - spot_range) + strat["price1"],
-                    strat["price1"]
-                ) * mult
-
-            elif strat["type"] == "Bull Call Spread":
-                pnl = np.where(
-                    spot_range <= strat["strike1"],
-                    -strat["price1"] * mult,
-                    np.where(
-                        spot_range >= strat["strike2"],
-                        (strat["strike2"] - strat["strike1"] - strat["price1"] + strat["price2"]) * mult,
-                        ((spot_range - strat["strike1"]) - strat["price1"] + strat["price2"]) * mult
-                    )
-                )
-
-            elif strat["type"] == "Straddle":
-                pnl = (
-                    -np.abs(spot_range - strat["strike1"]) + strat["price1"] + strat["price2"]
-                ) * mult
-
-            total_pnl += pnl
-            plt.plot(spot_range, pnl, label=strat["type"])
-
-        for pos in st.session_state.positions:
-            stock_pnl = (spot_range - pos["cost"]) * pos["shares"]
-            total_pnl += stock_pnl
-            plt.plot(spot_range, stock_pnl, linestyle="--", label="Stock Position P&L")
+
+        # 所有策略腿和正股各算一个条目
+        legs = [
+            strategy_legs(s["type"], [s["strike1"], s["strike2"]] if s["type"] == "Bull Call Spread" else [s["strike1"]],
+                          [s["price1"], s["price2"]], s["qty"])
+            for s in st.session_state.strategies
+        ] + [[Leg("stock", pos["shares"] / 100, pos["cost"], pos["cost"])] for pos in st.session_state.positions]
+        n_strats = len(st.session_state.strategies)
+        vols = chain_vols(legs, call_quotes, put_quotes) if call_quotes is not None else [[np.nan] * len(l) for l in legs]
+        days_left = np.array([s["expiry"] for s in st.session_state.strategies] + [0] * len(st.session_state.positions), dtype=float)
+        packed = pack_legs(legs, vols, fallback_iv)
+
+        # 到期曲线和 today / T+N 理论曲线按条目参数缓存，合计随增删增量更新；
+        # 只有新加入（或参数变化）的条目才会重新计算
+        expiry_cache = portfolio_curves("expiry_curves", spot_range)
+        expiry_curves = expiry_cache.sync([entry_key(l) for l in legs], legs,
+                                          lambda entries: payoff_values(compile_strategies(entries), spot_range))
+        total_pnl = expiry_cache.total
+
+        def model_curves(entries):
+            entry_legs, entry_vols, entry_days = zip(*entries)
+            days = np.array(entry_days, dtype=float)
+            horizons = np.stack([days, np.maximum(days - horizon_days, 0)])
+            return legs_pnl(pack_legs(entry_legs, entry_vols, fallback_iv), spot_range, horizons,
+                            rate=risk_free).swapaxes(0, 1)
+
+        model_cache = portfolio_curves("model_curves", spot_range)
+        model_cache.sync([entry_key(l, *v, d, horizon_days, risk_free, fallback_iv) for l, v, d in zip(legs, vols, days_left)],
+                         list(zip(legs, vols, days_left)), model_curves)
+        model_today, model_later = model_cache.total
+
+        # 单条曲线只画最近的若干条，组合再大重绘成本也不变
+        plt = pyplot()
+        shown = range(max(len(legs) - MAX_PLOTTED_CURVES, 0), len(legs))
+        for i in shown:
+            if i < n_strats:
+                plt.plot(spot_range, expiry_curves[i], label=st.session_state.strategies[i]["type"])
+            else:
+                plt.plot(spot_range, expiry_curves[i], linestyle="--", label="Stock Position P&L")
+        plt.plot(spot_range, model_today, color="purple", linestyle="-.", label="Total P&L today (model)")
+        plt.plot(spot_range, model_later, color="orange", linestyle="-.", label=f"Total P&L at T+{horizon_days} (model)")
 
         plt.plot(spot_range, total_pnl, label="Total Portfolio P&L", color="black", linewidth=2)
         plt.axhline(0, color="gray", linestyle="--")
@@ -162,6 +229,8 @@ with col2:
         plt.ylabel("Profit / Loss ($)")
         st.pyplot(plt.gcf())
         plt.clf()
+        if len(legs) > MAX_PLOTTED_CURVES:
+            st.caption(f"Showing the last {MAX_PLOTTED_CURVES} of {len(legs)} individual curves; totals include all.")
 
         # 策略明细
         df = pd.DataFrame(st.session_state.strategies)
@@ -174,18 +243,59 @@ with col2:
         df_display["strike2"] = pd.to_numeric(df_display["strike2"], errors="coerce").fillna(0.0)
 
         df_display["Cost"] = ((df_display["price1"] - df_display["price2"]).fillna(df_display["price1"])) * 100
-        df_display["Max Profit"] = np.where(
-            df_display["type"] == "Bull Call Spread",
-            (df_display["strike2"] - df_display["strike1"]) * 100 - df_display["Cost"],
-            df_display["price1"] * 100
-        )
+        # 最大盈亏和盈亏平衡点由折点精确求出；compile 时已乘合约数，这里折回每张合约，与 Cost 同单位
+        extremes = payoff_extremes(compile_strategies(legs[:n_strats]))
+        # 合约数 ≤ 0（编辑器允许填 0）时无法折算，记为 NaN，不让 inf 流进 Return Rate / Strategy Score
+        per_contract = pd.to_numeric(df_display["qty"], errors="coerce").fillna(1).to_numpy(dtype=float)
+        valid_qty = per_contract > 0
+        safe_qty = np.where(valid_qty, per_contract, 1.0)
+        df_display["Max Profit"] = np.where(valid_qty, extremes["max_profit"] / safe_qty, np.nan)
+        df_display["Max Loss"] = np.where(valid_qty, extremes["max_loss"] / safe_qty, np.nan)
+        df_display["Breakevens"] = [", ".join(f"{x:.2f}" for x in row[~np.isnan(row)]) for row in extremes["breakevens"]]
         df_display["Cost"] = df_display["Cost"].replace(0, np.nan)
         df_display["Return Rate"] = (df_display["Max Profit"] / df_display["Cost"]).round(2).fillna(0.0)
         df_display["Strategy Score"] = (df_display["Return Rate"] * 0.6 + df_display["Max Profit"] / 100 * 0.4).round(1)
 
-        st.dataframe(df_display[["type", "strike1", "strike2", "Cost", "Max Profit", "Return Rate", "Strategy Score"]])
+        # 每个策略 / 整个组合（含正股）的 Greeks，按当前现价和各自剩余天数
+        leg_greeks = legs_greeks(packed, underlying_price, days_left, risk_free)
+        for name in GREEKS:
+            df_display[name.capitalize()] = leg_greeks[name][:n_strats].round(2)
+
+        st.dataframe(df_display[["type", "strike1", "strike2", "Cost", "Max Profit", "Max Loss", "Breakevens",
+                                 "Return Rate", "Strategy Score",
+                                 "Delta", "Gamma", "Theta", "Vega"]])
+
+        st.markdown("**Portfolio Greeks (incl. stock positions)**")
+        for metric_col, name in zip(st.columns(len(GREEKS)), GREEKS):
+            metric_col.metric(name.capitalize(), f"{leg_greeks[name].sum():,.2f}")
 
     else:
         st.info("No strategies added yet.")
 
+
+# ------------- 主区 -------------
+col1, col2 = st.columns([3, 2])
+
+# 期权链展示（Calls和Puts）
+with col1:
+    if chain_error is not None:
+        st.error(f"Error fetching option chain data: {chain_error}")
+    elif calls is not None:
+        chain_panel(symbol, expiry, calls, puts, call_greeks, put_greeks)
+    else:
+        st.info("Enter valid symbol and select expiration date to view option chain.")
+
+# 策略收益图及策略明细
+with col2:
+    portfolio_panel(call_quotes, put_quotes, underlying_price, horizon_days, risk_free, fallback_iv)
+
 st.caption("⚠️ This tool is for educational and simulation purposes only, not investment advice.")
+
+# 进程共享缓存（所有会话）：常驻字节、条目数、命中率
+cache_stats = shared_cache.stats()
+st.sidebar.caption(f"Shared cache: {cache_stats['bytes'] / 2**20:.1f} / {cache_stats['max_bytes'] / 2**20:.0f} MB · "
+                   f"{cache_stats['entries']} entries · {cache_stats['hit_rate']:.0%} hits")
+with st.sidebar.expander("Shared cache stats"):
+    st.dataframe(pd.DataFrame.from_dict(cache_stats["namespaces"], orient="index"))
+latency.record("full", time.perf_counter() - run_started)
+st.sidebar.caption(f"Rerun latency (median): {latency.caption()}")
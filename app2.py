@@ -1,61 +1,11 @@
-import streamlit as st
-import yfinance as yf
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from datetime import date
-
-st.set_page_config(layout="wide")
-
-# 获取期权链数据
-def get_option_chain(symbol):
-    stock = yf.Ticker(symbol)
-    expirations = stock.options
-    return stock, expirations
-
-# 策略生成逻辑（简化示例）
-def generate_strategies(options_chain, kind="call"):
-    df = options_chain.copy()
-    df = df[['strike', 'lastPrice', 'impliedVolatility']].dropna()
-    df.columns = ['执行价', '期权价格', 'IV']
-    strategies = []
-
-    # 单腿策略：买入看涨期权
-    for _, row in df.iterrows():
-        strike = row['执行价']
-        price = row['期权价格']
-        iv = row['IV']
-        strategy = {
-            "策略类型": "买入看涨期权" if kind == "call" else "买入看跌期权",
-            "买入执行价": strike,
-            "卖出执行价": None,
-            "成本": price,
-            "最大收益": None,
-            "最大亏损": price,
-            "盈亏平衡点": strike + price if kind == "call" else strike - price
-        }
-        strategies.append(strategy)
+import streamlit as st
 
-    # 示例：牛市价差策略（买低卖高）
-    for i in range(len(df) - 1):
-        long_strike = df.iloc[i]['执行价']
-        short_strike = df.iloc[i + 1]['执行价']
-        long_price = df.iloc[i]['期权价格']
-        short_price = df.iloc[i + 1]['期权价格']
-        cost = long_price - short_price
-        max_profit = short_strike - long_strike - cost
-        strategy = {
-            "策略类型": "牛市价差",
-            "买入执行价": long_strike,
-            "卖出执行价": short_strike,
-            "成本": cost,
-            "最大收益": max_profit,
-            "最大亏损": cost,
-            "盈亏平衡点": long_strike + cost
-        }
-        strategies.append(strategy)
+from optsim.chains import get_expirations, get_option_chain
+from optsim.plotting import pyplot
+from optsim.simulate import generate_strategies
 
-    return pd.DataFrame(strategies)
+st.set_page_config(layout="wide")
 
 # 收益绘图函数
 def plot_payoff(strategy_row):
@@ -79,7 +29,7 @@ def plot_payoff(strategy_row):
         else:
             payoff.append(0)
 
-    fig, ax = plt.subplots()
+    fig, ax = pyplot().subplots()
     ax.plot(spot_prices, payoff, label='策略收益', color='blue')
     ax.axhline(0, color='gray', linestyle='--')
     ax.set_xlabel("标的价格")
@@ -97,12 +47,12 @@ with st.sidebar:
 # 获取期权数据
 if symbol:
     try:
-        stock, expirations = get_option_chain(symbol)
+        expirations = get_expirations(symbol)
         st.sidebar.success(f"成功获取 {symbol} 期权数据")
         expiry = st.selectbox("选择到期日", expirations)
 
         if expiry:
-            chain = stock.option_chain(expiry)
+            chain = get_option_chain(symbol, expiry)
             kind = st.radio("选择期权类型", ["call", "put"])
             options_chain = chain.calls if kind == "call" else chain.puts
             strategy_df = generate_strategies(options_chain, kind=kind)
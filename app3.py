@@ -1,12 +1,26 @@
-import streamlit as st
-import yfinance as yf
+import time
+from datetime import date
+
 import numpy as np
-import matplotlib.pyplot as plt
 import pandas as pd
+import streamlit as st
+
+from optsim.chains import default_cache, get_expirations, get_option_chain, get_underlying_price
+from optsim.greeks import GREEKS, portfolio_greeks
+from optsim.implied_vol import repair_implied_vol
+from optsim.payoffs import Leg, compile_strategies, payoff_extremes, payoff_values, strategy_legs
+from optsim.plotting import pyplot
+from optsim.pricing import chain_vols, legs_pnl, pack_legs
+from optsim.quotes import QuoteIndex
+from optsim.rerun import latency_log
+from optsim.shared import shared_cache
 
 st.set_page_config(page_title="Options Strategy Simulator", layout="wide")
 st.title("🧠 Options Strategy Simulator")
 
+run_started = time.perf_counter()
+latency = latency_log(st.session_state)
+
 # 初始化策略和持仓
 if "strategies" not in st.session_state:
     st.session_state.strategies = []
@@ -20,11 +34,9 @@ with st.sidebar:
     symbol = st.text_input("Enter stock symbol (e.g. AMD)", value="AMD").upper()
 
     expirations = []
-    ticker = None
     if symbol:
         try:
-            ticker = yf.Ticker(symbol)
-            expirations = ticker.options
+            expirations = get_expirations(symbol)
         except Exception as e:
             st.error(f"Error fetching option expirations: {e}")
 
@@ -34,11 +46,6 @@ with st.sidebar:
     else:
         st.info("No expirations found or enter valid symbol")
 
-    st.markdown("---")
-    st.subheader("Filter Option Strike Price Range")
-    min_price = st.number_input("Min strike price", value=100.0)
-    max_price = st.number_input("Max strike price", value=200.0)
-
     st.markdown("---")
     st.header("Strategy & Position Configuration")
 
@@ -85,43 +92,90 @@ with st.sidebar:
         })
 
     st.divider()
-    st.subheader("Add Existing Stock Position")
-    cost_basis = st.number_input("Stock cost basis ($)", value=165.0)
-    shares = st.number_input("Number of shares held", value=100)
-    if st.button("📥 Add position"):
-        st.session_state.positions.append({"cost": cost_basis, "shares": shares})
-
-col1, col2 = st.columns([3, 2])
-
-# Option chain display on left
-with col1:
-    if expiry and ticker:
-        try:
-            opt_chain = ticker.option_chain(expiry)
-            calls = opt_chain.calls
-            puts = opt_chain.puts
-
-            calls_filtered = calls[(calls['strike'] >= min_price) & (calls['strike'] <= max_price)]
-            puts_filtered = puts[(puts['strike'] >= min_price) & (puts['strike'] <= max_price)]
-
-            st.subheader(f"Calls for {symbol} expiring on {expiry} (Strike {min_price} - {max_price})")
-            st.dataframe(calls_filtered[['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume']])
-
-            st.subheader(f"Puts for {symbol} expiring on {expiry} (Strike {min_price} - {max_price})")
-            st.dataframe(puts_filtered[['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume']])
-
-        except Exception as e:
-            st.error(f"Error fetching option chain data: {e}")
-    else:
-        st.info("Enter valid symbol and select expiration date to view option chain.")
-
-# Strategy profit & details on right
-with col2:
-    st.subheader("📊 Strategy Profit Chart & Details")
-
+    st.subheader("Pre-expiry Valuation (Black-Scholes)")
+    horizon_days = st.slider("Show value curve at T+N days", 0, 60, 7)
+    risk_free = st.number_input("Risk-free rate (%)", value=4.0, step=0.25) / 100
+    fallback_iv = st.number_input("Fallback IV if chain has none (%)", value=40.0, step=5.0) / 100
+
+def strategy_leg_list(strat):
+    # 把侧栏保存的 strike1..4 / price1..4 还原成各腿
+    strategy = strat["type"]
+    s1, s2, s3, s4 = (strat.get(f"strike{i}") for i in range(1, 5))
+    leg_strikes = {
+        "Bull Call Spread": [s1, s2],
+        "Iron Condor": [s1, s2, s3, s4],
+        "Covered Call": [strat["underlying"], s2],
+    }.get(strategy, [s1])
+    prices = [strat.get(f"price{i}") or 0.0 for i in range(1, 5)]
+    leg_prices = [0.0, prices[1]] if strategy == "Covered Call" else prices
+    return strategy_legs(strategy, leg_strikes, leg_prices, strat["qty"])
+
+
+def days_to(expiry):
+    return max((date.fromisoformat(expiry) - date.today()).days, 0) if expiry else 0
+
+# 期权链拉取与 IV 修复只在整页 rerun 时执行
+calls = puts = None
+call_quotes, put_quotes = None, None
+chain_error = None
+if expiry:
+    try:
+        opt_chain = get_option_chain(symbol, expiry)
+        market_spot = get_underlying_price(symbol)
+        snapshot = default_cache.snapshot_key(symbol, expiry)
+
+        # Yahoo 的 impliedVolatility 缺失或陈旧时，用 bid/ask 中间价反解的 IV 代替；
+        # 只依赖快照、现价、天数和利率，所有会话共享一份，其他输入变化时直接复用
+        def repair_chain():
+            c = repair_implied_vol(opt_chain.calls, market_spot, days_to(expiry), True, risk_free)
+            p = repair_implied_vol(opt_chain.puts, market_spot, days_to(expiry), False, risk_free)
+            return c, p, QuoteIndex(c), QuoteIndex(p)
+
+        calls, puts, call_quotes, put_quotes = shared_cache.memo(
+            "repaired_chain", snapshot and (snapshot, market_spot, days_to(expiry), risk_free), repair_chain)
+    except Exception as e:
+        chain_error = e
+
+
+@st.fragment
+def chain_panel(symbol, expiry, calls, puts):
+    """期权链表格。调整行权价过滤只重跑这一块。"""
+    with latency.timed("chain"):
+        st.subheader("Filter Option Strike Price Range")
+        f1, f2 = st.columns(2)
+        min_price = f1.number_input("Min strike price", value=100.0)
+        max_price = f2.number_input("Max strike price", value=200.0)
+
+        calls_filtered = calls[(calls['strike'] >= min_price) & (calls['strike'] <= max_price)]
+        puts_filtered = puts[(puts['strike'] >= min_price) & (puts['strike'] <= max_price)]
+
+        st.subheader(f"Calls for {symbol} expiring on {expiry} (Strike {min_price} - {max_price})")
+        st.dataframe(calls_filtered[['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume']])
+
+        st.subheader(f"Puts for {symbol} expiring on {expiry} (Strike {min_price} - {max_price})")
+        st.dataframe(puts_filtered[['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume']])
+    st.caption(f"Chain panel rerun: {latency.summary()['chain']['last_ms']:.0f} ms")
+
+
+@st.fragment
+def portfolio_panel(symbol, expiry, call_quotes, put_quotes, underlying_price, horizon_days, risk_free, fallback_iv):
+    """正股持仓 + 收益图 + 明细。加持仓只重跑这一块，期权链表格保持不动。"""
+    with latency.timed("chart"):
+        with st.expander("Add existing stock position"):
+            p1, p2 = st.columns(2)
+            cost_basis = p1.number_input("Stock cost basis ($)", value=165.0)
+            shares = p2.number_input("Number of shares held", value=100)
+            if st.button("📥 Add position"):
+                st.session_state.positions.append({"cost": cost_basis, "shares": shares})
+
+        st.subheader("📊 Strategy Profit Chart & Details")
+        strategy_chart(symbol, expiry, call_quotes, put_quotes, underlying_price, horizon_days, risk_free, fallback_iv)
+    st.caption(f"Chart panel rerun: {latency.summary()['chart']['last_ms']:.0f} ms")
+
+
+def strategy_chart(symbol, expiry, call_quotes, put_quotes, underlying_price, horizon_days, risk_free, fallback_iv):
     if st.session_state.strategies:
         spot_range = np.linspace(underlying_price * 0.7, underlying_price * 1.3, 200)
-        total_pnl = np.zeros_like(spot_range)
 
         # 只画最后添加的策略盈亏示例
         strat = st.session_state.strategies[-1]
@@ -138,79 +192,25 @@ with col2:
         qty = strat.get("qty")
         strategy = strat.get("type")
 
-        mult = qty * 100
-        pnl = np.zeros_like(spot_range)
-
-        # 根据策略类型计算pnl
-        if strategy == "Sell Put":
-            pnl = np.where(
-                spot_range < strike1,
-                (spot_range - strike1) + price1,
-                price1
-            ) * mult
-
-        elif strategy == "Sell Call":
-            pnl = np.where(
-                spot_range > strike1,
-                (strike1 - spot_range) + price1,
-                price1
-            ) * mult
-
-        elif strategy == "Bull Call Spread":
-            pnl = np.where(
-                spot_range <= strike1,
-                -price1 * mult,
-                np.where(
-                    spot_range >= strike2,
-                    (strike2 - strike1 - price1 + price2) * mult,
-                    ((spot_range - strike1) - price1 + price2) * mult
-                )
-            )
-
-        elif strategy == "Straddle":
-            pnl = (-np.abs(spot_range - strike1) + price1 + price2) * mult
-
-        elif strategy == "Iron Condor":
-            # IC = Long Put (strike1), Short Put (strike2), Short Call (strike3), Long Call (strike4)
-            put_long = np.where(
-                spot_range < strike1,
-                (strike1 - spot_range) - price1,
-                -price1
-            ) * mult
-            put_short = np.where(
-                (spot_range >= strike1) & (spot_range < strike2),
-                price2,
-                np.where(spot_range < strike1, price2 - (strike2 - spot_range), price2)
-            ) * mult * -1
-            call_short = np.where(
-                (spot_range > strike3) & (spot_range <= strike4),
-                price3,
-                np.where(spot_range > strike4, price3 - (spot_range - strike4), price3)
-            ) * mult * -1
-            call_long = np.where(
-                spot_range > strike4,
-                (spot_range - strike4) - price4,
-                -price4
-            ) * mult
-
-            pnl = put_long + put_short + call_short + call_long
-
-        elif strategy == "Covered Call":
-            # Covered call = stock - short call
-            stock_pnl = (spot_range - underlying_price) * qty * 100
-            call_short = np.where(
-                spot_range > strike2,
-                price2 - (spot_range - strike2),
-                price2
-            ) * qty * 100 * -1
-            pnl = stock_pnl + call_short
-
-        total_pnl += pnl
+        # 到期盈亏由各腿编译成的分段线性表示直接求出，所有策略类型共用
+        legs = [strategy_leg_list(strat)]
+        payoff = compile_strategies(legs)
+        pnl = payoff_values(payoff, spot_range)[0]
+        extremes = payoff_extremes(payoff)
 
         # 画图并标注strike价格
+        plt = pyplot()
         fig, ax = plt.subplots(figsize=(10, 5))
         ax.plot(spot_range, pnl, label=f"{strategy} PnL")
 
+        # 到期前理论价值（Black-Scholes，隐含波动率取自期权链）：today / T+N 一次算出
+        vols = chain_vols(legs, call_quotes, put_quotes) if call_quotes is not None else None
+        days_left = days_to(strat.get("expiry"))
+        horizons = np.array([[days_left], [max(days_left - horizon_days, 0)]], dtype=float)
+        model_today, model_later = legs_pnl(pack_legs(legs, vols, fallback_iv), spot_range, horizons, rate=risk_free)[:, 0]
+        ax.plot(spot_range, model_today, linestyle="-.", color="purple", label="Today (model)")
+        ax.plot(spot_range, model_later, linestyle="-.", color="orange", label=f"T+{horizon_days} (model)")
+
         ax.axhline(0, linestyle="--", color="black")
 
         def mark_strike(ax, price, color, label):
@@ -258,6 +258,9 @@ with col2:
             "price4": price4,
             "quantity": qty,
             "expiry": expiry,
+            "max_profit": float(extremes["max_profit"][0]),
+            "max_loss": float(extremes["max_loss"][0]),
+            "breakevens": ", ".join(f"{x:.2f}" for x in extremes["breakevens"][0] if not np.isnan(x)) or "none",
         }
         for k, v in res.items():
             if v is not None:
@@ -266,7 +269,43 @@ with col2:
                 else:
                     st.write(f"**{k.replace('_',' ').capitalize()}:** {v}")
 
+        # 整个组合（所有已添加策略 + 正股）的 Greeks，一次批量计算
+        all_legs = [strategy_leg_list(s) for s in st.session_state.strategies]
+        all_legs += [[Leg("stock", pos["shares"] / 100, pos["cost"], pos["cost"])] for pos in st.session_state.positions]
+        all_vols = chain_vols(all_legs, call_quotes, put_quotes) if call_quotes is not None else None
+        all_days = [days_to(s.get("expiry")) for s in st.session_state.strategies] + [0] * len(st.session_state.positions)
+        totals = portfolio_greeks(pack_legs(all_legs, all_vols, fallback_iv), underlying_price,
+                                  np.array(all_days, dtype=float), risk_free)
+        st.subheader("Portfolio Greeks (incl. stock positions)")
+        for metric_col, name in zip(st.columns(len(GREEKS)), GREEKS):
+            metric_col.metric(name.capitalize(), f"{totals[name]:,.2f}")
+
     else:
         st.info("No strategies added yet.")
 
+
+col1, col2 = st.columns([3, 2])
+
+# Option chain display on left
+with col1:
+    if chain_error is not None:
+        st.error(f"Error fetching option chain data: {chain_error}")
+    elif calls is not None:
+        chain_panel(symbol, expiry, calls, puts)
+    else:
+        st.info("Enter valid symbol and select expiration date to view option chain.")
+
+# Strategy profit & details on right
+with col2:
+    portfolio_panel(symbol, expiry, call_quotes, put_quotes, underlying_price, horizon_days, risk_free, fallback_iv)
+
 st.caption("⚠️ This tool is for educational and simulation purposes only, not investment advice.")
+
+# 进程共享缓存（所有会话）：常驻字节、条目数、命中率
+cache_stats = shared_cache.stats()
+st.sidebar.caption(f"Shared cache: {cache_stats['bytes'] / 2**20:.1f} / {cache_stats['max_bytes'] / 2**20:.0f} MB · "
+                   f"{cache_stats['entries']} entries · {cache_stats['hit_rate']:.0%} hits")
+with st.sidebar.expander("Shared cache stats"):
+    st.dataframe(pd.DataFrame.from_dict(cache_stats["namespaces"], orient="index"))
+latency.record("full", time.perf_counter() - run_started)
+st.sidebar.caption(f"Rerun latency (median): {latency.caption()}")
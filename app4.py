@@ -1,309 +1,314 @@
-import streamlit as st
-import yfinance as yf
+import time
+from datetime import date
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from itertools import combinations
+import streamlit as st
+
+from optsim.backtest import backtest, delta_rule, equity_curve, summarize, top_ranked_rule
+from optsim.batch import iter_watchlist_scan, parse_watchlist
+from optsim.chains import default_cache, get_expirations, get_option_chain, get_underlying_price
+from optsim.history import default_history
+from optsim.implied_vol import repair_implied_vol
+from optsim.live import LIVE_STRATEGIES, LiveRanker
+from optsim.payoffs import strategy_legs
+from optsim.plotting import pyplot
+from optsim.pricing import chain_vols, legs_pnl, pack_legs
+from optsim.quotes import QuoteIndex
+from optsim.rerun import latency_log, memo_step
+from optsim.shared import shared_cache
+from optsim.strategies import STRATEGY_TYPES, WING_LIMITED, enumerate_strategies
+from optsim.time_spreads import load_term_chains, scan_time_spreads, time_spread_curves
 
 st.set_page_config(page_title="Options Strategy Auto-Explorer", layout="wide")
 st.title("🧠 Options Strategy Auto Explorer")
 
+run_started = time.perf_counter()
+latency = latency_log(st.session_state)
+
 # -- 左侧栏参数 --
 with st.sidebar:
     symbol = st.text_input("Enter stock symbol (e.g. AMD)", value="AMD").upper()
 
     expirations = []
-    ticker = None
     if symbol:
         try:
-            ticker = yf.Ticker(symbol)
-            expirations = ticker.options
+            expirations = get_expirations(symbol)
         except Exception as e:
             st.error(f"Error fetching option expirations: {e}")
 
     expiry = st.selectbox("Select expiration date", expirations) if expirations else None
 
-    min_price = st.number_input("Min strike price", value=100.0)
-    max_price = st.number_input("Max strike price", value=200.0)
+    strategy_type = st.selectbox("Select strategy", STRATEGY_TYPES)
+    top_n = int(st.number_input("Show top K strategies", value=10, min_value=1, step=1))
+
+    strategy_opts = {}
+    if strategy_type in WING_LIMITED:
+        # 蝶式 / 价差的相邻执行价间距与铁鹰翼宽共用一个上限，组合数随之从 O(n³) 降到与结果规模相当
+        strategy_opts["max_wing_width"] = st.number_input("Max wing width ($)", value=10.0, min_value=0.5, step=0.5)
+    if strategy_type == "Iron Condor":
+        strategy_opts["min_credit"] = st.number_input("Min net credit ($/share)", value=0.1, step=0.05)
+
+    live_mode = st.checkbox("Live refresh (re-rank only changed quotes)")
+    if live_mode:
+        refresh_seconds = int(st.number_input("Refresh every (seconds)", value=15, min_value=2, step=1))
+
+    st.markdown("---")
+    batch_mode = st.checkbox("Watchlist batch scan")
+    if batch_mode:
+        watchlist = st.text_area("Watchlist (comma or space separated)", value="AMD NVDA AAPL TSLA MSFT")
+        batch_min_days = st.number_input("Min days to expiration", value=7, min_value=0, step=1)
+        batch_top_n = st.number_input("Top N across symbols", value=20, min_value=1, step=1)
+
+    st.markdown("---")
+    time_mode = st.checkbox("Calendar / diagonal scan (all expirations)")
+    if time_mode:
+        spread_kind = st.radio("Option type", ["call", "put"], horizontal=True)
+        max_offset = st.number_input("Max strike offset ($, 0 = calendar only)", value=0.0, min_value=0.0, step=1.0)
+        max_back_days = st.number_input("Max days to back expiration", value=120, min_value=2, step=1)
+
+    st.markdown("---")
+    backtest_mode = st.checkbox("Backtest this strategy (model-priced history)")
+    if backtest_mode:
+        rule_names = ["Top-ranked by score"] + (["Fixed delta"] if strategy_type in ("Sell Put", "Sell Call") else [])
+        rule_name = st.radio("Entry rule", rule_names)
+        target_delta = st.slider("Delta", 0.05, 0.5, 0.30, 0.05) if rule_name == "Fixed delta" else None
+        hold_days = int(st.number_input("Days to expiration at entry", value=30, min_value=1, step=1))
+        history_period = st.selectbox("History", ["2y", "5y", "10y"], index=2)
 
-    strategy_type = st.selectbox("Select strategy", [
-        "Sell Put", "Sell Call", "Bull Call Spread", "Straddle",
-        "Iron Condor", "Covered Call"
-    ])
+# -- 批量扫描：整个观察列表并发拉链、进程池枚举，结果边算边刷新 --
+if batch_mode:
+    symbols = parse_watchlist(watchlist)
+    st.subheader(f"Top {int(batch_top_n)} {strategy_type} Strategies across {len(symbols)} symbols")
+    if st.button("▶️ Run batch scan") and symbols:
+        progress = st.progress(0.0)
+        table = st.empty()
+        failures = {}
+        for update in iter_watchlist_scan(symbols, strategy_type, top_n=int(batch_top_n),
+                                          min_days=int(batch_min_days), **strategy_opts):
+            progress.progress(update.done / update.total, text=f"{update.done}/{update.total} · {update.symbol}")
+            if update.error:
+                failures[update.symbol] = update.error
+            table.dataframe(update.leaderboard)
+        if failures:
+            st.warning(f"{len(failures)} symbol(s) failed")
+            st.dataframe(pd.DataFrame(failures.items(), columns=["symbol", "error"]))
+    st.stop()
 
-# -- 主区 --
-col1, col2 = st.columns([3, 2])
+# -- 时间价差：所有到期日的链并发拉一次，近月卖出 / 远月买入的全部配对向量化打分 --
+if time_mode and symbol:
+    st.subheader(f"Top {top_n} {spread_kind} calendar / diagonal spreads (P/L at front expiration)")
+    chains, failures = load_term_chains(symbol, max_days=int(max_back_days))
+    spot = get_underlying_price(symbol)
+    # 链版本、现价和参数都没变时直接复用上次的排名
+    deps = (tuple(default_cache.snapshot_key(symbol, c.expiry) for c in chains), spot, spread_kind, max_offset, top_n)
+    ranked = memo_step(st.session_state, "time_spreads", deps,
+                       lambda: scan_time_spreads(chains, spot, spread_kind, max_offset, top_n))
+    if failures:
+        st.warning(f"{len(failures)} expiration(s) failed: {', '.join(failures)}")
+    if ranked.empty:
+        st.info("No valid time spreads found (need at least two expirations).")
+        st.stop()
+    st.caption(f"{ranked.attrs.get('candidates', len(ranked))} pairs scored across {len(chains)} expirations")
+    st.dataframe(ranked.round({"back_vol": 3, "cost": 2, "expected_profit": 2, "pop": 3}))
 
+    plt = pyplot()
+    plt.figure(figsize=(10, 5))
+    spot_range = np.linspace(spot * 0.7, spot * 1.3, 300)
+    for row, curve in zip(ranked.itertuples(), time_spread_curves(ranked, chains, spot_range)):
+        plt.plot(spot_range, curve, label=f"{row.front_strike:.2f}/{row.back_strike:.2f} {row.front_expiry}→{row.back_expiry}")
+    plt.axhline(0, color='gray', linestyle='--')
+    plt.axvline(spot, color='red', linestyle=':', label='Underlying Price')
+    plt.xlabel("Underlying Price at Front Expiration")
+    plt.ylabel("Profit / Loss ($)")
+    plt.legend(fontsize="small")
+    st.pyplot(plt.gcf())
+    plt.clf()
+    st.stop()
+
+# -- 回测：长历史日线落盘缓存，每周五按规则开仓、持有到期，所有入场日一次向量化算完 --
+if backtest_mode and symbol:
+    try:
+        history = default_history.load(symbol, history_period)
+    except Exception as e:
+        st.error(f"Error fetching price history: {e}")
+        st.stop()
+    # 侧边栏的翼宽是美元；排名规则的网格按现价的百分比生成，用最近收盘价折算
+    max_wing_pct = None
+    if strategy_opts.get("max_wing_width") is not None:
+        max_wing_pct = strategy_opts["max_wing_width"] / float(history["Close"].iloc[-1]) * 100
+    try:
+        if rule_name == "Fixed delta":
+            rule = delta_rule(strategy_type, target_delta)
+        else:
+            rule = top_ranked_rule(strategy_type, max_wing_pct=max_wing_pct)
+    except ValueError as e:
+        st.info(f"Backtest not available: {e}")
+        st.stop()
+    deps = (symbol, history_period, history.index[-1], rule.label, max_wing_pct, hold_days)
+    trades = memo_step(st.session_state, "backtest", deps, lambda: backtest(history, rule, days=hold_days))
+    st.subheader(f"Backtest: {rule.label}, {hold_days}-day expiries, every Friday ({history_period})")
+    stats = summarize(trades)
+    if not stats["trades"]:
+        st.info("No entries in this history window.")
+        st.stop()
+    m1, m2, m3, m4, m5 = st.columns(5)
+    m1.metric("Trades", stats["trades"])
+    m2.metric("Win rate", f"{stats['win_rate']:.1%}", f"model {stats['avg_pop']:.1%}", delta_color="off")
+    m3.metric("Avg P/L ($)", f"{stats['avg_pnl']:.2f}", f"model {stats['avg_expected']:.2f}", delta_color="off")
+    m4.metric("Total P/L ($)", f"{stats['total_pnl']:.0f}")
+    m5.metric("Max drawdown ($)", f"{stats['max_drawdown']:.0f}")
+    st.line_chart(equity_curve(trades).rename("Cumulative P/L ($)"))
+    st.caption("Entry prices are Black-Scholes quotes at trailing 21-day realized vol × 1.1 with a 3% spread; "
+               "no historical option chains are used.")
+    st.dataframe(trades.round({c: 3 for c in trades.select_dtypes("number").columns}))
+    st.stop()
+
+# -- 期权链：拉取与 IV 修复只在整页 rerun 时执行 --
 calls, puts = None, None
 underlying_price = 0.0
-if ticker and expiry:
+days_left = 0
+snapshot = None
+if symbol and expiry:
     try:
-        opt_chain = ticker.option_chain(expiry)
-        calls = opt_chain.calls
-        puts = opt_chain.puts
-        calls = calls[(calls['strike'] >= min_price) & (calls['strike'] <= max_price)]
-        puts = puts[(puts['strike'] >= min_price) & (puts['strike'] <= max_price)]
-        hist = ticker.history(period="1d")
-        if not hist.empty:
-            underlying_price = hist["Close"].iloc[-1]
+        opt_chain = get_option_chain(symbol, expiry)
+        underlying_price = get_underlying_price(symbol)
+        days_left = max((date.fromisoformat(expiry) - date.today()).days, 0)
+        snapshot = default_cache.snapshot_key(symbol, expiry)
+        # Yahoo 的 impliedVolatility 缺失或陈旧时，用 bid/ask 中间价反解的 IV 代替；
+        # 逐行独立，整条链修一次即可（所有会话共享一份），过滤行权价时不用重算
+        calls, puts = shared_cache.memo("repaired_chain", snapshot and (snapshot, underlying_price, days_left),
+                                        lambda: (repair_implied_vol(opt_chain.calls, underlying_price, days_left, True),
+                                                 repair_implied_vol(opt_chain.puts, underlying_price, days_left, False)))
     except Exception as e:
         st.error(f"Error fetching option chain data: {e}")
 
-def get_price(df, strike, is_call=True, is_buy=True):
-    if df is None:
-        return 0.0
-    row = df[(df['strike'] == strike)]
-    if row.empty:
-        return 0.0
-    price = row['ask'].values[0] if is_buy else row['bid'].values[0]
-    return price if not pd.isna(price) else 0.0
-
-def simulate_strategy(strat_type, strikes, prices, qty, underlying):
-    mult = qty * 100
-    spot_range = np.linspace(underlying * 0.7, underlying * 1.3, 300)
-    pnl = np.zeros_like(spot_range)
-
-    if strat_type == "Sell Put":
-        strike = strikes[0]
-        price = prices[0]
-        pnl = np.where(
-            spot_range < strike,
-            (spot_range - strike) + price,
-            price
-        ) * mult
-        cost = price * mult
-        expected_profit = cost
-        profit_range = f"Price ≥ {strike:.2f}"
-
-    elif strat_type == "Sell Call":
-        strike = strikes[0]
-        price = prices[0]
-        pnl = np.where(
-            spot_range > strike,
-            (strike - spot_range) + price,
-            price
-        ) * mult
-        cost = price * mult
-        expected_profit = cost
-        profit_range = f"Price ≤ {strike:.2f}"
-
-    elif strat_type == "Bull Call Spread":
-        strike1, strike2 = strikes
-        price_buy, price_sell = prices
-        pnl = np.where(
-            spot_range <= strike1,
-            -price_buy * mult,
-            np.where(
-                spot_range >= strike2,
-                (strike2 - strike1 - price_buy + price_sell) * mult,
-                ((spot_range - strike1) - price_buy + price_sell) * mult
-            )
-        )
-        cost = (price_buy - price_sell) * mult
-        max_profit = (strike2 - strike1) * mult - cost
-        expected_profit = max_profit
-        profit_range = f"{strike1:.2f} ≤ Price ≤ {strike2:.2f}"
-
-    elif strat_type == "Straddle":
-        strike = strikes[0]
-        price_call, price_put = prices
-        pnl = (-np.abs(spot_range - strike) + price_call + price_put) * mult
-        cost = (price_call + price_put) * mult
-        expected_profit = None
-        profit_range = "Volatility sensitive"
-
-    elif strat_type == "Iron Condor":
-        strike1, strike2, strike3, strike4 = strikes
-        p1, p2, p3, p4 = prices
-        put_long = np.where(
-            spot_range < strike1,
-            (spot_range - strike1) + p1,
-            p1
-        ) * mult
-        put_short = np.where(
-            spot_range < strike2,
-            (strike2 - spot_range) + p2,
-            p2
-        ) * mult
-        call_short = np.where(
-            spot_range > strike3,
-            (strike3 - spot_range) + p3,
-            p3
-        ) * mult
-        call_long = np.where(
-            spot_range > strike4,
-            (spot_range - strike4) + p4,
-            p4
-        ) * mult
-        pnl = put_long + put_short + call_short + call_long
-        cost = (p1 - p2 - p3 + p4) * mult
-        expected_profit = None
-        profit_range = f"{strike2:.2f} ≤ Price ≤ {strike3:.2f}"
-
-    elif strat_type == "Covered Call":
-        strike_call = strikes[1]
-        price_call = prices[1]
-        stock_pnl = (spot_range - underlying) * mult
-        call_short = np.where(
-            spot_range > strike_call,
-            (strike_call - spot_range) + price_call,
-            price_call
-        ) * mult
-        pnl = stock_pnl + call_short
-        cost = - price_call * mult
-        expected_profit = None
-        profit_range = f"Price ≤ {strike_call:.2f}"
 
-    else:
-        return None
-
-    return {
-        "pnl": pnl,
-        "cost": cost,
-        "expected_profit": expected_profit,
-        "profit_range": profit_range
-    }
-
-# 自动生成策略
-strategies = []
-if calls is not None and puts is not None:
-    qty = 1  # 固定1合约，可改为界面输入
-    if strategy_type == "Sell Put":
-        # 遍历puts单腿卖出
-        for strike in puts['strike']:
-            price = get_price(puts, strike, is_call=False, is_buy=False)
-            if price <= 0: continue
-            sim = simulate_strategy(strategy_type, [strike], [price], qty, underlying_price)
-            strategies.append({
-                "type": strategy_type,
-                "strikes": [strike],
-                "prices": [price],
-                "qty": qty,
-                **sim
-            })
-    elif strategy_type == "Sell Call":
-        for strike in calls['strike']:
-            price = get_price(calls, strike, is_call=True, is_buy=False)
-            if price <= 0: continue
-            sim = simulate_strategy(strategy_type, [strike], [price], qty, underlying_price)
-            strategies.append({
-                "type": strategy_type,
-                "strikes": [strike],
-                "prices": [price],
-                "qty": qty,
-                **sim
-            })
-    elif strategy_type == "Bull Call Spread":
-        # 遍历所有calls两两组合，买低卖高
-        for buy_strike, sell_strike in combinations(sorted(calls['strike']), 2):
-            buy_price = get_price(calls, buy_strike, is_call=True, is_buy=True)
-            sell_price = get_price(calls, sell_strike, is_call=True, is_buy=False)
-            if buy_price <= 0 or sell_price <= 0: continue
-            sim = simulate_strategy(strategy_type, [buy_strike, sell_strike], [buy_price, sell_price], qty, underlying_price)
-            strategies.append({
-                "type": strategy_type,
-                "strikes": [buy_strike, sell_strike],
-                "prices": [buy_price, sell_price],
-                "qty": qty,
-                **sim
-            })
-    elif strategy_type == "Straddle":
-        # 遍历calls和puts相同strike组合买入
-        common_strikes = set(calls['strike']).intersection(set(puts['strike']))
-        for strike in common_strikes:
-            call_price = get_price(calls, strike, is_call=True, is_buy=True)
-            put_price = get_price(puts, strike, is_call=False, is_buy=True)
-            if call_price <= 0 or put_price <= 0: continue
-            sim = simulate_strategy(strategy_type, [strike], [call_price, put_price], qty, underlying_price)
-            strategies.append({
-                "type": strategy_type,
-                "strikes": [strike],
-                "prices": [call_price, put_price],
-                "qty": qty,
-                **sim
-            })
-    elif strategy_type == "Iron Condor":
-        # 遍历puts两档、calls两档组合（strike顺序：put_long < put_short < call_short < call_long）
-        put_strikes = sorted(puts['strike'])
-        call_strikes = sorted(calls['strike'])
-        for put_long, put_short in combinations(put_strikes, 2):
-            if put_long >= put_short:
-                continue
-            for call_short, call_long in combinations(call_strikes, 2):
-                if call_short >= call_long:
-                    continue
-                # 要求 put_short < call_short 保证合理结构
-                if put_short >= call_short:
-                    continue
-                p1 = get_price(puts, put_long, is_call=False, is_buy=True)
-                p2 = get_price(puts, put_short, is_call=False, is_buy=False)
-                p3 = get_price(calls, call_short, is_call=True, is_buy=False)
-                p4 = get_price(calls, call_long, is_call=True, is_buy=True)
-                if 0 in [p1, p2, p3, p4]:
-                    continue
-                sim = simulate_strategy(strategy_type,
-                                        [put_long, put_short, call_short, call_long],
-                                        [p1, p2, p3, p4],
-                                        qty, underlying_price)
-                strategies.append({
-                    "type": strategy_type,
-                    "strikes": [put_long, put_short, call_short, call_long],
-                    "prices": [p1, p2, p3, p4],
-                    "qty": qty,
-                    **sim
-                })
-    elif strategy_type == "Covered Call":
-        # 遍历call卖出执行价
-        for strike in calls['strike']:
-            price_call = get_price(calls, strike, is_call=True, is_buy=False)
-            if price_call <= 0:
-                continue
-            sim = simulate_strategy(strategy_type,
-                                    [underlying_price, strike],
-                                    [0.0, price_call],
-                                    qty, underlying_price)
-            strategies.append({
-                "type": strategy_type,
-                "strikes": [underlying_price, strike],
-                "prices": [0.0, price_call],
-                "qty": qty,
-                **sim
-            })
-
-# 选出预期收益最高前10策略
-sorted_strats = sorted([s for s in strategies if s['expected_profit'] is not None], key=lambda x: x['expected_profit'], reverse=True)
-top_strats = sorted_strats[:10]
-
-with col1:
-    st.subheader(f"Top 10 {strategy_type} Strategies by Expected Profit")
+def strategy_table(top_strats):
+    rows = []
+    for s in top_strats:
+        rows.append({
+            "Strategy": s["type"],
+            "Strike Prices": ', '.join([f"{strike:.2f}" for strike in s["strikes"]]),
+            "Option Prices (used bid/ask)": ', '.join([f"{price:.2f}" for price in s["prices"]]),
+            "Qty (Contracts)": s["qty"],
+            "Cost ($)": round(s["cost"], 2),
+            "Expected Profit ($)": round(s["expected_profit"], 2),
+            "Win Prob": f"{s['pop']:.1%}",
+            "Max Loss ($)": round(s["max_loss"], 2),
+            "Breakevens": ', '.join([f"{b:.2f}" for b in s["breakevens"]]),
+            "Profit Range": s["profit_range"]
+        })
+    return pd.DataFrame(rows)
+
+
+def live_board(symbol, expiry, days_left, strategy_type, top_n, strategy_opts, refresh_seconds):
+    """盘中刷新：每次运行取这条链的最新版本，与上一份报价比较，只重算腿落在变化执行价上的候选，排行榜原地更新。"""
+    f1, f2 = st.columns(2)
+    min_price = f1.number_input("Min strike price", value=100.0, key="live_min_strike")
+    max_price = f2.number_input("Max strike price", value=200.0, key="live_max_strike")
+
+    # 不让缓存失效：数据超过半个刷新间隔才重新拉取，新版本放回共享缓存，
+    # 多个实时会话每个间隔至多触发约两次拉取，其他会话的派生数据只在版本真正变化时才作废
+    chain = default_cache.option_chain(symbol, expiry, max_age=refresh_seconds / 2)
+    spot = default_cache.underlying_price(symbol, max_age=refresh_seconds / 2)
+    in_range = lambda df: df[(df['strike'] >= min_price) & (df['strike'] <= max_price)]
+    call_quotes = QuoteIndex(repair_implied_vol(in_range(chain.calls), spot, days_left, True))
+    put_quotes = QuoteIndex(repair_implied_vol(in_range(chain.puts), spot, days_left, False))
+
+    # 参数变化才重建；否则沿用上一次的全部候选和排行
+    key = (symbol, expiry, days_left, strategy_type, top_n, min_price, max_price, tuple(sorted(strategy_opts.items())))
+    if st.session_state.get("live_key") != key:
+        st.session_state["live_ranker"] = LiveRanker(strategy_type, top_n, days=days_left, **strategy_opts)
+        st.session_state["live_key"] = key
+    refresh = st.session_state["live_ranker"].update(call_quotes, put_quotes, spot)
+    latency.record(f"live {refresh.mode}", refresh.seconds)
+
+    st.subheader(f"Live Top {top_n} {strategy_type} Strategies by Expected Profit")
+    top_strats = st.session_state["live_ranker"].top().rows()
     if top_strats:
-        rows = []
-        for s in top_strats:
-            rows.append({
-                "Strategy": s["type"],
-                "Strike Prices": ', '.join([f"{strike:.2f}" for strike in s["strikes"]]),
-                "Option Prices (used bid/ask)": ', '.join([f"{price:.2f}" for price in s["prices"]]),
-                "Qty (Contracts)": s["qty"],
-                "Cost ($)": round(s["cost"], 2),
-                "Expected Profit ($)": round(s["expected_profit"], 2),
-                "Profit Range": s["profit_range"]
-            })
-        df = pd.DataFrame(rows)
-        st.dataframe(df)
+        st.dataframe(strategy_table(top_strats))
     else:
         st.info("No valid strategies found.")
+    st.caption(f"{time.strftime('%H:%M:%S')} · {refresh.mode}: {refresh.changed_calls} call / {refresh.changed_puts} put "
+               f"strikes changed, rescored {refresh.rescored:,} of {refresh.candidates:,} candidates "
+               f"in {refresh.seconds * 1e3:.0f} ms")
 
-with col2:
-    st.subheader("Profit Curves of Top Strategies")
-    plt.figure(figsize=(8,6))
-    spot_range = np.linspace(underlying_price * 0.7, underlying_price * 1.3, 300)
-    for s in top_strats:
-        plt.plot(spot_range, s["pnl"], label=f"{s['type']} @ {', '.join([f'{st:.2f}' for st in s['strikes']])}")
-    plt.axhline(0, color='gray', linestyle='--')
-    plt.axvline(underlying_price, color='red', linestyle=':', label='Underlying Price')
-    plt.xlabel("Underlying Price at Expiration")
-    plt.ylabel("Profit / Loss ($)")
-    plt.title(f"Profit Curves for Top {len(top_strats)} {strategy_type} Strategies")
-    plt.legend()
-    st.pyplot(plt.gcf())
-    plt.clf()
+
+@st.fragment
+def explorer(calls, puts, snapshot, underlying_price, days_left, strategy_type, top_n, strategy_opts):
+    """行权价过滤 + 枚举排名 + 收益图。改过滤区间或图表开关只重跑这一块，不重新拉链。"""
+    with latency.timed("explorer"):
+        f1, f2, f3 = st.columns([1, 1, 2])
+        min_price = f1.number_input("Min strike price", value=100.0)
+        max_price = f2.number_input("Max strike price", value=200.0)
+        show_model = f3.checkbox("Overlay today's value (Black-Scholes)", value=True)
+
+        def enumerate_filtered():
+            call_quotes = put_quotes = None
+            if calls is not None:
+                # 过滤后建一次按执行价的报价索引，枚举和理论曲线共用
+                call_quotes = QuoteIndex(calls[(calls['strike'] >= min_price) & (calls['strike'] <= max_price)])
+                put_quotes = QuoteIndex(puts[(puts['strike'] >= min_price) & (puts['strike'] <= max_price)])
+            # 自动生成策略，按到期价格对数正态分布（平值 IV）下的期望收益排名，枚举时即只保留前 K 个
+            qty = 1  # 固定1合约，可改为界面输入
+            top = enumerate_strategies(strategy_type, call_quotes, put_quotes, underlying_price, qty,
+                                       top_n=top_n, days=days_left, **strategy_opts)
+            return call_quotes, put_quotes, top
+
+        # 只有链快照、过滤区间或枚举参数变化时才重新枚举；切换图表开关直接复用。
+        # 同一条链、同样参数的结果（含报价索引）在所有会话间共享
+        deps = (snapshot, underlying_price, days_left, min_price, max_price, strategy_type, top_n,
+                tuple(sorted(strategy_opts.items())))
+        call_quotes, put_quotes, top_strats = shared_cache.memo("top_strategies", snapshot and deps, enumerate_filtered)
+
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            st.subheader(f"Top {top_n} {strategy_type} Strategies by Expected Profit")
+            if top_strats:
+                st.dataframe(strategy_table(top_strats))
+            else:
+                st.info("No valid strategies found.")
+
+        with col2:
+            st.subheader("Profit Curves of Top Strategies")
+            plt = pyplot()
+            plt.figure(figsize=(8,6))
+            spot_range = np.linspace(underlying_price * 0.7, underlying_price * 1.3, 300)
+            lines = []
+            for s in top_strats:
+                lines += plt.plot(spot_range, s["pnl"], label=f"{s['type']} @ {', '.join([f'{st:.2f}' for st in s['strikes']])}")
+            if show_model and top_strats:
+                # 所有 top 策略的所有腿一次广播求出今天的理论盈亏
+                legs = [strategy_legs(s["type"], s["strikes"], s["prices"], s["qty"]) for s in top_strats]
+                today = legs_pnl(pack_legs(legs, chain_vols(legs, call_quotes, put_quotes)), spot_range, days_left)
+                for curve, line in zip(today, lines):
+                    plt.plot(spot_range, curve, linestyle="-.", color=line.get_color(), alpha=0.6)
+            plt.axhline(0, color='gray', linestyle='--')
+            plt.axvline(underlying_price, color='red', linestyle=':', label='Underlying Price')
+            plt.xlabel("Underlying Price at Expiration")
+            plt.ylabel("Profit / Loss ($)")
+            plt.title(f"Profit Curves for Top {len(top_strats)} {strategy_type} Strategies")
+            plt.legend()
+            st.pyplot(plt.gcf())
+            plt.clf()
+    st.caption(f"Explorer rerun: {latency.summary()['explorer']['last_ms']:.0f} ms")
+
+
+if live_mode and calls is not None and strategy_type not in LIVE_STRATEGIES:
+    st.info(f"Live refresh does not support {strategy_type}.")
+elif live_mode and calls is not None:
+    # 定时只重跑这个 fragment：重新拉链、增量重排，页面其余部分不动
+    st.fragment(run_every=refresh_seconds)(live_board)(symbol, expiry, days_left, strategy_type, top_n, strategy_opts,
+                                                       refresh_seconds)
+else:
+    explorer(calls, puts, snapshot, underlying_price, days_left, strategy_type, top_n, strategy_opts)
+
+# 进程共享缓存（所有会话）：常驻字节、条目数、命中率
+cache_stats = shared_cache.stats()
+st.sidebar.caption(f"Shared cache: {cache_stats['bytes'] / 2**20:.1f} / {cache_stats['max_bytes'] / 2**20:.0f} MB · "
+                   f"{cache_stats['entries']} entries · {cache_stats['hit_rate']:.0%} hits")
+with st.sidebar.expander("Shared cache stats"):
+    st.dataframe(pd.DataFrame.from_dict(cache_stats["namespaces"], orient="index"))
+latency.record("full", time.perf_counter() - run_started)
+st.sidebar.caption(f"Rerun latency (median): {latency.caption()}")
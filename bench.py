@@ -0,0 +1,454 @@
+"""离线性能基准：python bench.py [名称 ...]，不带参数时运行全部。"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from optsim.backtest import backtest, delta_rule, top_ranked_rule
+from optsim.chains import ChainCache, provider_factory
+from optsim.greeks import chain_greeks
+from optsim.history import HistoryCache
+from optsim.implied_vol import add_implied_vols, repair_implied_vol
+from optsim.live import LiveRanker
+from optsim.loader import load_chains
+from optsim.lognormal import lognormal_scores
+from optsim.monte_carlo import TerminalDistribution, score_legs
+from optsim.payoffs import candidate_legs, compile_legs, simulate_strategy
+from optsim.pricing import KIND_CALL
+from optsim.quotes import QuoteIndex
+from optsim.rerun import memo_step
+from optsim.shared import SharedCache, nbytes
+from optsim.synthetic import SyntheticMarket, SyntheticTicker
+from optsim.strategies import STRATEGY_TYPES, WING_LIMITED, enumerate_candidates
+from optsim.time_spreads import load_term_chains, scan_time_spreads
+
+
+def make_chain(n_strikes=150, spot=150.0, seed=0, side="calls", days=30):
+    # 离线合成的期权链（无套利，带微笑和买卖价差），只用于基准测试
+    market = SyntheticMarket(spot=spot, n_strikes=n_strikes, expiry_days=(days,), seed=seed)
+    return getattr(market.option_chain("BENCH", market.expirations()[0]), side)
+
+
+def timeit(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def report(name, seconds, n=1, unit="call"):
+    print(f"{name:<40s} {seconds * 1e3:10.3f} ms   {seconds / n * 1e6:10.3f} µs/{unit}")
+
+
+def bench_quote_lookup():
+    calls = make_chain(150)
+    strikes = calls["strike"].to_numpy()
+    probes = np.random.default_rng(1).choice(strikes, 2000)
+
+    def dataframe_scan():
+        # 原 app4.get_price 的做法：每次对整条链做布尔掩码
+        for k in probes:
+            row = calls[(calls["strike"] == k)]
+            row["ask"].values[0]
+
+    index = QuoteIndex(calls)
+
+    def index_single():
+        for k in probes:
+            index.price(k, is_buy=True)
+
+    report("quote lookup: DataFrame mask", timeit(dataframe_scan, 3), len(probes), "lookup")
+    report("quote lookup: QuoteIndex.price", timeit(index_single), len(probes), "lookup")
+    report("quote lookup: QuoteIndex.prices (batch)", timeit(lambda: index.prices(probes)), len(probes), "lookup")
+    report("quote index build", timeit(lambda: QuoteIndex(calls)))
+
+
+class FakeTicker(SyntheticTicker):
+    # 合成行情 + 模拟网络延迟的 yf.Ticker 替身
+    latency = 0.005
+    market = SyntheticMarket(expiry_days=(30, 58, 86))
+
+    def __init__(self, symbol):
+        super().__init__(self.market, symbol)
+
+    def option_chain(self, expiry):
+        time.sleep(self.latency)
+        return super().option_chain(expiry)
+
+
+def bench_chain_cache():
+    # 30 个会话、每个 20 次 rerun，随机切换 5 个标的 / 3 个到期日
+    cache = ChainCache(chain_ttl=300.0, ticker_factory=FakeTicker)
+    rng = np.random.default_rng(0)
+    symbols = ["AMD", "NVDA", "AAPL", "TSLA", "MSFT"]
+    t0 = time.perf_counter()
+    for _ in range(30 * 20):
+        symbol = symbols[rng.integers(len(symbols))]
+        expiry = cache.expirations(symbol)[rng.integers(3)]
+        cache.option_chain(symbol, expiry)
+    elapsed = time.perf_counter() - t0
+    stats = cache.stats()
+    report("chain cache: 600 reruns", elapsed, 600, "rerun")
+    print(f"  hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']:.1%} "
+          f"resident={stats['chain_bytes'] / 1e6:.1f} MB")
+
+
+def bench_shared_cache(sessions=30, reruns=20):
+    # 30 个会话各 20 次 rerun，随机看 5 个标的 / 3 个到期日：每次取链后修复 IV、建 QuoteIndex、算整条链 Greeks。
+    # 各会话在 session_state 里各存一份 vs 进程共享一份
+    symbols = ["AMD", "NVDA", "AAPL", "TSLA", "MSFT"]
+    picks = np.random.default_rng(0).integers(0, [len(symbols), 3], size=(sessions, reruns, 2))
+
+    def derive(chain, spot):
+        c = repair_implied_vol(chain.calls, spot, 30, True)
+        p = repair_implied_vol(chain.puts, spot, 30, False)
+        return c, p, QuoteIndex(c), QuoteIndex(p), chain_greeks(c, spot, 30, True), chain_greeks(p, spot, 30, False)
+
+    for label, shared in (("per-session", False), ("shared", True)):
+        store = SharedCache()
+        cache = ChainCache(ticker_factory=FakeTicker, store=store)
+        states = [{} for _ in range(sessions)]
+        t0 = time.perf_counter()
+        for r in range(reruns):
+            for state, pick in zip(states, picks[:, r]):
+                symbol = symbols[pick[0]]
+                expiry = cache.expirations(symbol)[pick[1]]
+                chain, spot = cache.option_chain(symbol, expiry), cache.underlying_price(symbol)
+                deps = (cache.snapshot_key(symbol, expiry), spot)
+                if shared:
+                    store.memo("repaired_chain", deps, lambda: derive(chain, spot))
+                else:
+                    memo_step(state, "repaired_chain", deps, lambda: derive(chain, spot))
+        elapsed = time.perf_counter() - t0
+        derived = store.stats()["bytes"] if shared else sum(nbytes(s["_step_repaired_chain"][1]) for s in states)
+        chains = store.stats()["namespaces"]["chain"]["bytes"]
+        report(f"shared cache: {label}", elapsed, sessions * reruns, "rerun")
+        hit_rate = f"  derived hit rate {store.stats()['namespaces']['repaired_chain']['hit_rate']:.0%}" if shared else ""
+        print(f"  resident: chains {chains / 1e6:.1f} MB + derived {(derived - chains * shared) / 1e6:.1f} MB{hit_rate}")
+
+
+def bench_multi_expiry():
+    class SlowTicker(FakeTicker):
+        latency = 0.05
+        market = SyntheticMarket(expiry_days=range(10, 210, 10))
+
+    def serial():
+        cache = ChainCache(ticker_factory=SlowTicker)
+        for expiry in cache.expirations("AMD"):
+            cache.option_chain("AMD", expiry)
+
+    def concurrent():
+        load_chains("AMD", cache=ChainCache(ticker_factory=SlowTicker), max_workers=8)
+
+    report("20 expiries: serial", timeit(serial, 1), 20, "expiry")
+    report("20 expiries: load_chains(8 workers)", timeit(concurrent, 1), 20, "expiry")
+
+
+def bench_candidate_memory():
+    calls = QuoteIndex(make_chain(150))
+    puts = QuoteIndex(make_chain(150, side="puts"))
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    candidates = enumerate_candidates("Bull Call Spread", calls, puts, 150.0)
+    soa_bytes = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+    n = len(candidates)
+
+    # 对照：原先每个候选一个 dict（含 300 点 pnl 和 profit_range 字符串）
+    sample = candidates.take(np.arange(min(n, 2000)))
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    dicts = []
+    for i in range(len(sample)):
+        strikes, prices = sample.strikes[i].tolist(), sample.prices[i].tolist()
+        dicts.append({"type": "Bull Call Spread", "strikes": strikes, "prices": prices, "qty": 1,
+                      **simulate_strategy("Bull Call Spread", strikes, prices, 1, 150.0)})
+    dict_bytes = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+
+    print(f"{'candidates (Bull Call Spread, 150 strikes)':<40s} {n:10d}")
+    print(f"{'bytes/candidate: dict + pnl':<40s} {dict_bytes / len(sample):10.0f}")
+    print(f"{'bytes/candidate: CandidateSet':<40s} {soa_bytes / n:10.0f}   (nbytes {candidates.nbytes / n:.0f})")
+    report("enumerate_candidates", timeit(lambda: enumerate_candidates("Bull Call Spread", calls, puts, 150.0)),
+           n, "candidate")
+
+
+def bench_implied_vol():
+    market = SyntheticMarket(expiry_days=range(10, 210, 10))
+    frames = []
+    for expiry in market.expirations():
+        chain = market.option_chain("BENCH", expiry)
+        frames.append(chain.calls.assign(expiry=expiry, side="call"))
+        frames.append(chain.puts.assign(expiry=expiry, side="put"))
+    chains = pd.concat(frames, ignore_index=True)
+    n = len(chains) * 3
+    report(f"IV solve: {len(chains)} contracts x bid/ask/mid", timeit(lambda: add_implied_vols(chains, 150.0)), n, "solve")
+    solved = add_implied_vols(chains, 150.0)
+    print(f"  mid status: {solved['iv_status'].value_counts().to_dict()}")
+
+
+def bench_monte_carlo(n_spreads=10_000, n_paths=100_000, budget=64 * 1024 * 1024):
+    rng = np.random.default_rng(0)
+    low = rng.uniform(100, 200, n_spreads)
+    legs = {
+        "kind": np.full((n_spreads, 2), KIND_CALL, dtype=np.int8),
+        "qty": np.tile([1.0, -1.0], (n_spreads, 1)),
+        "strike": np.column_stack([low, low + rng.choice([2.5, 5.0, 10.0], n_spreads)]),
+        "premium": np.column_stack([rng.uniform(3, 8, n_spreads), rng.uniform(1, 3, n_spreads)]),
+    }
+    for dtype in (np.float32, np.float64):
+        dist = TerminalDistribution.lognormal(150.0, 0.4, 30, n_paths, seed=1, dtype=dtype)
+        tracemalloc.start()
+        elapsed = timeit(lambda: score_legs(legs, dist, tail=None, memory_budget=budget), repeat=1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report(f"MC score {n_spreads} x {n_paths} ({np.dtype(dtype).name})", elapsed, n_spreads, "spread")
+        print(f"  peak {peak / 2**20:.0f} MiB (budget {budget / 2**20:.0f} MiB, "
+              f"full matrix {n_spreads * n_paths * np.dtype(dtype).itemsize / 2**20:.0f} MiB)")
+    top = np.arange(100)
+    picked = {key: value[top] for key, value in legs.items()}
+    report("MC tail loss (top 100)", timeit(lambda: score_legs(picked, dist, tail=0.05), repeat=1), 100, "spread")
+
+
+def bench_lognormal():
+    # 全部 Bull Call Spread 候选：闭式期望 / 盈利概率 vs 同一候选的蒙特卡洛
+    calls = QuoteIndex(make_chain(150))
+    puts = QuoteIndex(make_chain(150, side="puts"))
+    candidates = enumerate_candidates("Bull Call Spread", calls, puts, 150.0)
+    legs = candidate_legs(candidates.strategy_type, candidates.strikes, candidates.prices, candidates.qty)
+    payoff = compile_legs(legs)
+    n = len(candidates)
+    report(f"closed form: {n} spreads", timeit(lambda: lognormal_scores(payoff, 150.0, 0.4, 30)), n, "spread")
+    dist = TerminalDistribution.lognormal(150.0, 0.4, 30, 20_000, seed=1)
+    report(f"Monte Carlo: {n} spreads x 20000", timeit(lambda: score_legs(legs, dist, tail=None, multiplier=100),
+                                                       repeat=1), n, "spread")
+    exact = lognormal_scores(payoff, 150.0, 0.4, 30)
+    mc = score_legs(legs, dist, tail=None, multiplier=100)
+    print(f"  max |E[PnL] diff| ${np.abs(exact['expected_pnl'] - mc['expected_pnl']).max():.2f}, "
+          f"max |PoP diff| {np.abs(exact['pop'] - mc['pop']).max():.4f}")
+
+
+def bench_rerun(repeat=3):
+    # 每种交互：整页 rerun 的耗时（拆分前的行为）vs 只重跑受影响那一块（fragment）的耗时；
+    # AppTest 总是整页重跑，fragment 耗时取页面自己记录的该块 last_ms。期权链来自合成行情（FakeTicker），离线运行
+    import optsim.chains
+    from streamlit.testing.v1 import AppTest
+
+    optsim.chains.default_cache = ChainCache(ticker_factory=FakeTicker)
+
+    def widget(widgets, label):
+        return [w for w in widgets if w.label.startswith(label)][0]
+
+    def strike_filter(at, i):
+        widget(at.number_input, "Min strike price").set_value(100.0 + i)
+
+    def add_position(at, i):
+        widget(at.button, "📥 Add position").click()
+
+    def toggle_model(at, i):
+        widget(at.checkbox, "Overlay today's value").set_value(i % 2 == 1)
+
+    for app, n_strategies, scope, name, interact in [
+        ("app1.py", 3, "chain", "strike filter", strike_filter),
+        ("app1.py", 3, "chart", "add position", add_position),
+        ("app3.py", 3, "chain", "strike filter", strike_filter),
+        ("app4.py", 0, "explorer", "strike filter", strike_filter),
+        ("app4.py", 0, "explorer", "toggle model overlay", toggle_model),
+    ]:
+        at = AppTest.from_file(app, default_timeout=120).run()
+        for _ in range(n_strategies):
+            widget(at.button, "➕ Add to strategy").click().run()
+        full, part = [], []
+        for i in range(repeat):
+            interact(at, i)
+            t0 = time.perf_counter()
+            at.run()
+            full.append(time.perf_counter() - t0)
+            part.append(at.session_state["latency"].summary()[scope]["last_ms"] / 1e3)
+        report(f"{app} {name}: full rerun", float(np.median(full)), unit="rerun")
+        report(f"{app} {name}: {scope} fragment", float(np.median(part)), unit="rerun")
+
+
+# 首屏不应导入的重依赖：只在拉数据 / 定价 / 画图时才延迟导入
+LAZY_MODULES = ("yfinance", "matplotlib", "plotly", "scipy")
+
+STARTUP_SCRIPT = """
+import sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+print(time.perf_counter() - t0)
+sys.exit(1 if at.exception else 0)
+"""
+
+
+def import_times(stderr):
+    # 解析 python -X importtime 的输出：各模块自身耗时（不含其导入的子模块）按顶层包名归并，单位微秒
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(own)
+    return totals
+
+
+def bench_startup(apps=("app.py", "app1.py", "app2.py", "app3.py", "app4.py"), top=6):
+    # 冷启动：每个页面在新进程里首次加载一次（AppTest 代替 streamlit run，合成行情录成的快照，离线），
+    # 报告首屏总耗时、按顶层包的导入耗时，以及首屏有没有提前导入本应延迟的重依赖
+    root = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        # 先把合成行情录成快照再离线回放：首屏只计页面自己的开销，不含生成行情时的定价
+        recorder = ChainCache(ticker_factory=provider_factory("synthetic", snapshot_dir))
+        for expiry in recorder.expirations("AMD"):
+            recorder.option_chain("AMD", expiry)
+        recorder.underlying_price("AMD")
+        env = dict(os.environ, OPTSIM_SNAPSHOT_DIR=snapshot_dir, OPTSIM_REPLAY="1")
+        # streamlit 自己会导入的（例如 plotly）不算页面的责任
+        bare = subprocess.run([sys.executable, "-X", "importtime", "-c", "import streamlit.testing.v1"],
+                              capture_output=True, text=True)
+        preloaded = set(import_times(bare.stderr))
+
+        for app in apps:
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT, os.path.join(root, app)],
+                                  cwd=root, env=env, capture_output=True, text=True)
+            if proc.returncode:
+                print(f"{app}: first load failed\n{proc.stderr[-2000:]}")
+                continue
+            report(f"{app}: first page load", float(proc.stdout.split()[-1]), unit="load")
+            totals = import_times(proc.stderr)
+            ranked = sorted(totals.items(), key=lambda kv: -kv[1])[:top]
+            print("  imports: " + ", ".join(f"{name} {us / 1e3:.0f} ms" for name, us in ranked))
+            eager = [name for name in LAZY_MODULES if name in totals and name not in preloaded]
+            print(f"  lazy modules imported on first load (beyond streamlit's own): {', '.join(eager) or 'none'}")
+
+
+def bench_synthetic(sizes=(150, 500, 1500)):
+    # 合成行情压测：生成不同规模的期权链，再在上面枚举并按对数正态期望排名全部候选
+    for n in sizes:
+        market = SyntheticMarket(n_strikes=n, expiry_days=(30,), nan_frac=0.02)
+        expiry = market.expirations()[0]
+        report(f"synthetic chain: {n} strikes", timeit(lambda: market.option_chain("BENCH", expiry), repeat=3),
+               2 * n, "contract")
+        chain = market.option_chain("BENCH", expiry)
+        calls, puts = QuoteIndex(chain.calls), QuoteIndex(chain.puts)
+        for strategy, options in [("Bull Call Spread", {}), ("Iron Condor", {"max_wing_width": 10.0})]:
+            found = enumerate_candidates(strategy, calls, puts, 150.0, days=30, **options)
+            elapsed = timeit(lambda: enumerate_candidates(strategy, calls, puts, 150.0, days=30, **options), repeat=1)
+            report(f"  enumerate {strategy} (kept {len(found)})", elapsed, unit="run")
+
+
+def bench_families(n_strikes=150, max_wing_width=10.0):
+    # 各策略族在 150 个执行价的链上全量枚举 + 对数正态评分的吞吐（候选 / 秒）；
+    # 蝶式分别测不限翼宽（全部 i < j < k 组合）和限定翼宽；Iron Condor 是剪枝搜索、只返回 top_k，不在此列
+    calls, puts = QuoteIndex(make_chain(n_strikes)), QuoteIndex(make_chain(n_strikes, side="puts"))
+    runs = [(t, None) for t in STRATEGY_TYPES if t != "Iron Condor"]
+    runs += [(t, max_wing_width) for t in WING_LIMITED if t != "Iron Condor"]
+    for strategy, width in runs:
+        options = {} if width is None else {"max_wing_width": width}
+        found = enumerate_candidates(strategy, calls, puts, 150.0, days=30, **options)
+        elapsed = timeit(lambda: enumerate_candidates(strategy, calls, puts, 150.0, days=30, **options), repeat=3)
+        label = strategy if width is None else f"{strategy} (width ≤ {width:g})"
+        print(f"{label:<44s} {len(found):>9d} candidates {elapsed * 1e3:9.1f} ms "
+              f"{len(found) / elapsed / 1e6:8.2f} M candidates/s")
+
+
+def bench_time_spreads():
+    # 6 个到期日：每个到期日只拉一次链（看未命中数），然后日历 / 对角价差全部配对打分的吞吐
+    cache = ChainCache(ticker_factory=provider_factory("synthetic"))
+    chains, _ = load_term_chains("AMD", cache=cache)
+    print(f"{len(chains)} expiries loaded, cache misses (expiration list + chains): {cache.stats()['misses']}")
+    spot = cache.underlying_price("AMD")
+    for label, offset in [("calendar", 0.0), ("diagonal (offset ≤ 5)", 5.0), ("diagonal (offset ≤ 20)", 20.0)]:
+        ranked = scan_time_spreads(chains, spot, "call", offset)
+        n = ranked.attrs["candidates"]
+        report(f"time spreads: {label}, {n} pairs", timeit(lambda: scan_time_spreads(chains, spot, "call", offset), 3),
+               n, "pair")
+
+
+def bench_backtest():
+    # 10 年合成日线：磁盘缓存冷 / 热读取，然后同一规则全部入场日一次向量化 vs 按入场日逐个回测
+    with tempfile.TemporaryDirectory() as root:
+        store = HistoryCache(root, ChainCache(ticker_factory=provider_factory("synthetic")))
+        report("history: fetch + write parquet", timeit(lambda: store.load("AMD", "10y"), 1))
+        report("history: cached read", timeit(lambda: store.load("AMD", "10y")))
+        history = store.load("AMD", "10y")
+    for rule in (delta_rule("Sell Put", 0.30), top_ranked_rule("Bull Call Spread"),
+                 top_ranked_rule("Call Butterfly", max_wing_pct=10)):
+        trades = backtest(history, rule)
+        n = len(trades)
+        report(f"{rule.label}: batch", timeit(lambda: backtest(history, rule), 3), n, "entry")
+
+        def per_entry():
+            for day in trades["entry"]:
+                backtest(history, rule, start=day, end=day)
+
+        report(f"{rule.label}: per-entry loop", timeit(per_entry, 1), n, "entry")
+
+
+def bench_live(n_strikes=100, refreshes=20, changed=(1, 3, 10)):
+    # 100 个执行价的 Iron Condor 全集（翼宽 ≤ 10）：全量构建 vs 每次刷新只有少数执行价 bid/ask 变化时的增量重排
+    calls_df, puts_df = make_chain(n_strikes), make_chain(n_strikes, side="puts")
+    calls, puts = QuoteIndex(calls_df), QuoteIndex(puts_df)
+    options = dict(days=30, max_wing_width=10.0, min_credit=0.1)
+    full = timeit(lambda: LiveRanker("Iron Condor", **options).update(calls, puts, 150.0), 3)
+    ranker = LiveRanker("Iron Condor", **options)
+    ranker.update(calls, puts, 150.0)
+    report(f"live: full build, {len(ranker)} condors", full, len(ranker), "candidate")
+    rng = np.random.default_rng(0)
+
+    def requote(df, k):
+        # 随机 k 个执行价的 bid/ask 各挪 1 分钱
+        df = df.copy()
+        rows = rng.choice(len(df), k, replace=False)
+        df.loc[df.index[rows], ["bid", "ask"]] += rng.choice([-0.01, 0.01], (k, 2))
+        df["bid"] = df["bid"].clip(lower=0)
+        return df
+
+    for k in changed:
+        updates = [(QuoteIndex(requote(calls_df, k)), QuoteIndex(requote(puts_df, k))) for _ in range(refreshes)]
+        t0 = time.perf_counter()
+        rescored = sum(ranker.update(c, p, 150.0).rescored for c, p in updates)
+        elapsed = (time.perf_counter() - t0) / refreshes
+        print(f"live: {k} strike(s) per side changed  {elapsed * 1e3:8.2f} ms/refresh  "
+              f"{rescored / refreshes:9.0f} rescored  {elapsed / full:6.1%} of full build")
+
+
+BENCHMARKS = {
+    "quotes": bench_quote_lookup,
+    "cache": bench_chain_cache,
+    "shared": bench_shared_cache,
+    "loader": bench_multi_expiry,
+    "candidates": bench_candidate_memory,
+    "iv": bench_implied_vol,
+    "mc": bench_monte_carlo,
+    "lognormal": bench_lognormal,
+    "rerun": bench_rerun,
+    "startup": bench_startup,
+    "synthetic": bench_synthetic,
+    "families": bench_families,
+    "calendar": bench_time_spreads,
+    "backtest": bench_backtest,
+    "live": bench_live,
+}
+
+
+def main(names):
+    for name in names or BENCHMARKS:
+        print(f"== {name}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1 @@
+"""期权策略模拟的核心计算（不依赖 Streamlit，可在脚本/任务中直接导入）。"""
@@ -0,0 +1,5 @@
+from optsim.cli import main
+
+# spawn 出来的子进程也会导入本模块，入口必须放在 __main__ 判断里
+if __name__ == "__main__":
+    raise SystemExit(main())
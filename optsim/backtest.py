@@ -0,0 +1,179 @@
+"""历史回测：按规则在几百个入场日开仓、持有到期，全部入场日作为一个批次向量化计算（没有按日期的循环）。"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from optsim.lognormal import lognormal_scores
+from optsim.payoffs import LEG_TEMPLATES, candidate_legs, compile_legs, payoff_extremes, payoff_values
+from optsim.pricing import DAYS_PER_YEAR, bs_price
+from optsim.strategies import SPREAD_FAMILIES, strike_pairs, strike_triples
+
+TRADING_DAYS = 252
+
+# 各入场日的模型行情：spot / price_vol / score_vol 为 (入场日,)，days / rate / spread 为标量
+EntryMarket = namedtuple("EntryMarket", ["spot", "price_vol", "score_vol", "days", "rate", "spread"])
+
+# 选仓规则：pick(EntryMarket) -> (strikes (入场日, 腿数), prices (入场日, 腿数), 是否有效 (入场日,))
+Rule = namedtuple("Rule", ["strategy_type", "pick", "label"])
+
+
+def realized_vol(close, window=21):
+    # 截至当天（含）的滚动已实现波动率，年化；只用过去的数据，不会偷看未来
+    return np.log(close).diff().rolling(window).std() * np.sqrt(TRADING_DAYS)
+
+
+def entry_schedule(index, days, weekday=4, start=None, end=None):
+    """入场日（每周 weekday，缺省周五）及对应到期日在 index 中的位置。
+
+    到期日落在非交易日时取之前最后一个交易日的收盘；到期超出历史末尾的入场日剔除。
+    """
+    dates = pd.DatetimeIndex(index)
+    entry = np.flatnonzero(dates.weekday == weekday)
+    if start is not None:
+        entry = entry[dates[entry] >= pd.Timestamp(start, tz=dates.tz)]
+    if end is not None:
+        entry = entry[dates[entry] <= pd.Timestamp(end, tz=dates.tz)]
+    expiry = dates[entry] + pd.Timedelta(days=days)
+    keep = expiry <= dates[-1] if len(dates) else np.zeros(0, dtype=bool)
+    exit_ = np.searchsorted(dates, expiry[keep], side="right") - 1
+    return entry[keep], exit_
+
+
+def model_quotes(spot, strikes, years, vol, is_call, rate=0.0, spread=0.03):
+    """没有历史期权链时的模型报价：Black-Scholes 理论价两侧各加半个价差，bid 向下、ask 向上取整到分。"""
+    fair = bs_price(spot, strikes, years, vol, is_call, rate)
+    half = np.maximum(0.5 * spread * fair, 0.01)
+    return np.maximum(np.floor((fair - half) * 100) / 100, 0.0), np.ceil((fair + half) * 100) / 100
+
+
+def scaled_scores(strategy_type, strikes, prices, qty, spot, vol, days, rate=0.0):
+    """逐行现价不同的一批策略的对数正态期望 / 盈利概率。
+
+    到期盈亏对 (S, K, 权利金) 是一次齐次的，对数正态分布又只依赖 S_T / S，所以把执行价和
+    权利金都除以各自的现价后，整批共用 spot=1 交给 lognormal_scores，期望再乘回现价即可。
+    """
+    spot = np.asarray(spot, dtype=float)
+    legs = candidate_legs(strategy_type, strikes / spot[:, None], prices / spot[:, None], qty)
+    scores = lognormal_scores(compile_legs(legs), 1.0, vol, days, drift=rate)
+    return scores["expected_pnl"] * spot, scores["pop"]
+
+
+def delta_rule(strategy_type="Sell Put", delta=0.30, strike_step=1.0):
+    """单腿卖出：按模型 Black-Scholes delta 选执行价（如"每周五卖 30-delta 的 put"），取整到 strike_step，按 bid 成交。"""
+    if strategy_type not in ("Sell Put", "Sell Call"):
+        raise ValueError(f"delta rule supports Sell Put / Sell Call, not {strategy_type}")
+    is_call = strategy_type == "Sell Call"
+
+    def pick(m):
+        from scipy.special import ndtri
+
+        years = m.days / DAYS_PER_YEAR
+        # call delta = N(d1) = delta；put delta = N(d1) − 1 = −delta，反解 d1 再求执行价
+        d1 = ndtri(delta if is_call else 1 - delta)
+        strike = m.spot * np.exp(-d1 * m.price_vol * np.sqrt(years) + (m.rate + 0.5 * m.price_vol ** 2) * years)
+        strike = np.round(strike / strike_step) * strike_step
+        bid, _ = model_quotes(m.spot, strike, years, m.price_vol, is_call, m.rate, m.spread)
+        return strike[:, None], bid[:, None], bid > 0
+
+    return Rule(strategy_type, pick, f"{strategy_type} @ {delta:.0%} delta")
+
+
+def top_ranked_rule(strategy_type="Bull Call Spread", moneyness=(0.8, 1.2), n_strikes=41, max_wing_pct=None):
+    """app4 的排名规则：每个入场日在模型期权链（现价 × moneyness 网格）上枚举该策略的全部组合，
+    取对数正态期望最高的一个。支持 Sell Put / Sell Call 和 SPREAD_FAMILIES 中的价差 / 蝶式 / 比例价差，
+    max_wing_pct 为翼宽上限（现价的百分比）。全部入场日 × 全部组合压平成一个批次打分。
+    """
+    rel = np.linspace(moneyness[0], moneyness[1], n_strikes)
+    if strategy_type in ("Sell Put", "Sell Call"):
+        kind, combos = ("call" if strategy_type == "Sell Call" else "put"), (np.arange(n_strikes),)
+    elif strategy_type in SPREAD_FAMILIES:
+        kind, wings = SPREAD_FAMILIES[strategy_type]
+        # 组合只取决于网格的相对位置，在"现价 = 100"的网格上生成一次，各入场日共用
+        combos = (strike_pairs(rel * 100, max_wing_pct) if wings == "pairs"
+                  else strike_triples(rel * 100, max_wing_pct, wings))
+    else:
+        raise ValueError(f"top-ranked rule does not support {strategy_type}")
+    if not len(combos[0]):
+        raise ValueError(f"no {strategy_type} within a {max_wing_pct:.2f}% wing on a {rel[1] - rel[0]:.0%} strike grid")
+    signs = [sign for _, sign, _, _ in LEG_TEMPLATES[strategy_type]]
+
+    def pick(m):
+        n, n_combos = len(m.spot), len(combos[0])
+        strikes = np.round(m.spot[:, None] * rel, 2)
+        bid, ask = model_quotes(m.spot[:, None], strikes, m.days / DAYS_PER_YEAR, m.price_vol[:, None],
+                                kind == "call", m.rate, m.spread)
+        cand_strikes = np.stack([strikes[:, c] for c in combos], axis=-1)
+        cand_prices = np.stack([(ask if sign > 0 else bid)[:, c] for c, sign in zip(combos, signs)], axis=-1)
+        width = cand_strikes.shape[-1]
+        expected, _ = scaled_scores(strategy_type, cand_strikes.reshape(-1, width), cand_prices.reshape(-1, width),
+                                    np.ones(n * n_combos), np.repeat(m.spot, n_combos),
+                                    np.repeat(m.score_vol, n_combos), m.days, m.rate)
+        expected = np.where((cand_prices > 0).all(axis=-1), expected.reshape(n, n_combos), -np.inf)
+        best = expected.argmax(axis=1)
+        rows = np.arange(n)
+        return cand_strikes[rows, best], cand_prices[rows, best], np.isfinite(expected[rows, best])
+
+    return Rule(strategy_type, pick, f"top {strategy_type} by lognormal score")
+
+
+def backtest(history, rule, days=30, weekday=4, qty=1, vol_window=21, vol_premium=1.1, rate=0.0, spread=0.03,
+             start=None, end=None):
+    """按 rule 在每个入场日开仓、持有到期，返回逐笔交易 DataFrame（每个入场日一行）。
+
+    没有历史期权链，开仓价一律用模型报价：波动率取截至入场日的 vol_window 日已实现波动率 × vol_premium
+    （隐含波动率通常高于已实现），bid/ask 在理论价两侧加 spread；排名和 expected_profit 用的分布
+    取已实现波动率本身。到期盈亏按到期日（或之前最后一个交易日）的收盘价结算。
+    """
+    close = history["Close"].astype(float)
+    vol = realized_vol(close, vol_window).to_numpy()
+    entry, exit_ = entry_schedule(close.index, days, weekday, start, end)
+    ok = np.isfinite(vol[entry]) & (vol[entry] > 0)
+    entry, exit_ = entry[ok], exit_[ok]
+    prices_close = close.to_numpy()
+    spot = prices_close[entry]
+    market = EntryMarket(spot, vol[entry] * vol_premium, vol[entry], days, rate, spread)
+    strikes, prices, ok = rule.pick(market)
+    entry, exit_, spot, strikes, prices = entry[ok], exit_[ok], spot[ok], strikes[ok], prices[ok]
+
+    qtys = np.full(len(entry), qty)
+    legs = candidate_legs(rule.strategy_type, strikes, prices, qtys)
+    payoff = compile_legs(legs)
+    exit_spot = prices_close[exit_]
+    expected, pop = scaled_scores(rule.strategy_type, strikes, prices, qtys, spot, vol[entry], days, rate)
+    return pd.DataFrame({
+        "entry": close.index[entry],
+        "expiry": close.index[exit_],
+        "strategy": rule.strategy_type,
+        "spot": spot,
+        "exit_spot": exit_spot,
+        "vol": vol[entry],
+        **{f"strike{j + 1}": strikes[:, j] for j in range(strikes.shape[1])},
+        **{f"price{j + 1}": prices[:, j] for j in range(prices.shape[1])},
+        "cost": (legs["qty"] * legs["premium"]).sum(axis=1) * 100,
+        "expected_profit": expected,
+        "pop": pop,
+        "max_loss": payoff_extremes(payoff)["max_loss"],
+        "pnl": payoff_values(payoff, exit_spot[:, None])[:, 0],
+    })
+
+
+def equity_curve(trades):
+    # 按到期结算顺序累计盈亏（持仓期重叠，以结算日记账）
+    return trades.sort_values("expiry", kind="stable").set_index("expiry")["pnl"].cumsum()
+
+
+def summarize(trades):
+    if trades.empty:
+        return {"trades": 0}
+    curve = equity_curve(trades)
+    return {
+        "trades": len(trades),
+        "win_rate": float((trades["pnl"] > 0).mean()),
+        "total_pnl": float(trades["pnl"].sum()),
+        "avg_pnl": float(trades["pnl"].mean()),
+        "avg_expected": float(trades["expected_profit"].mean()),
+        "avg_pop": float(trades["pop"].mean()),
+        "worst_trade": float(trades["pnl"].min()),
+        "max_drawdown": float((curve - curve.cummax().clip(lower=0)).min()),
+    }
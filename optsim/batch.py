@@ -0,0 +1,120 @@
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date
+
+import pandas as pd
+
+from optsim.chains import default_cache
+from optsim.quotes import QuoteIndex
+from optsim.strategies import enumerate_strategies
+from optsim.topk import TopK
+
+# 每完成一个标的（成功或失败）推送一次：当前跨标的 top N 表 + 进度
+ScanUpdate = namedtuple("ScanUpdate", ["done", "total", "symbol", "error", "leaderboard"])
+
+LEADERBOARD_COLUMNS = ["symbol", "expiry", "strategy", "strikes", "prices", "cost", "expected_profit", "pop"]
+
+
+def parse_watchlist(text):
+    symbols = [s.strip().upper() for s in text.replace(",", " ").split()]
+    return list(dict.fromkeys(s for s in symbols if s))
+
+
+def pick_expiry(expirations, min_days=0, today=None):
+    # 距今至少 min_days 天的最近一个到期日
+    today = today or date.today()
+    for expiry in sorted(expirations):
+        if (date.fromisoformat(expiry) - today).days >= min_days:
+            return expiry
+    return None
+
+
+def _fetch(cache, symbol, min_days, strike_band):
+    expiry = pick_expiry(cache.expirations(symbol), min_days)
+    if expiry is None:
+        raise ValueError(f"no expiration at least {min_days} days out")
+    chain = cache.option_chain(symbol, expiry)
+    spot = cache.underlying_price(symbol)
+    if spot <= 0:
+        raise ValueError("no underlying price")
+    lo, hi = spot * strike_band[0], spot * strike_band[1]
+    calls = chain.calls[(chain.calls["strike"] >= lo) & (chain.calls["strike"] <= hi)]
+    puts = chain.puts[(chain.puts["strike"] >= lo) & (chain.puts["strike"] <= hi)]
+    cols = [c for c in ("strike", "bid", "ask", "lastPrice", "impliedVolatility", "volume") if c in chain.calls]
+    return expiry, calls[cols], puts[cols], spot
+
+
+def scan_symbol(symbol, expiry, calls, puts, spot, strategy_type, top_n, options):
+    """单个标的的策略枚举，在子进程里运行；只回传排名行，不回传盈亏曲线。
+
+    各标的都按对数正态（平值 IV）下的期望盈亏排名，跨标的可直接比较。
+    """
+    days = max((date.fromisoformat(expiry) - date.today()).days, 0)
+    found = enumerate_strategies(strategy_type, QuoteIndex(calls), QuoteIndex(puts), spot,
+                                 top_n=top_n, with_pnl=False, days=days, **options)
+    return [{
+        "symbol": symbol,
+        "expiry": expiry,
+        "strategy": s["type"],
+        "strikes": ", ".join(f"{k:.2f}" for k in s["strikes"]),
+        "prices": ", ".join(f"{p:.2f}" for p in s["prices"]),
+        "cost": round(float(s["cost"]), 2),
+        "expected_profit": round(float(s["expected_profit"]), 2),
+        "pop": round(float(s["pop"]), 3),
+    } for s in found]
+
+
+def iter_watchlist_scan(symbols, strategy_type, top_n=20, min_days=7, strike_band=(0.7, 1.3),
+                        fetch_workers=8, process_workers=None, cache=None, **options):
+    """并发拉取整个观察列表的期权链，在进程池里逐个枚举，边算边产出 ScanUpdate。
+
+    某个标的拉取或计算失败只会在对应的 ScanUpdate.error 里体现，不影响其他标的。
+    """
+    cache = cache or default_cache
+    symbols = list(symbols)
+    total = len(symbols)
+    board = TopK(top_n)
+    done = 0
+
+    def leaderboard():
+        return pd.DataFrame(board.items(), columns=LEADERBOARD_COLUMNS)
+
+    # spawn 避免在 Streamlit 这类多线程进程里 fork
+    ctx = multiprocessing.get_context("spawn")
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers, \
+            ProcessPoolExecutor(max_workers=process_workers, mp_context=ctx) as workers:
+        pending = {fetchers.submit(_fetch, cache, s, min_days, strike_band): ("fetch", s) for s in symbols}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, symbol = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    done += 1
+                    yield ScanUpdate(done, total, symbol, f"{type(e).__name__}: {e}", leaderboard())
+                    continue
+
+                if stage == "fetch":
+                    expiry, calls, puts, spot = result
+                    job = workers.submit(scan_symbol, symbol, expiry, calls, puts, spot,
+                                         strategy_type, top_n, options)
+                    pending[job] = ("scan", symbol)
+                    continue
+
+                for row in result:
+                    board.push(row["expected_profit"], row)
+                done += 1
+                yield ScanUpdate(done, total, symbol, None, leaderboard())
+
+
+def scan_watchlist(symbols, strategy_type, **kwargs):
+    """跑完整个观察列表，返回 (top N 表, {symbol: 错误信息})。"""
+    errors = {}
+    board = pd.DataFrame(columns=LEADERBOARD_COLUMNS)
+    for update in iter_watchlist_scan(symbols, strategy_type, **kwargs):
+        board = update.leaderboard
+        if update.error:
+            errors[update.symbol] = update.error
+    return board, errors
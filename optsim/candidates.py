@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from optsim.payoffs import candidate_legs, compile_legs, payoff_values, strategy_metrics
+from optsim.topk import top_k_indices
+
+
+class CandidateSet:
+    """同一策略类型的一批候选，按列存放（struct-of-arrays）。
+
+    strikes / prices 为 (n, 腿数) 的定宽数组，qty / cost / expected_profit / pop 为 (n,)；
+    expected_profit 为 NaN 表示不参与排名，pop（盈利概率）未计算时为 NaN。
+    盈亏曲线和展示用字符串只在取行时按需生成。
+    """
+
+    def __init__(self, strategy_type, strikes, prices, qty, cost, expected_profit, pop=None):
+        self.strategy_type = strategy_type
+        self.strikes = np.asarray(strikes, dtype=float)
+        self.prices = np.asarray(prices, dtype=float)
+        self.qty = np.asarray(qty, dtype=np.int32)
+        self.cost = np.asarray(cost, dtype=float)
+        self.expected_profit = np.asarray(expected_profit, dtype=float)
+        self.pop = np.full(len(self.cost), np.nan) if pop is None else np.asarray(pop, dtype=float)
+
+    def __len__(self):
+        return len(self.cost)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.strikes, self.prices, self.qty, self.cost, self.expected_profit, self.pop))
+
+    def take(self, idx):
+        return CandidateSet(self.strategy_type, self.strikes[idx], self.prices[idx], self.qty[idx],
+                            self.cost[idx], self.expected_profit[idx], self.pop[idx])
+
+    def top(self, k):
+        # 按 expected_profit 取前 k 个，并列时保持枚举顺序
+        ranked = np.flatnonzero(~np.isnan(self.expected_profit))
+        return self.take(ranked[top_k_indices(self.expected_profit[ranked], k)])
+
+    # ---- 按需生成 ----
+    def legs(self):
+        return candidate_legs(self.strategy_type, self.strikes, self.prices, self.qty)
+
+    def payoff(self, multiplier=100):
+        return compile_legs(self.legs(), multiplier)
+
+    def pnl_curves(self, underlying):
+        # 全部候选在同一价格网格上的到期盈亏，一次广播求出 (n, 300)
+        spot_range = np.linspace(underlying * 0.7, underlying * 1.3, 300)
+        return payoff_values(self.payoff(), spot_range)
+
+    def pnl(self, i, underlying):
+        return self.take([i]).pnl_curves(underlying)[0]
+
+    def row(self, i, underlying=None):
+        strikes, prices, qty = self.strikes[i].tolist(), self.prices[i].tolist(), int(self.qty[i])
+        row = {
+            "type": self.strategy_type,
+            "strikes": strikes,
+            "prices": prices,
+            "qty": qty,
+            **strategy_metrics(self.strategy_type, strikes, prices, qty),
+            # 排名用的期望收益以候选集里的为准（可能来自对数正态模型）
+            "expected_profit": float(self.expected_profit[i]),
+            "pop": float(self.pop[i]),
+        }
+        if underlying is not None:
+            row["pnl"] = self.pnl(i, underlying)
+        return row
+
+    def rows(self, underlying=None):
+        rows = [self.row(i) for i in range(len(self))]
+        if underlying is not None and rows:
+            for row, pnl in zip(rows, self.pnl_curves(underlying)):
+                row["pnl"] = pnl
+        return rows
+
+    def to_frame(self):
+        return pd.DataFrame({
+            "type": self.strategy_type,
+            **{f"strike{j + 1}": self.strikes[:, j] for j in range(self.strikes.shape[1])},
+            **{f"price{j + 1}": self.prices[:, j] for j in range(self.prices.shape[1])},
+            "qty": self.qty,
+            "cost": self.cost,
+            "expected_profit": self.expected_profit,
+            "pop": self.pop,
+        })
@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+from optsim.shared import SharedCache, shared_cache
+
+OptionChain = namedtuple("OptionChain", ["calls", "puts"])
+
+
+def yf_ticker(symbol):
+    # yfinance 导入要 0.2 秒以上，只在第一次真正联网拉数据时才导入
+    import yfinance as yf
+
+    return yf.Ticker(symbol)
+
+
+class ChainCache:
+    """到期日 / 期权链 / 标的现价的进程内缓存，所有 app 共用同一个实例。
+
+    每类数据有默认 TTL，可按 symbol 或 (symbol, expiry) 单独覆盖。期权链存放在 store
+    （SharedCache）的 "chain" 名下，与派生数据共用一个字节上限做 LRU 淘汰；不给 store 时
+    建一个上限为 max_bytes 的私有 store。返回的 DataFrame 是共享的，调用方只能筛选不能原地修改。
+    """
+
+    def __init__(self, expirations_ttl=3600.0, chain_ttl=300.0, price_ttl=60.0,
+                 max_bytes=256 * 1024 * 1024, ticker_factory=None, clock=time.monotonic, store=None):
+        self.expirations_ttl = expirations_ttl
+        self.chain_ttl = chain_ttl
+        self.price_ttl = price_ttl
+        self.store = store or SharedCache(max_bytes)
+        self._ticker_factory = ticker_factory or yf_ticker
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tickers = {}
+        self._meta = {}  # ("exp"|"px", symbol) -> (value, fetched_at)
+        self._ttl_overrides = {}
+        self.hits = 0
+        self.misses = 0
+
+    # ---- 配置 ----
+    def set_ttl(self, symbol, seconds, expiry=None):
+        # expiry=None 表示对该标的所有到期日生效
+        with self._lock:
+            self._ttl_overrides[(symbol.upper(), expiry)] = seconds
+
+    def _chain_ttl(self, symbol, expiry):
+        for key in ((symbol, expiry), (symbol, None)):
+            if key in self._ttl_overrides:
+                return self._ttl_overrides[key]
+        return self.chain_ttl
+
+    def _ticker(self, symbol):
+        with self._lock:
+            ticker = self._tickers.get(symbol)
+            if ticker is None:
+                ticker = self._tickers[symbol] = self._ticker_factory(symbol)
+            return ticker
+
+    # ---- 读取 ----
+    def _cached_meta(self, kind, symbol, ttl, fetch):
+        key = (kind, symbol)
+        now = self._clock()
+        with self._lock:
+            entry = self._meta.get(key)
+            if entry is not None and now - entry[1] < ttl:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = fetch()
+        with self._lock:
+            self._meta[key] = (value, now)
+        return value
+
+    def expirations(self, symbol):
+        symbol = symbol.upper()
+        return self._cached_meta("exp", symbol, self.expirations_ttl,
+                                 lambda: tuple(self._ticker(symbol).options))
+
+    def underlying_price(self, symbol, max_age=None):
+        # max_age：调用方能接受的最大数据年龄（秒），比 TTL 短时按它判断是否重新拉取
+        symbol = symbol.upper()
+
+        def fetch():
+            hist = self._ticker(symbol).history(period="1d")
+            return float(hist["Close"].iloc[-1]) if not hist.empty else 0.0
+
+        ttl = self.price_ttl if max_age is None else min(self.price_ttl, max_age)
+        return self._cached_meta("px", symbol, ttl, fetch)
+
+    def history(self, symbol, period="1y", start=None):
+        # 长历史日线不放进内存缓存（由 HistoryCache 落盘），这里只复用同一个 ticker
+        ticker = self._ticker(symbol.upper())
+        return ticker.history(start=start) if start is not None else ticker.history(period=period)
+
+    def option_chain(self, symbol, expiry, max_age=None):
+        """取期权链；max_age 比 TTL 短时按它判断新鲜度（实时刷新用）。
+
+        过期才重新拉取，新版本照常放入共享缓存，其他会话下次读取直接拿到；
+        不会为了刷新而让整条链失效。
+        """
+        symbol = symbol.upper()
+        key = (symbol, expiry)
+        now = self._clock()
+        ttl = self._chain_ttl(symbol, expiry)
+        if max_age is not None:
+            ttl = min(ttl, max_age)
+        entry = self.store.get("chain", key, valid=lambda e: now - e[1] < ttl)
+        with self._lock:
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        raw = self._ticker(symbol).option_chain(expiry)
+        chain = OptionChain(raw.calls, raw.puts)
+        # 新版本放入前清掉旧版本及由它派生的条目
+        self._discard(symbol, expiry)
+        self.store.put("chain", key, (chain, now))
+        return chain
+
+    def snapshot_key(self, symbol, expiry):
+        # 当前缓存中这条期权链的版本标识，重新拉取后会变化；用于派生数据（Greeks 等）的缓存
+        symbol = symbol.upper()
+        entry = self.store.peek("chain", (symbol, expiry))
+        return None if entry is None else (symbol, expiry, entry[1])
+
+    # ---- 失效 ----
+    def _discard(self, symbol=None, expiry=None):
+        # 期权链本身的键是 (symbol, expiry)；派生数据的键以 snapshot_key = (symbol, expiry, fetched_at) 开头
+        def match(namespace, key):
+            if namespace == "chain":
+                owner = key
+            elif isinstance(key, tuple) and key and isinstance(key[0], tuple) and len(key[0]) == 3:
+                owner = key[0][:2]
+            else:
+                return False
+            return symbol in (None, owner[0]) and expiry in (None, owner[1])
+
+        self.store.discard(match)
+
+    def invalidate(self, symbol=None, expiry=None):
+        with self._lock:
+            if symbol is None:
+                self._meta.clear()
+            elif expiry is None:
+                self._meta.pop(("exp", symbol.upper()), None)
+                self._meta.pop(("px", symbol.upper()), None)
+        self._discard(symbol and symbol.upper(), expiry)
+
+    def stats(self):
+        chains = self.store.stats()["namespaces"].get("chain", {})
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": chains.get("evictions", 0),
+                "chains": chains.get("entries", 0),
+                "chain_bytes": chains.get("bytes", 0),
+                "max_bytes": self.store.max_bytes,
+            }
+
+
+PROVIDERS = ("yfinance", "snapshot", "synthetic")
+
+
+def provider_factory(provider="yfinance", snapshot_dir=None, at=None, **options):
+    """行情源：返回 ticker_factory(symbol)，得到的对象与 yf.Ticker 同接口
+    （options / option_chain(expiry) / history(period)），ChainCache 只依赖这三样。
+
+    - yfinance：联网拉取
+    - snapshot：完全离线，从 snapshot_dir 回放（at 可指定回放时刻）
+    - synthetic：完全离线，由 SyntheticMarket(**options) 合成任意规模的期权链
+    yfinance / synthetic 给出 snapshot_dir 时顺带把每次拉取写成 Parquet 快照。
+    """
+    if provider == "snapshot":
+        if not snapshot_dir:
+            raise ValueError("snapshot provider needs snapshot_dir")
+        from optsim.snapshots import SnapshotStore
+
+        store = SnapshotStore(snapshot_dir)
+        return lambda symbol: store.ticker(symbol, at)
+    if provider == "synthetic":
+        from optsim.synthetic import SyntheticMarket
+
+        live = SyntheticMarket(**options).ticker
+    elif provider == "yfinance":
+        live = yf_ticker
+    else:
+        raise ValueError(f"unknown provider: {provider} (choose from {', '.join(PROVIDERS)})")
+    if not snapshot_dir:
+        return live
+    from optsim.snapshots import RecordingTicker, SnapshotStore
+
+    store = SnapshotStore(snapshot_dir)
+    return lambda symbol: RecordingTicker(symbol, live(symbol), store)
+
+
+def ticker_factory_from_env():
+    """按环境变量选择行情源：OPTSIM_PROVIDER（缺省 yfinance，设置了 OPTSIM_REPLAY=1 时缺省 snapshot）、
+    OPTSIM_SNAPSHOT_DIR、OPTSIM_REPLAY_AT；合成行情另有 OPTSIM_SYNTHETIC_STRIKES / OPTSIM_SYNTHETIC_SEED /
+    OPTSIM_SYNTHETIC_REQUOTE（每次刷新重新报价的执行价比例）。"""
+    provider = os.environ.get("OPTSIM_PROVIDER") or ("snapshot" if os.environ.get("OPTSIM_REPLAY") else "yfinance")
+    options = {}
+    if provider == "synthetic":
+        options = dict(n_strikes=int(os.environ.get("OPTSIM_SYNTHETIC_STRIKES", 150)),
+                       seed=int(os.environ.get("OPTSIM_SYNTHETIC_SEED", 0)),
+                       requote_frac=float(os.environ.get("OPTSIM_SYNTHETIC_REQUOTE", 0.0)))
+    return provider_factory(provider, os.environ.get("OPTSIM_SNAPSHOT_DIR"), os.environ.get("OPTSIM_REPLAY_AT") or None,
+                            **options)
+
+
+# 模块只会被导入一次，所以这个实例在 Streamlit 的多次 rerun 和多个会话之间共享；
+# 期权链与各 app 的派生数据放在同一个 shared_cache 里，共用一个字节上限
+default_cache = ChainCache(ticker_factory=ticker_factory_from_env(), store=shared_cache)
+
+
+def get_expirations(symbol):
+    return default_cache.expirations(symbol)
+
+
+def get_option_chain(symbol, expiry):
+    return default_cache.option_chain(symbol, expiry)
+
+
+def get_underlying_price(symbol):
+    return default_cache.underlying_price(symbol)
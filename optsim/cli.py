@@ -0,0 +1,190 @@
+"""命令行批量模拟：python -m optsim {scan,simulate} ...，结果写成 JSON 或 Parquet，不需要 Streamlit。"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from optsim.backtest import backtest, delta_rule, summarize, top_ranked_rule
+from optsim.batch import pick_expiry, scan_watchlist
+from optsim.chains import PROVIDERS, ChainCache, provider_factory
+from optsim.history import HistoryCache
+from optsim.monte_carlo import TerminalDistribution
+from optsim.simulate import SIMULATED_STRATEGIES, model_inputs, simulate
+from optsim.strategies import STRATEGY_TYPES, WING_LIMITED
+from optsim.time_spreads import load_term_chains, scan_time_spreads
+
+
+def make_cache(args):
+    # 数据来源：实时拉取（可顺带记录快照）、--replay 离线回放快照目录，或离线合成行情
+    provider = "snapshot" if args.replay else args.provider
+    options = dict(n_strikes=args.synthetic_strikes) if provider == "synthetic" else {}
+    try:
+        factory = provider_factory(provider, args.snapshot_dir, args.replay_at, **options)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return ChainCache(ticker_factory=factory)
+
+
+def write_frame(df, out):
+    """按扩展名写出：.parquet / .json；不给或为 - 时把 JSON 打到标准输出。"""
+    if out in (None, "-"):
+        sys.stdout.write(df.to_json(orient="records", indent=2) + "\n")
+    elif out.endswith(".parquet"):
+        df.to_parquet(out, index=False)
+    elif out.endswith(".json"):
+        df.to_json(out, orient="records", indent=2)
+    else:
+        raise SystemExit(f"unsupported output format: {out} (use .json or .parquet)")
+
+
+def run_scan(args):
+    options = {}
+    if args.strategy in WING_LIMITED:
+        options["max_wing_width"] = args.max_wing_width
+    if args.strategy == "Iron Condor":
+        options["min_credit"] = args.min_credit
+    board, errors = scan_watchlist(args.symbols, args.strategy, top_n=args.top_n, min_days=args.min_days,
+                                   strike_band=tuple(args.strike_band), process_workers=args.workers,
+                                   cache=make_cache(args), **options)
+    for symbol, error in errors.items():
+        print(f"{symbol}: {error}", file=sys.stderr)
+    write_frame(board, args.out)
+    return 1 if errors and board.empty else 0
+
+
+def run_simulate(args):
+    cache = make_cache(args)
+    symbol = args.symbol.upper()
+    expiry = args.expiry or pick_expiry(cache.expirations(symbol), args.min_days)
+    if expiry is None:
+        raise SystemExit(f"{symbol}: no expiration at least {args.min_days} days out")
+    chain = cache.option_chain(symbol, expiry)
+    spot = cache.underlying_price(symbol)
+
+    # 价格区间缺省取现价上下 30%
+    lo = args.min_price if args.min_price is not None else spot * 0.7
+    hi = args.max_price if args.max_price is not None else spot * 1.3
+    if lo >= hi:
+        raise SystemExit("--min-price must be below --max-price")
+    prices = np.arange(lo, hi + args.step, args.step)
+
+    model = None
+    if args.score != "grid":
+        model = model_inputs(spot, expiry, chain.calls, chain.puts, args.vol)
+        if args.score == "mc":
+            model = TerminalDistribution.lognormal(*model, n_paths=args.paths, seed=args.seed)
+
+    rows = simulate(args.strategy, chain.calls, chain.puts, prices, args.top_k, model, args.invest_limit)
+    df = pd.DataFrame(rows)
+    if not args.with_pnl:
+        df = df.drop(columns="PnL", errors="ignore")
+    df.insert(0, "symbol", symbol)
+    df.insert(1, "expiry", expiry)
+    df.insert(2, "strategy", args.strategy)
+    write_frame(df, args.out)
+    return 0
+
+
+def run_calendar(args):
+    cache = make_cache(args)
+    symbol = args.symbol.upper()
+    chains, errors = load_term_chains(symbol, min_days=args.min_days, max_days=args.max_days, cache=cache)
+    for expiry, error in errors.items():
+        print(f"{symbol} {expiry}: {error}", file=sys.stderr)
+    ranked = scan_time_spreads(chains, cache.underlying_price(symbol), args.kind, args.max_offset, args.top_n)
+    ranked.insert(0, "symbol", symbol)
+    write_frame(ranked, args.out)
+    return 0
+
+
+def run_backtest(args):
+    history = HistoryCache(args.history_dir, make_cache(args)).load(args.symbol, args.period)
+    try:
+        if args.delta is not None:
+            rule = delta_rule(args.strategy, args.delta, args.strike_step)
+        else:
+            rule = top_ranked_rule(args.strategy, max_wing_pct=args.max_wing_pct)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    trades = backtest(history, rule, days=args.days, weekday=args.weekday, vol_premium=args.vol_premium,
+                      spread=args.spread, start=args.start, end=args.end)
+    for key, value in summarize(trades).items():
+        print(f"{key}: {value:.4g}" if isinstance(value, float) else f"{key}: {value}", file=sys.stderr)
+    trades.insert(0, "symbol", args.symbol.upper())
+    trades["entry"] = trades["entry"].astype(str)
+    trades["expiry"] = trades["expiry"].astype(str)
+    write_frame(trades, args.out)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m optsim", description=__doc__)
+    source = argparse.ArgumentParser(add_help=False)
+    source.add_argument("--provider", choices=PROVIDERS, default="yfinance", help="market data source")
+    source.add_argument("--synthetic-strikes", type=int, default=150, help="strikes per synthetic chain")
+    source.add_argument("--snapshot-dir", help="record fetched chains here, or replay from here with --replay")
+    source.add_argument("--replay", action="store_true", help="same as --provider snapshot (offline)")
+    source.add_argument("--replay-at", help="replay the latest snapshot at or before this timestamp")
+    source.add_argument("--out", help="output file (.json or .parquet); JSON to stdout when omitted")
+    source.add_argument("--min-days", type=int, default=7, help="use the nearest expiry at least this many days out")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scan = sub.add_parser("scan", parents=[source], help="rank one strategy type across a watchlist")
+    scan.add_argument("symbols", nargs="+", type=str.upper)
+    scan.add_argument("--strategy", choices=STRATEGY_TYPES, default="Bull Call Spread")
+    scan.add_argument("--top-n", type=int, default=20)
+    scan.add_argument("--strike-band", type=float, nargs=2, default=(0.7, 1.3), metavar=("LO", "HI"),
+                      help="keep strikes within spot * [LO, HI]")
+    scan.add_argument("--max-wing-width", type=float, default=10.0,
+                      help="max wing width / strike spacing for condors, butterflies and spreads")
+    scan.add_argument("--min-credit", type=float, default=0.1)
+    scan.add_argument("--workers", type=int, default=None, help="process pool size")
+    scan.set_defaults(func=run_scan)
+
+    sim = sub.add_parser("simulate", parents=[source], help="app.py's price-range simulator for one symbol")
+    sim.add_argument("symbol")
+    sim.add_argument("--expiry")
+    sim.add_argument("--strategy", choices=SIMULATED_STRATEGIES, default="Bull Call Spread")
+    sim.add_argument("--min-price", type=float)
+    sim.add_argument("--max-price", type=float)
+    sim.add_argument("--step", type=float, default=2.0)
+    sim.add_argument("--invest-limit", type=float, default=500.0)
+    sim.add_argument("--top-k", type=int, default=5)
+    sim.add_argument("--score", choices=["lognormal", "mc", "grid"], default="lognormal")
+    sim.add_argument("--vol", type=float, default=0.0, help="annual vol; 0 = ATM implied vol")
+    sim.add_argument("--paths", type=int, default=100_000)
+    sim.add_argument("--seed", type=int, default=42)
+    sim.add_argument("--with-pnl", action="store_true", help="include the PnL curve of each row")
+    sim.set_defaults(func=run_simulate)
+
+    cal = sub.add_parser("calendar", parents=[source], help="calendar / diagonal spreads across expirations")
+    cal.add_argument("symbol")
+    cal.add_argument("--kind", choices=["call", "put"], default="call")
+    cal.add_argument("--max-offset", type=float, default=0.0, help="max |back strike - front strike|; 0 = calendars")
+    cal.add_argument("--max-days", type=int, default=None, help="ignore back expirations further out than this")
+    cal.add_argument("--top-n", type=int, default=20)
+    cal.set_defaults(func=run_calendar)
+
+    bt = sub.add_parser("backtest", parents=[source], help="replay an entry rule over the price history")
+    bt.add_argument("symbol")
+    bt.add_argument("--strategy", choices=STRATEGY_TYPES, default="Sell Put")
+    bt.add_argument("--delta", type=float, help="sell the option at this delta (Sell Put / Sell Call); "
+                                                "default is the top-ranked candidate by lognormal score")
+    bt.add_argument("--strike-step", type=float, default=1.0)
+    bt.add_argument("--max-wing-pct", type=float, help="max wing width in %% of spot for spreads / butterflies")
+    bt.add_argument("--days", type=int, default=30, help="days to expiration at entry")
+    bt.add_argument("--weekday", type=int, default=4, help="entry weekday, 0 = Monday ... 4 = Friday")
+    bt.add_argument("--period", default="10y")
+    bt.add_argument("--start")
+    bt.add_argument("--end")
+    bt.add_argument("--vol-premium", type=float, default=1.1, help="implied / realized vol used for entry quotes")
+    bt.add_argument("--spread", type=float, default=0.03, help="bid/ask spread as a fraction of the model price")
+    bt.add_argument("--history-dir", help="on-disk price history cache (default ~/.cache/optsim/history)")
+    bt.set_defaults(func=run_backtest)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from optsim.pricing import DAYS_PER_YEAR, KIND_CALL, KIND_STOCK, ndtr
+from optsim.shared import shared_cache
+
+GREEKS = ("delta", "gamma", "theta", "vega")
+
+
+def _npdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def bs_greeks(spot, strike, years, vol, is_call, rate=0.0):
+    """Black-Scholes Greeks，参数可任意广播。theta 为每日、vega 为每 1 个波动率点。
+
+    到期（years <= 0）或波动率为 0 时 delta 取内在价值方向，其余为 0。
+    """
+    spot, strike, years, vol = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (spot, strike, years, vol)))
+    is_call = np.asarray(is_call, dtype=bool)
+    t = np.maximum(years, 0.0)
+    sqrt_t = np.sqrt(t)
+    sig_t = vol * sqrt_t
+    live = sig_t > 0
+    safe_sig_t = np.where(live, sig_t, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = np.where(live, (np.log(spot / strike) + (rate + 0.5 * vol ** 2) * t) / safe_sig_t, 0.0)
+    d2 = d1 - sig_t
+    pdf = _npdf(d1)
+    disc_k = strike * np.exp(-rate * t)
+
+    expiry_delta = np.where(is_call, (spot > strike).astype(float), -(spot < strike).astype(float))
+    delta = np.where(live, np.where(is_call, ndtr(d1), ndtr(d1) - 1.0), expiry_delta)
+    gamma = np.where(live, pdf / (spot * safe_sig_t), 0.0)
+    vega = np.where(live, spot * pdf * sqrt_t / 100.0, 0.0)
+    decay = -spot * pdf * vol / (2 * np.where(live, sqrt_t, 1.0))
+    theta = np.where(live, np.where(is_call, decay - rate * disc_k * ndtr(d2),
+                                    decay + rate * disc_k * ndtr(-d2)), 0.0) / DAYS_PER_YEAR
+    return {"delta": delta, "gamma": gamma, "theta": theta, "vega": vega}
+
+
+# ---- 整条期权链：按快照缓存在进程共享的 shared_cache 里 ----
+def chain_greeks(chain, spot, days, is_call, rate=0.0, snapshot=None, fallback_iv=0.3):
+    """一次算出整条 calls 或 puts 的 Greeks，返回与 chain 行对齐的 DataFrame。
+
+    snapshot 为期权链快照标识（见 ChainCache.snapshot_key）；给出时按
+    (snapshot, calls/puts, spot, days, rate) 在所有会话间共享，滑块等无关输入变化不会重算。
+    """
+    def compute():
+        iv = chain["impliedVolatility"].to_numpy(dtype=float) if "impliedVolatility" in chain else np.full(len(chain), np.nan)
+        iv = np.where(np.isfinite(iv) & (iv > 0), iv, fallback_iv)
+        g = bs_greeks(spot, chain["strike"].to_numpy(dtype=float), days / DAYS_PER_YEAR, iv, is_call, rate)
+        return pd.DataFrame({"strike": chain["strike"].to_numpy(), **g}, index=chain.index)
+
+    key = None
+    if snapshot is not None:
+        key = (snapshot, bool(is_call), float(spot), float(days), float(rate), float(fallback_iv))
+    return shared_cache.memo("greeks", key, compute)
+
+
+# ---- 策略 / 组合聚合 ----
+def legs_greeks(legs, spot, days, rate=0.0, multiplier=100):
+    """pack_legs 结果的每个策略的 Greeks 合计，返回 {名称: (策略数,)}，均已乘 qty × multiplier。
+
+    delta 为等值股数、gamma 为标的每变动 1 美元的 delta 股数变化，theta（每日）和 vega（每 1 个
+    波动率点）为美元。days 为各策略剩余天数（标量或 (策略,)）。正股腿 delta 为 1，其余为 0。
+    """
+    years = np.asarray(days, dtype=float)[..., None] / DAYS_PER_YEAR
+    g = bs_greeks(spot, legs["strike"], years, legs["vol"], legs["kind"] == KIND_CALL, rate)
+    stock = legs["kind"] == KIND_STOCK
+    weight = legs["qty"] * multiplier
+    out = {}
+    for name in GREEKS:
+        per_leg = np.where(stock, 1.0 if name == "delta" else 0.0, g[name])
+        out[name] = (per_leg * weight).sum(axis=-1)
+    return out
+
+
+def portfolio_greeks(legs, spot, days, rate=0.0, multiplier=100):
+    """组合合计 Greeks（所有策略 + 正股相加）。"""
+    return {name: float(v.sum()) for name, v in legs_greeks(legs, spot, days, rate, multiplier).items()}
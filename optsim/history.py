@@ -0,0 +1,54 @@
+"""标的长历史日线的磁盘缓存：回测要用多年的数据，拉一次存成 Parquet，之后只增量补最近几天。"""
+import os
+import time
+
+import pandas as pd
+
+from optsim.chains import default_cache
+
+
+def default_history_dir():
+    return os.environ.get("OPTSIM_HISTORY_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "optsim", "history")
+
+
+class HistoryCache:
+    """root/AMD_10y.parquet 形式的日线缓存。
+
+    文件在 max_age 秒内直接读盘；过期后只从最后一个交易日起向行情源补拉（history(start=...)），
+    与旧数据拼接后写回。行情源经 ChainCache，与各 app 使用同一套 provider。
+    """
+
+    def __init__(self, root=None, cache=None, max_age=12 * 3600.0):
+        self.root = root or default_history_dir()
+        self.cache = cache or default_cache
+        self.max_age = max_age
+        self.fetches = 0
+
+    def path(self, symbol, period):
+        return os.path.join(self.root, f"{symbol.upper()}_{period}.parquet")
+
+    def load(self, symbol, period="10y"):
+        path = self.path(symbol, period)
+        if os.path.exists(path):
+            hist = pd.read_parquet(path)
+            if time.time() - os.path.getmtime(path) < self.max_age or hist.empty:
+                return hist
+            fresh = self._fetch(symbol, start=hist.index[-1].strftime("%Y-%m-%d"))
+            if not fresh.empty:
+                hist = pd.concat([hist[hist.index < fresh.index[0]], fresh])
+        else:
+            hist = self._fetch(symbol, period=period)
+            if hist.empty:
+                raise ValueError(f"{symbol}: no price history")
+        os.makedirs(self.root, exist_ok=True)
+        hist.to_parquet(path)
+        return hist
+
+    def _fetch(self, symbol, period="10y", start=None):
+        self.fetches += 1
+        hist = self.cache.history(symbol, period=period, start=start)
+        return hist[[c for c in ("Open", "High", "Low", "Close", "Volume") if c in hist]]
+
+
+# 与 default_cache 一样在进程内共享；目录只在第一次写入时创建
+default_history = HistoryCache()
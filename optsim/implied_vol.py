@@ -0,0 +1,122 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from optsim.pricing import DAYS_PER_YEAR, bs_price
+
+# 每个合约的求解状态
+CONVERGED, MAX_ITER, BELOW_INTRINSIC, ABOVE_BOUND, BAD_INPUT = 0, 1, 2, 3, 4
+STATUS_NAMES = {
+    CONVERGED: "converged",
+    MAX_ITER: "max_iter",
+    BELOW_INTRINSIC: "below_intrinsic",
+    ABOVE_BOUND: "above_bound",
+    BAD_INPUT: "bad_input",
+}
+
+
+def implied_vol(price, spot, strike, years, is_call, rate=0.0, tol=1e-6, max_iter=50,
+                vol_lo=1e-4, vol_hi=5.0):
+    """批量反解 Black-Scholes 隐含波动率：牛顿法，跳出区间或 vega 过小时改用二分。
+
+    所有参数可广播。返回 (iv, diagnostics)，diagnostics 含 status / iterations /
+    residual 三个与 iv 同形状的数组；无解的合约 iv 为 NaN（原因见 status）。
+    """
+    price, spot, strike, years = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (price, spot, strike, years)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    shape = price.shape
+    price, spot, strike, years, is_call = (a.ravel() for a in (price, spot, strike, years, is_call))
+
+    status = np.full(price.shape, MAX_ITER, dtype=np.int8)
+    iterations = np.zeros(price.shape, dtype=np.int16)
+    iv = np.full(price.shape, np.nan)
+    residual = np.full(price.shape, np.nan)
+
+    bad = ~(np.isfinite(price) & np.isfinite(spot) & np.isfinite(strike) & np.isfinite(years)) \
+        | (price <= 0) | (spot <= 0) | (strike <= 0) | (years <= 0)
+    disc_k = strike * np.exp(-rate * np.where(bad, 0.0, years))
+    lower = np.where(is_call, np.maximum(spot - disc_k, 0.0), np.maximum(disc_k - spot, 0.0))
+    upper = np.where(is_call, spot, disc_k)
+    status[bad] = BAD_INPUT
+    status[~bad & (price < lower - tol)] = BELOW_INTRINSIC
+    status[~bad & (price >= upper)] = ABOVE_BOUND
+
+    active = np.flatnonzero(status == MAX_ITER)
+    lo = np.full(active.shape, vol_lo)
+    hi = np.full(active.shape, vol_hi)
+    # Brenner-Subrahmanyam 近似作初值
+    vol = np.clip(np.sqrt(2 * np.pi / years[active]) * price[active] / spot[active], vol_lo * 2, vol_hi / 2)
+
+    for it in range(1, max_iter + 1):
+        if not len(active):
+            break
+        S, K, T, call, target = spot[active], strike[active], years[active], is_call[active], price[active]
+        diff = bs_price(S, K, T, vol, call, rate) - target
+        sqrt_t = np.sqrt(T)
+        d1 = (np.log(S / K) + (rate + 0.5 * vol ** 2) * T) / (vol * sqrt_t)
+        vega = S * np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi) * sqrt_t
+
+        done = np.abs(diff) < tol
+        iv[active[done]] = vol[done]
+        residual[active[done]] = diff[done]
+        status[active[done]] = CONVERGED
+        iterations[active] = it
+
+        # 价格关于波动率单调递增，据此收紧区间
+        hi = np.where(diff > 0, vol, hi)
+        lo = np.where(diff < 0, vol, lo)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            newton = vol - diff / vega
+        use_newton = (vega > 1e-8) & (newton > lo) & (newton < hi)
+        vol = np.where(use_newton, newton, 0.5 * (lo + hi))
+
+        keep = ~done
+        active, vol, lo, hi = active[keep], vol[keep], lo[keep], hi[keep]
+        if it == max_iter and len(active):
+            residual[active] = (bs_price(spot[active], strike[active], years[active], vol,
+                                         is_call[active], rate) - price[active])
+
+    diagnostics = {"status": status.reshape(shape), "iterations": iterations.reshape(shape),
+                   "residual": residual.reshape(shape)}
+    return iv.reshape(shape), diagnostics
+
+
+def chain_implied_vols(chain, spot, days, is_call, rate=0.0, **kwargs):
+    """整条 calls 或 puts 一次反解 bid / ask / mid 三组隐含波动率，返回与 chain 行对齐的表。"""
+    bid = chain["bid"].to_numpy(dtype=float)
+    ask = chain["ask"].to_numpy(dtype=float)
+    mid = np.where((bid > 0) & (ask > 0), 0.5 * (bid + ask), np.nan)
+    prices = np.stack([bid, ask, mid])
+    iv, diag = implied_vol(prices, spot, chain["strike"].to_numpy(dtype=float), days / DAYS_PER_YEAR,
+                           is_call, rate, **kwargs)
+    return pd.DataFrame({
+        "strike": chain["strike"].to_numpy(),
+        "iv_bid": iv[0], "iv_ask": iv[1], "iv_mid": iv[2],
+        "iv_status": pd.Categorical.from_codes(diag["status"][2], list(STATUS_NAMES.values())),
+        "iv_iterations": diag["iterations"][2],
+    }, index=chain.index)
+
+
+def repair_implied_vol(chain, spot, days, is_call, rate=0.0, min_iv=0.01):
+    """返回一份 impliedVolatility 修补过的链：Yahoo 给的 IV 缺失或过小（陈旧）时用 mid 反解值代替。"""
+    solved = chain_implied_vols(chain, spot, days, is_call, rate)["iv_mid"]
+    iv = chain["impliedVolatility"] if "impliedVolatility" in chain else pd.Series(np.nan, index=chain.index)
+    stale = ~(iv > min_iv)
+    return chain.assign(impliedVolatility=iv.where(~stale, solved))
+
+
+def add_implied_vols(chains, spot, rate=0.0, today=None, **kwargs):
+    """对 load_chains 的长表（含 expiry / side 列）一次性反解所有到期日、所有合约的 bid/ask/mid IV。"""
+    today = today or date.today()
+    expiry_days = {e: max((date.fromisoformat(e) - today).days, 0) for e in chains["expiry"].unique()}
+    years = chains["expiry"].map(expiry_days).to_numpy(dtype=float) / DAYS_PER_YEAR
+    bid = chains["bid"].to_numpy(dtype=float)
+    ask = chains["ask"].to_numpy(dtype=float)
+    mid = np.where((bid > 0) & (ask > 0), 0.5 * (bid + ask), np.nan)
+    iv, diag = implied_vol(np.stack([bid, ask, mid]), spot, chains["strike"].to_numpy(dtype=float), years,
+                           (chains["side"] == "call").to_numpy(), rate, **kwargs)
+    return chains.assign(
+        iv_bid=iv[0], iv_ask=iv[1], iv_mid=iv[2],
+        iv_status=pd.Categorical.from_codes(diag["status"][2], list(STATUS_NAMES.values())),
+    )
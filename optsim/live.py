@@ -0,0 +1,174 @@
+"""盘中实时刷新：定时重新拉链，与上一份报价逐执行价比较，只给腿落在变化执行价上的候选重新定价、打分，排行榜原地更新。"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from optsim.candidates import CandidateSet
+from optsim.lognormal import atm_vol, lognormal_scores
+from optsim.payoffs import LEG_TEMPLATES, candidate_legs, compile_legs
+from optsim.strategies import SPREAD_FAMILIES, candidate_metrics, strike_pairs, strike_triples
+from optsim.topk import top_k_indices
+
+# 一次刷新的统计：mode 为 full（全量枚举）/ rescore（现价变化，全部重新打分）/ incremental
+RefreshStats = namedtuple("RefreshStats", ["mode", "changed_calls", "changed_puts", "rescored", "candidates", "seconds"])
+
+# Covered Call 的正股腿按现价建仓，随现价整体变化，不适合按执行价增量刷新
+LIVE_STRATEGIES = ["Sell Put", "Sell Call", "Straddle", "Iron Condor", *SPREAD_FAMILIES]
+
+
+def universe_legs(strategy_type, call_quotes, put_quotes, max_wing_width=None):
+    """全部候选每条腿在 QuoteIndex 中的下标，返回与 LEG_TEMPLATES 同序的 [(是否看涨, 下标数组), ...]。
+
+    与 enumerate_candidates 不同，这里不按当前报价过滤、也不做 top_k 剪枝：刷新后任何组合都可能
+    变得有效或进入前 K，只由执行价结构（顺序、翼宽）决定候选集合。
+    """
+    if strategy_type in ("Sell Put", "Sell Call"):
+        is_call = strategy_type == "Sell Call"
+        return [(is_call, np.arange(len(call_quotes if is_call else put_quotes)))]
+    if strategy_type == "Straddle":
+        common = np.intersect1d(call_quotes.strikes, put_quotes.strikes)
+        return [(True, call_quotes.locate(common)), (False, put_quotes.locate(common))]
+    if strategy_type == "Iron Condor":
+        put_long, put_short = strike_pairs(put_quotes.strikes, max_wing_width)
+        call_short, call_long = strike_pairs(call_quotes.strikes, max_wing_width)
+        order = np.argsort(call_quotes.strikes[call_short], kind="stable")
+        call_short, call_long = call_short[order], call_long[order]
+        # 每个 put 价差只能配 short call 严格高于 short put 的 call 价差，排序后是一段后缀
+        start = np.searchsorted(call_quotes.strikes[call_short], put_quotes.strikes[put_short], side="right")
+        counts = len(call_short) - start
+        rows = np.repeat(np.arange(len(put_short)), counts)
+        cols = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(start, counts)
+        return [(False, put_long[rows]), (False, put_short[rows]), (True, call_short[cols]), (True, call_long[cols])]
+    if strategy_type in SPREAD_FAMILIES:
+        kind, wings = SPREAD_FAMILIES[strategy_type]
+        quotes = call_quotes if kind == "call" else put_quotes
+        combos = (strike_pairs(quotes.strikes, max_wing_width) if wings == "pairs"
+                  else strike_triples(quotes.strikes, max_wing_width, wings))
+        return [(kind == "call", c) for c in combos]
+    raise ValueError(f"live refresh does not support {strategy_type}")
+
+
+class LiveRanker:
+    """一个策略类型的全部候选常驻内存，报价刷新时增量重算并维护前 top_n 排行。
+
+    第一次 update（或执行价集合变化）时全量构建；之后与上一份 QuoteIndex 比较 bid/ask，只有
+    腿落在变化执行价上的候选重新定价、打分。对数正态评分用的现价和平值波动率固定为上次全量
+    打分时的值，现价相对偏离超过 spot_tol 时全部候选重新打分（不重新枚举）。
+
+    排行榜：重算的行都不在前 K、新分数也都没超过第 K 名时原样保留；只有新进入者时与前 K 合并；
+    前 K 中有候选变差或失效时才对全部候选重新选一次（O(n) partition）。
+    """
+
+    def __init__(self, strategy_type, top_n=10, qty=1, days=None, rate=0.0, max_wing_width=None,
+                 min_credit=0.0, spot_tol=0.002):
+        if strategy_type not in LIVE_STRATEGIES:
+            raise ValueError(f"live refresh does not support {strategy_type}")
+        self.strategy_type = strategy_type
+        self.top_n = top_n
+        self.qty = qty
+        self.days = days
+        self.rate = rate
+        self.max_wing_width = max_wing_width
+        self.min_credit = min_credit
+        self.spot_tol = spot_tol
+        # 买入腿取 ask、卖出腿取 bid，与 enumerate_candidates 一致（Straddle 为卖出跨式，两腿都按 bid 取价）
+        self._buy_side = [sign > 0 for _, sign, _, _ in LEG_TEMPLATES[strategy_type]]
+        self.calls = self.puts = None
+        self.board = np.empty(0, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.cost) if self.calls is not None else 0
+
+    def update(self, call_quotes, put_quotes, spot):
+        started = time.perf_counter()
+        changed_calls = changed_puts = None
+        if self.calls is not None:
+            changed_calls, changed_puts = call_quotes.changed(self.calls), put_quotes.changed(self.puts)
+        self.calls, self.puts = call_quotes, put_quotes
+
+        if changed_calls is None or changed_puts is None:
+            mode, rows = "full", self._build(spot)
+        elif abs(spot / self.spot - 1) > self.spot_tol:
+            mode, rows = "rescore", np.arange(len(self))
+            self._set_model(spot)
+            self._score(rows)
+            self._rank_all()
+        else:
+            mode = "incremental"
+            touched = np.zeros(len(self), dtype=bool)
+            for is_call, idx in self.legs:
+                touched |= (changed_calls if is_call else changed_puts)[idx]
+            rows = np.flatnonzero(touched)
+            before = self.expected_profit[rows].copy()
+            self._score(rows)
+            self._update_board(rows, before)
+        return RefreshStats(mode, int(changed_calls.sum()) if mode != "full" else len(call_quotes),
+                            int(changed_puts.sum()) if mode != "full" else len(put_quotes),
+                            len(rows), len(self), time.perf_counter() - started)
+
+    # ---- 全量 / 部分打分 ----
+    def _set_model(self, spot):
+        self.spot = spot
+        self.vol = atm_vol(self.calls, self.puts, spot)
+
+    def _build(self, spot):
+        self.legs = universe_legs(self.strategy_type, self.calls, self.puts, self.max_wing_width)
+        self.strikes = np.column_stack([(self.calls if is_call else self.puts).strikes[idx] for is_call, idx in self.legs])
+        n = len(self.strikes)
+        self.prices = np.zeros(self.strikes.shape)
+        self.cost = np.zeros(n)
+        self.expected_profit = np.full(n, np.nan)
+        self.pop = np.full(n, np.nan)
+        self._set_model(spot)
+        rows = np.arange(n)
+        self._score(rows)
+        self._rank_all()
+        return rows
+
+    def _score(self, rows):
+        # 只对 rows 重新取价、算成本和期望；任何一腿无报价（或铁鹰净权利金不足）的候选不参与排名
+        mult = self.qty * 100
+        prices = np.column_stack([(self.calls if is_call else self.puts).side(is_buy=is_buy)[idx[rows]]
+                                  for (is_call, idx), is_buy in zip(self.legs, self._buy_side)])
+        strikes = self.strikes[rows]
+        cost, expected = candidate_metrics(self.strategy_type, strikes, prices, mult)
+        valid = (prices > 0).all(axis=1)
+        if self.strategy_type == "Iron Condor":
+            valid &= -cost >= self.min_credit * mult
+        pop = np.full(len(rows), np.nan)
+        if self.days is not None and valid.any():
+            qtys = np.full(int(valid.sum()), self.qty)
+            payoff = compile_legs(candidate_legs(self.strategy_type, strikes[valid], prices[valid], qtys))
+            scores = lognormal_scores(payoff, self.spot, self.vol, self.days, drift=self.rate)
+            expected = expected.astype(float)
+            expected[valid], pop[valid] = scores["expected_pnl"], scores["pop"]
+        self.prices[rows] = prices
+        self.cost[rows] = cost
+        self.expected_profit[rows] = np.where(valid, expected, np.nan)
+        self.pop[rows] = pop
+
+    # ---- 排行榜 ----
+    def _rank_all(self):
+        top = top_k_indices(self.expected_profit, self.top_n)
+        self.board = top[np.isfinite(self.expected_profit[top])]
+
+    def _update_board(self, rows, before):
+        if not len(rows):
+            return
+        after = self.expected_profit[rows]
+        in_board = np.isin(rows, self.board)
+        # 前 K 中有人变差或失效（NaN 比较为 False）、或者榜单本来就没满，只能整体重选
+        if (in_board & ~(after >= before)).any() or len(self.board) < self.top_n:
+            self._rank_all()
+            return
+        threshold = self.expected_profit[self.board[-1]]
+        entrants = rows[~in_board & (after > threshold)]
+        # 与全量重选的并列规则一致：合并后按原下标升序再取前 K
+        merged = np.union1d(self.board, entrants)
+        self.board = merged[top_k_indices(self.expected_profit[merged], self.top_n)]
+
+    def top(self):
+        b = self.board
+        return CandidateSet(self.strategy_type, self.strikes[b], self.prices[b], np.full(len(b), self.qty),
+                            self.cost[b], self.expected_profit[b], self.pop[b])
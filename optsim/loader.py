@@ -0,0 +1,94 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from optsim.chains import default_cache
+
+
+def _tidy(expiry, chain):
+    return pd.concat([
+        chain.calls.assign(expiry=expiry, side="call"),
+        chain.puts.assign(expiry=expiry, side="put"),
+    ], ignore_index=True)
+
+
+def load_chains(symbol, expiries=None, max_workers=8, retries=2, backoff=0.5,
+                timeout=15.0, cache=None):
+    """并发拉取多个到期日的期权链，合并为一张长表（带 expiry / side 列）。
+
+    expiries=None 表示全部到期日。每个到期日单独计时（从工作线程真正开始请求时算起），超时或出错会按
+    backoff * 2**attempt 退避后重试，最多 retries 次；最终失败的到期日及其异常
+    放在 df.attrs["errors"] 里，不影响其余到期日。走 ChainCache，已缓存的不会再请求。
+
+    超时的请求无法强制中止，它占着的线程记为卡住，不再往它后面排任务；整个线程池都被
+    卡住时换一个新池，重试不会排在卡住的线程后面。
+    """
+    cache = cache or default_cache
+    if expiries is None:
+        expiries = cache.expirations(symbol)
+    expiries = list(dict.fromkeys(expiries))
+
+    frames, errors = {}, {}
+    queue = [(0.0, expiry, 0) for expiry in expiries]   # (可开始时间, 到期日, 第几次尝试)
+    running = {}                                         # future -> (expiry, attempt, [实际开始时间])
+    stuck = set()                                        # 当前线程池里超时放弃、线程仍被占着的 future
+
+    def fetch(expiry, started):
+        started.append(time.monotonic())
+        return cache.option_chain(symbol, expiry)
+
+    new_pool = lambda: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chain-loader")
+    pool = new_pool()
+    try:
+        while queue or running:
+            stuck = {f for f in stuck if not f.done()}
+            if len(stuck) >= max_workers:
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool, stuck = new_pool(), set()
+            now = time.monotonic()
+            ready = [q for q in queue if q[0] <= now]
+            for item in ready:
+                if len(running) + len(stuck) >= max_workers:
+                    break
+                queue.remove(item)
+                _, expiry, attempt = item
+                started = []
+                future = pool.submit(fetch, expiry, started)
+                running[future] = (expiry, attempt, started)
+
+            if running:
+                # 还没开始执行的请求不计时
+                next_deadline = min(started[0] + timeout if started else now + timeout
+                                    for _, _, started in running.values())
+                wake = min([next_deadline] + [q[0] for q in queue])
+                done, _ = wait(running, timeout=max(wake - time.monotonic(), 0.0), return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(max(min(q[0] for q in queue) - time.monotonic(), 0.0))
+                done = set()
+
+            now = time.monotonic()
+            for future in list(running):
+                expiry, attempt, started = running[future]
+                if future in done:
+                    error = future.exception()
+                elif started and now - started[0] >= timeout:
+                    # 卡住的请求直接放弃（线程无法强制中止，结果会被忽略）
+                    stuck.add(future)
+                    error = TimeoutError(f"{symbol} {expiry}: no response in {timeout:.0f}s")
+                else:
+                    continue
+                del running[future]
+                if error is None:
+                    frames[expiry] = _tidy(expiry, future.result())
+                elif attempt < retries:
+                    queue.append((now + backoff * 2 ** attempt, expiry, attempt + 1))
+                else:
+                    errors[expiry] = error
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    ordered = [frames[e] for e in expiries if e in frames]
+    df = pd.concat(ordered, ignore_index=True) if ordered else pd.DataFrame(columns=["expiry", "side", "strike"])
+    df.attrs["errors"] = errors
+    return df
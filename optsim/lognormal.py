@@ -0,0 +1,51 @@
+import numpy as np
+
+from optsim.payoffs import payoff_extremes, payoff_values, zero_tolerance
+from optsim.pricing import DAYS_PER_YEAR, ndtr
+
+
+def atm_vol(call_quotes, put_quotes, spot, default=0.3):
+    """平值隐含波动率：calls / puts 两侧离现价最近的有效 IV 取平均，都没有时用 default。"""
+    ivs = [q.atm_iv(spot) for q in (call_quotes, put_quotes) if q is not None and len(q)]
+    ivs = [v for v in ivs if np.isfinite(v)]
+    return float(np.mean(ivs)) if ivs else default
+
+
+def lognormal_scores(payoff, spot, vol, days, drift=0.0):
+    """到期价格服从对数正态时，分段线性盈亏的精确期望和盈利概率，逐策略向量化。
+
+    ln S_T ~ N(ln S + (drift − σ²/2)T, σ²T)，drift 取无风险利率即风险中性测度。
+    E[f] = 截距 + 斜率·E[S_T] + Σ 斜率变化_j · E[max(S_T − K_j, 0)]，每个折点一项
+    Black-Scholes 式的（不贴现）看涨期望；盈利概率为各盈利区间的分布函数之差。
+    vol 可为标量或 (策略,)；σ√T = 0 时退化为在远期价格上取值。返回 {expected_pnl, pop}。
+    """
+    n = len(payoff.intercept)
+    years = max(float(days), 0.0) / DAYS_PER_YEAR
+    sig_t = np.broadcast_to(np.asarray(vol, dtype=float) * np.sqrt(years), (n,))[:, None]
+    forward = spot * np.exp(drift * years)
+    live = sig_t > 0
+    safe_sig_t = np.where(live, sig_t, 1.0)
+
+    def cdf(x):
+        # P(S_T ≤ x)，x 为 (策略, 点)；x = 0 / inf 时分别为 0 / 1
+        with np.errstate(divide="ignore"):
+            z = (np.log(x / forward) + 0.5 * sig_t ** 2) / safe_sig_t
+        return np.where(live, ndtr(z), (x >= forward).astype(float))
+
+    kinks = payoff.kinks
+    with np.errstate(divide="ignore"):
+        d1 = (np.log(forward / np.maximum(kinks, 1e-300)) + 0.5 * sig_t ** 2) / safe_sig_t
+    call = np.where(live, forward * ndtr(d1) - kinks * ndtr(d1 - sig_t), np.maximum(forward - kinks, 0.0))
+    expected = payoff.intercept + payoff.slope * forward + (payoff.slope_changes * call).sum(axis=1)
+
+    # 折点与盈亏平衡点把 [0, ∞) 切成若干段，每段内盈亏不变号：用段中点判断是否盈利
+    breakevens = payoff_extremes(payoff)["breakevens"]
+    cuts = np.concatenate([np.zeros((n, 1)), kinks, np.nan_to_num(breakevens, nan=np.inf),
+                           np.full((n, 1), np.inf)], axis=1)
+    cuts.sort(axis=1)
+    lo, hi = cuts[:, :-1], cuts[:, 1:]
+    valid = hi > lo  # 补齐用的 inf 段和重合切点长度为 0
+    probe = np.where(valid, np.where(np.isfinite(hi), 0.5 * (lo + hi), lo + 1.0), 0.0)
+    profitable = valid & (payoff_values(payoff, probe) > zero_tolerance(payoff)[:, None])
+    pop = np.where(profitable, cdf(hi) - cdf(lo), 0.0).sum(axis=1)
+    return {"expected_pnl": expected, "pop": pop}
@@ -0,0 +1,117 @@
+import numpy as np
+
+from optsim.pricing import DAYS_PER_YEAR, KIND_CALL, KIND_PUT
+
+DRAW_CHUNK = 1 << 16
+
+
+class TerminalDistribution:
+    """一组到期日标的价格抽样，所有候选共用同一组抽样打分（便于公平比较）。"""
+
+    def __init__(self, prices):
+        self.prices = np.asarray(prices)
+
+    def __len__(self):
+        return len(self.prices)
+
+    @classmethod
+    def lognormal(cls, spot, vol, days, n_paths=100_000, rate=0.0, seed=None, dtype=np.float32):
+        # 风险中性对数正态：S_T = S·exp((r − σ²/2)T + σ√T·Z)，分块生成
+        rng = np.random.default_rng(seed)
+        t = days / DAYS_PER_YEAR
+        drift = (rate - 0.5 * vol ** 2) * t
+        scale = vol * np.sqrt(t)
+        out = np.empty(n_paths, dtype=dtype)
+        for start in range(0, n_paths, DRAW_CHUNK):
+            stop = min(start + DRAW_CHUNK, n_paths)
+            z = rng.standard_normal(stop - start, dtype=np.float32 if dtype == np.float32 else np.float64)
+            out[start:stop] = spot * np.exp(drift + scale * z)
+        return cls(out)
+
+    @classmethod
+    def lognormal_grid(cls, spot, vol, days, n_points=256, rate=0.0):
+        # 确定性的等概率网格：取 n 个分位区间的中点，无抽样噪声；非分段线性的盈亏（如远月腿的
+        # Black-Scholes 价值）求期望 / 盈利概率时用几百个点就够
+        from scipy.special import ndtri
+
+        t = days / DAYS_PER_YEAR
+        z = ndtri((np.arange(n_points) + 0.5) / n_points)
+        return cls(spot * np.exp((rate - 0.5 * vol ** 2) * t + vol * np.sqrt(t) * z))
+
+    @classmethod
+    def empirical(cls, closes, spot, days, n_paths=100_000, seed=None, dtype=np.float32):
+        # 从历史日对数收益有放回地抽 days 个相加（bootstrap），不假设分布形状
+        closes = np.asarray(closes, dtype=float)
+        log_ret = np.diff(np.log(closes[closes > 0]))
+        if not len(log_ret):
+            raise ValueError("need at least two positive closes")
+        rng = np.random.default_rng(seed)
+        horizon = max(int(round(days)), 1)
+        out = np.empty(n_paths, dtype=dtype)
+        per_chunk = max(DRAW_CHUNK // horizon, 1)
+        for start in range(0, n_paths, per_chunk):
+            stop = min(start + per_chunk, n_paths)
+            picks = rng.integers(0, len(log_ret), size=(stop - start, horizon))
+            out[start:stop] = spot * np.exp(log_ret[picks].sum(axis=1))
+        return cls(out)
+
+
+def score_legs(legs, dist, tail=0.05, memory_budget=256 * 1024 * 1024, multiplier=1):
+    """用同一组抽样给每个候选打分，返回 {expected_pnl, pop, tail_loss}，均为 (候选数,)。
+
+    legs 为 pack_legs 格式的数组（只用到 kind / qty / strike / premium）。按候选分块，
+    每块的 (候选 × 路径) 中间矩阵不超过 memory_budget 字节。
+    tail_loss 为最差 tail 比例路径的平均盈亏（CVaR，通常为负）；求尾部要逐行 partition，
+    是最贵的一步，全量排序时可传 tail=None 跳过，只对前 K 个再算一次。
+    """
+    paths = dist.prices
+    dtype = paths.dtype
+    n, width = legs["qty"].shape
+    # 每个候选占用：盈亏累加矩阵 + 单腿临时矩阵（含 put/股票修正时最多再两份），各一行路径
+    per_candidate = 4 * len(paths) * np.dtype(dtype).itemsize
+    chunk = max(int(memory_budget // per_candidate), 1)
+    k_tail = max(int(len(paths) * tail), 1) if tail else 0
+    kinds = legs["kind"]
+    strikes = legs["strike"].astype(dtype)
+    qtys = legs["qty"].astype(dtype)
+    premiums = legs["premium"].astype(dtype)
+    # 盈利判定的容差：float32 下"恰好为 0"的盈亏会带上与金额量级成比例的舍入误差
+    scale = (np.abs(legs["qty"]) * (np.abs(legs["strike"]) + np.abs(legs["premium"]) + float(paths.max(initial=0)))).sum(axis=1)
+    tol = 8 * np.finfo(dtype).eps * scale * abs(multiplier)
+
+    expected = np.empty(n)
+    pop = np.empty(n)
+    tail_loss = np.full(n, np.nan)
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        pnl = np.zeros((stop - start, len(paths)), dtype=dtype)
+        buf = np.empty_like(pnl)
+        for j in range(width):
+            kind = kinds[start:stop, j]
+            qty = qtys[start:stop, j, None]
+            if not qty.any():
+                continue  # pack_legs 补齐的空腿
+            # put = call − (S − K)，股票腿 = S；先算看涨内在价值再按腿类型修正
+            np.subtract(paths[None, :], strikes[start:stop, j, None], out=buf)
+            is_put = (kind == KIND_PUT)[:, None]
+            is_stock = ((kind != KIND_CALL) & (kind != KIND_PUT))[:, None] & (qty != 0)
+            if is_put.any() or is_stock.any():
+                intrinsic = np.maximum(buf, 0)
+                if is_put.any():
+                    intrinsic = np.where(is_put, intrinsic - buf, intrinsic)
+                if is_stock.any():
+                    intrinsic = np.where(is_stock, paths[None, :], intrinsic)
+                buf = intrinsic
+            else:
+                np.maximum(buf, 0, out=buf)
+            buf -= premiums[start:stop, j, None]
+            buf *= qty
+            pnl += buf
+        if multiplier != 1:
+            pnl *= multiplier
+        expected[start:stop] = pnl.mean(axis=1, dtype=np.float64)
+        pop[start:stop] = np.count_nonzero(pnl > tol[start:stop, None], axis=1) / len(paths)
+        if k_tail:
+            pnl.partition(k_tail - 1, axis=1)
+            tail_loss[start:stop] = pnl[:, :k_tail].mean(axis=1, dtype=np.float64)
+    return {"expected_pnl": expected, "pop": pop, "tail_loss": tail_loss}
@@ -0,0 +1,245 @@
+from collections import namedtuple
+
+import numpy as np
+
+from optsim.pricing import KIND_CALL, KIND_CODES, KIND_PUT, KIND_STOCK, pack_legs
+
+# 一条腿：kind 为 "call" / "put" / "stock"；qty 带符号（正买负卖，单位为 100 股的合约）；
+# premium 为成交价（正股即建仓成本）
+Leg = namedtuple("Leg", ["kind", "qty", "strike", "premium"])
+
+# 到期盈亏的分段线性表示，每个数组首维为策略：
+#   f(S) = intercept + slope·S + Σ slope_changes_j · max(S − kinks_j, 0)，S ≥ 0
+# kinks 按行升序；pack_legs 补齐的空腿 slope_changes 为 0，不影响结果
+Payoff = namedtuple("Payoff", ["intercept", "slope", "kinks", "slope_changes"])
+
+
+def compile_legs(legs, multiplier=100):
+    """把 pack_legs 格式的腿数组编译成 Payoff。
+
+    看涨 = max(S−K, 0)；看跌 = max(S−K, 0) − (S − K)；正股 = S，三者都化成同一种折点形式。
+    """
+    kind, qty, strike, premium = (np.asarray(legs[k]) for k in ("kind", "qty", "strike", "premium"))
+    qty = qty * multiplier
+    is_put = kind == KIND_PUT
+    is_option = (kind == KIND_CALL) | is_put
+    intercept = (qty * (np.where(is_put, strike, 0.0) - premium)).sum(axis=-1)
+    slope = (qty * ((kind == KIND_STOCK).astype(float) - is_put)).sum(axis=-1)
+    changes = np.where(is_option, qty, 0.0)
+    order = np.argsort(strike, axis=-1, kind="stable")
+    return Payoff(intercept, slope, np.take_along_axis(strike, order, -1).astype(float),
+                  np.take_along_axis(changes, order, -1))
+
+
+def compile_strategies(strategies, multiplier=100):
+    """[[Leg, ...], ...] → Payoff。"""
+    return compile_legs(pack_legs(strategies), multiplier)
+
+
+def take_payoff(payoff, idx):
+    return Payoff(*(a[idx] for a in payoff))
+
+
+def zero_tolerance(payoff):
+    # 价格和权利金的舍入误差会让"恰好为 0"的盈亏变成 ±1e-13，按各策略的金额量级取容差
+    scale = np.abs(payoff.intercept) + np.abs(payoff.slope_changes * payoff.kinks).sum(axis=-1)
+    return 1e-9 * (1.0 + scale)
+
+
+def payoff_values(payoff, spots):
+    """到期盈亏：spots 为共用价格网格 (价格点,) 或逐策略价格 (策略, 价格点)，返回 (策略, 价格点)。"""
+    spots = np.asarray(spots, dtype=float)
+    if spots.ndim == 1:
+        spots = spots[None, :]
+    hinge = np.maximum(spots[..., None] - payoff.kinks[:, None, :], 0.0)
+    return (payoff.intercept[:, None] + payoff.slope[:, None] * spots
+            + (hinge * payoff.slope_changes[:, None, :]).sum(axis=-1))
+
+
+def payoff_extremes(payoff):
+    """不用价格网格，直接由折点求最大盈利 / 最大亏损 / 盈亏平衡点。
+
+    返回 {max_profit, max_loss, breakevens}：前两者为 (策略,)，S→∞ 方向无界时为 ±inf；
+    breakevens 为 (策略, 折点数 + 1)，升序，不足处补 NaN。
+    """
+    n = len(payoff.intercept)
+    # 顶点：S = 0 和每个折点；相邻顶点之间盈亏为线性，最后一个折点之后斜率为 final_slope
+    points = np.concatenate([np.zeros((n, 1)), payoff.kinks], axis=1)
+    values = payoff_values(payoff, points)
+    values = np.where(np.abs(values) <= zero_tolerance(payoff)[:, None], 0.0, values)
+    final_slope = payoff.slope + payoff.slope_changes.sum(axis=-1)
+    max_profit = np.where(final_slope > 0, np.inf, values.max(axis=1))
+    max_loss = np.where(final_slope < 0, -np.inf, values.min(axis=1))
+
+    # 按"是否亏损"的状态找切换点：线段内线性插值求根；最后一个折点之后看 S→∞ 时是否亏损
+    losing = values < 0
+    v0, v1 = values[:, :-1], values[:, 1:]
+    x0, x1 = points[:, :-1], points[:, 1:]
+    last = values[:, -1]
+    losing_at_inf = (final_slope < 0) | ((final_slope == 0) & (last < 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roots = np.where(losing[:, :-1] != losing[:, 1:], x0 - v0 * (x1 - x0) / (v1 - v0), np.nan)
+        tail_root = np.where(losing[:, -1] != losing_at_inf, points[:, -1] - last / final_slope, np.nan)
+    breakevens = np.sort(np.column_stack([roots, tail_root]), axis=1)
+    return {"max_profit": max_profit, "max_loss": max_loss, "breakevens": breakevens}
+
+
+def profit_range_text(payoff, i=0):
+    """第 i 个策略盈利（> 0）的价格区间，供展示。"""
+    row = take_payoff(payoff, [i])
+    # 在折点和盈亏平衡点之间盈亏不变号，逐段取中点判断
+    cuts = np.concatenate([[0.0], row.kinks[0], payoff_extremes(row)["breakevens"][0], [np.inf]])
+    cuts = np.unique(cuts[~np.isnan(cuts)]).tolist()
+    probes = [lo + (hi - lo) / 2 if np.isfinite(hi) else lo + 1.0 for lo, hi in zip(cuts[:-1], cuts[1:])]
+    profitable = payoff_values(row, probes)[0] > zero_tolerance(row)[0]
+    parts = []
+    for (lo, hi), ok in zip(zip(cuts[:-1], cuts[1:]), profitable):
+        if not ok:
+            continue
+        if parts and parts[-1][1] == lo:
+            parts[-1] = (parts[-1][0], hi)
+        else:
+            parts.append((lo, hi))
+    if not parts:
+        return "Never profitable"
+    text = []
+    for lo, hi in parts:
+        if lo == 0 and not np.isfinite(hi):
+            text.append("Any price")
+        elif lo == 0:
+            text.append(f"Price ≤ {hi:.2f}")
+        elif not np.isfinite(hi):
+            text.append(f"Price ≥ {lo:.2f}")
+        else:
+            text.append(f"{lo:.2f} ≤ Price ≤ {hi:.2f}")
+    return " or ".join(text)
+
+
+def strategy_metrics(strat_type, strikes, prices, qty):
+    # 排名只需要成本和预期收益；最大盈亏、盈亏平衡点和盈利区间由折点直接求出，不需要价格网格
+    mult = qty * 100
+
+    if strat_type in ("Sell Put", "Sell Call"):
+        cost = prices[0] * mult
+        expected_profit = cost
+
+    elif strat_type == "Bull Call Spread":
+        strike1, strike2 = strikes
+        price_buy, price_sell = prices
+        cost = (price_buy - price_sell) * mult
+        max_profit = (strike2 - strike1) * mult - cost
+        expected_profit = max_profit
+
+    elif strat_type == "Straddle":
+        price_call, price_put = prices
+        cost = -(price_call + price_put) * mult  # 卖出跨式，净收取权利金
+        expected_profit = None
+
+    elif strat_type == "Iron Condor":
+        p1, p2, p3, p4 = prices
+        cost = (p1 - p2 - p3 + p4) * mult
+        expected_profit = -cost  # 净收取的权利金即最大收益
+
+    elif strat_type == "Covered Call":
+        cost = - prices[1] * mult
+        expected_profit = None
+
+    elif strat_type == "Bear Put Spread":
+        strike1, strike2 = strikes
+        price_sell, price_buy = prices
+        cost = (price_buy - price_sell) * mult
+        expected_profit = (strike2 - strike1) * mult - cost
+
+    elif strat_type in BUTTERFLIES:
+        k1, k2, k3 = strikes
+        p1, p2, p3 = prices
+        cost = (p1 - 2 * p2 + p3) * mult
+        # 最大收益在中间执行价：看涨为下翼宽，看跌为上翼宽
+        wing = k2 - k1 if strat_type.startswith("Call") else k3 - k2
+        expected_profit = wing * mult - cost
+
+    elif strat_type == "Call Ratio Spread":
+        strike1, strike2 = strikes
+        price_buy, price_sell = prices
+        cost = (price_buy - 2 * price_sell) * mult
+        expected_profit = (strike2 - strike1) * mult - cost
+
+    elif strat_type == "Put Ratio Spread":
+        strike1, strike2 = strikes
+        price_sell, price_buy = prices
+        cost = (price_buy - 2 * price_sell) * mult
+        expected_profit = (strike2 - strike1) * mult - cost
+
+    else:
+        return None
+
+    payoff = compile_strategies([strategy_legs(strat_type, strikes, prices, qty)])
+    extremes = payoff_extremes(payoff)
+    breakevens = extremes["breakevens"][0]
+    return {
+        "cost": cost,
+        "expected_profit": expected_profit,
+        "max_profit": float(extremes["max_profit"][0]),
+        "max_loss": float(extremes["max_loss"][0]),
+        "breakevens": breakevens[~np.isnan(breakevens)].tolist(),
+        "profit_range": profit_range_text(payoff),
+    }
+
+
+def strategy_pnl(strat_type, strikes, prices, qty, underlying):
+    spot_range = np.linspace(underlying * 0.7, underlying * 1.3, 300)
+    payoff = compile_strategies([strategy_legs(strat_type, strikes, prices, qty)])
+    return payoff_values(payoff, spot_range)[0]
+
+
+# 每种策略的腿模板：(kind, 方向, 执行价列, 价格列)。价格列为 None 表示正股，建仓成本取该执行价列
+# （Covered Call 的第一列就是建仓时的现价）。Straddle 的盈亏为 -|S-K| + 两腿权利金：同一执行价卖出 call 和 put
+LEG_TEMPLATES = {
+    "Sell Put": [("put", -1, 0, 0)],
+    "Sell Call": [("call", -1, 0, 0)],
+    "Bull Call Spread": [("call", 1, 0, 0), ("call", -1, 1, 1)],
+    "Straddle": [("call", -1, 0, 0), ("put", -1, 0, 1)],
+    "Iron Condor": [("put", 1, 0, 0), ("put", -1, 1, 1), ("call", -1, 2, 2), ("call", 1, 3, 3)],
+    "Covered Call": [("stock", 1, 0, None), ("call", -1, 1, 1)],
+    # 执行价列一律升序；方向里的 2 即比例（蝶式中腿、1x2 比例价差的卖出腿）
+    "Bear Put Spread": [("put", -1, 0, 0), ("put", 1, 1, 1)],
+    "Call Butterfly": [("call", 1, 0, 0), ("call", -2, 1, 1), ("call", 1, 2, 2)],
+    "Put Butterfly": [("put", 1, 0, 0), ("put", -2, 1, 1), ("put", 1, 2, 2)],
+    "Call Broken Wing Butterfly": [("call", 1, 0, 0), ("call", -2, 1, 1), ("call", 1, 2, 2)],
+    "Put Broken Wing Butterfly": [("put", 1, 0, 0), ("put", -2, 1, 1), ("put", 1, 2, 2)],
+    "Call Ratio Spread": [("call", 1, 0, 0), ("call", -2, 1, 1)],
+    "Put Ratio Spread": [("put", -2, 0, 0), ("put", 1, 1, 1)],
+}
+
+BUTTERFLIES = ("Call Butterfly", "Put Butterfly", "Call Broken Wing Butterfly", "Put Broken Wing Butterfly")
+
+
+def strategy_legs(strat_type, strikes, prices, qty=1):
+    """把策略拆成腿；所有 app 的到期盈亏都由这些腿经 compile_strategies 求出。"""
+    if strat_type not in LEG_TEMPLATES:
+        raise ValueError(f"unknown strategy type: {strat_type}")
+    return [Leg(kind, sign * qty, strikes[k], strikes[k] if p is None else prices[p])
+            for kind, sign, k, p in LEG_TEMPLATES[strat_type]]
+
+
+def candidate_legs(strat_type, strikes, prices, qty):
+    """strategy_legs 的批量版本：strikes / prices 为 (n, 列数)，qty 为 (n,)，返回 pack_legs 格式的数组。"""
+    if strat_type not in LEG_TEMPLATES:
+        raise ValueError(f"unknown strategy type: {strat_type}")
+    template = LEG_TEMPLATES[strat_type]
+    strikes, prices = np.asarray(strikes, dtype=float), np.asarray(prices, dtype=float)
+    qty = np.asarray(qty, dtype=float)[:, None]
+    return {
+        "kind": np.broadcast_to(np.array([KIND_CODES[kind] for kind, *_ in template], dtype=np.int8),
+                                (len(strikes), len(template))),
+        "qty": qty * [sign for _, sign, _, _ in template],
+        "strike": strikes[:, [k for _, _, k, _ in template]],
+        "premium": np.column_stack([strikes[:, k] if p is None else prices[:, p] for _, _, k, p in template]),
+    }
+
+
+def simulate_strategy(strat_type, strikes, prices, qty, underlying):
+    metrics = strategy_metrics(strat_type, strikes, prices, qty)
+    if metrics is None:
+        return None
+    return {"pnl": strategy_pnl(strat_type, strikes, prices, qty, underlying), **metrics}
@@ -0,0 +1,12 @@
+"""matplotlib 延迟到第一次画图时才导入，并固定使用非交互的 Agg 后端（服务端只需要渲染成图片）。"""
+_pyplot = None
+
+
+def pyplot():
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as _pyplot
+    return _pyplot
@@ -0,0 +1,58 @@
+from collections import Counter
+
+import numpy as np
+
+
+def entry_key(legs, *context):
+    """一个组合条目（策略或正股）的缓存键：各腿参数 + 影响曲线的其他标量输入（波动率、天数等）。
+
+    NaN 换成 None，否则 NaN != NaN 会让同一条目永远命中不了缓存。
+    """
+    clean = tuple(None if v is None or (isinstance(v, float) and np.isnan(v)) else v for v in context)
+    return tuple(tuple(leg) for leg in legs), clean
+
+
+class PortfolioCurves:
+    """按条目缓存盈亏曲线，组合合计随条目增删增量更新。
+
+    同一条目重复添加时按次数计入合计。价格网格变化时需新建实例（见 matches）。
+    """
+
+    def __init__(self, spot_range):
+        self.spot_range = np.asarray(spot_range, dtype=float)
+        self.total = None
+        self.computed = 0
+        self._curves = {}
+        self._counts = Counter()
+
+    def matches(self, spot_range):
+        spot_range = np.asarray(spot_range, dtype=float)
+        return spot_range.shape == self.spot_range.shape and np.array_equal(spot_range, self.spot_range)
+
+    def sync(self, keys, entries, evaluate):
+        """把缓存对齐到当前条目列表，返回按 keys 顺序的曲线列表。
+
+        evaluate(条目列表) 批量返回 (条目数, ...) 的曲线，只对缓存里没有的条目调用一次。
+        """
+        missing = {}
+        for key, entry in zip(keys, entries):
+            if key not in self._curves and key not in missing:
+                missing[key] = entry
+        if missing:
+            for key, curve in zip(missing, evaluate(list(missing.values()))):
+                self._curves[key] = curve
+            self.computed += len(missing)
+
+        # 只按数量变化的条目增减合计，不重新求和
+        wanted = Counter(keys)
+        for key in set(wanted) | set(self._counts):
+            delta = wanted[key] - self._counts[key]
+            if delta:
+                curve = self._curves[key]
+                self.total = delta * curve if self.total is None else self.total + delta * curve
+        for key in set(self._counts) - set(wanted):
+            del self._curves[key]
+        self._counts = wanted
+        if not wanted:
+            self.total = None  # 清空后重新从 0 开始，避免累计舍入误差
+        return [self._curves[key] for key in keys]
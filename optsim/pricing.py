@@ -0,0 +1,90 @@
+import numpy as np
+
+KIND_STOCK, KIND_CALL, KIND_PUT = 0, 1, 2
+KIND_CODES = {"stock": KIND_STOCK, "call": KIND_CALL, "put": KIND_PUT}
+DAYS_PER_YEAR = 365.0
+
+_ndtr = None
+
+
+def ndtr(x):
+    """标准正态分布函数 Φ(x)。scipy.special 导入要 0.2 秒左右，推迟到第一次定价时再导入。"""
+    global _ndtr
+    if _ndtr is None:
+        from scipy.special import ndtr as _ndtr
+    return _ndtr(x)
+
+
+def bs_price(spot, strike, years, vol, is_call, rate=0.0):
+    """Black-Scholes 欧式期权价格，所有参数可任意广播。
+
+    years <= 0 或 vol <= 0 时退化为（贴现后的）内在价值，因此到期日曲线和
+    盈亏折线完全一致。
+    """
+    spot, strike, years, vol = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (spot, strike, years, vol)))
+    is_call = np.asarray(is_call, dtype=bool)
+    t = np.maximum(years, 0.0)
+    disc_k = strike * np.exp(-rate * t)
+    sig_t = vol * np.sqrt(t)
+    live = sig_t > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = np.where(live, (np.log(spot / strike) + (rate + 0.5 * vol ** 2) * t) / np.where(live, sig_t, 1.0), 0.0)
+    d2 = d1 - sig_t
+    call = np.where(live, spot * ndtr(d1) - disc_k * ndtr(d2), np.maximum(spot - disc_k, 0.0))
+    put = call - spot + disc_k  # put-call parity
+    return np.where(is_call, call, np.maximum(put, 0.0))
+
+
+def pack_legs(strategies, vols=None, default_vol=0.3):
+    """把 [[Leg, ...], ...] 补齐成 (策略数, 最大腿数) 的数组，缺的腿 qty=0。
+
+    vols 与 strategies 同结构，给出每条腿的隐含波动率；缺失/非正的用 default_vol。
+    """
+    n = len(strategies)
+    width = max((len(legs) for legs in strategies), default=1) or 1
+    kind = np.zeros((n, width), dtype=np.int8)
+    qty = np.zeros((n, width))
+    strike = np.zeros((n, width))
+    premium = np.zeros((n, width))
+    vol = np.full((n, width), default_vol)
+    for i, legs in enumerate(strategies):
+        for j, leg in enumerate(legs):
+            kind[i, j] = KIND_CODES[leg.kind]
+            qty[i, j] = leg.qty
+            strike[i, j] = leg.strike
+            premium[i, j] = leg.premium
+            if vols is not None:
+                v = vols[i][j]
+                if v is not None and np.isfinite(v) and v > 0:
+                    vol[i, j] = v
+    return {"kind": kind, "qty": qty, "strike": strike, "premium": premium, "vol": vol}
+
+
+def legs_value(kind, strike, vol, spots, days, rate=0.0):
+    """每条腿在 spots 上的理论价值，形状 (..., 策略, 腿, 价格点)。
+
+    days 为剩余天数，可以是标量、(策略,) 或 (期数, 策略)，一次算出多个时点。
+    """
+    spots = np.asarray(spots, dtype=float)
+    years = np.asarray(days, dtype=float)[..., None, None] / DAYS_PER_YEAR
+    kind = kind[..., None]
+    option = bs_price(spots, strike[..., None], years, vol[..., None], kind == KIND_CALL, rate)
+    return np.where(kind == KIND_STOCK, spots, option)
+
+
+def legs_pnl(legs, spots, days, rate=0.0, multiplier=100):
+    """组合盈亏曲线 (..., 策略, 价格点) = Σ qty × (理论价值 − 成交价) × 合约乘数。"""
+    value = legs_value(legs["kind"], legs["strike"], legs["vol"], spots, days, rate)
+    return ((value - legs["premium"][..., None]) * legs["qty"][..., None]).sum(axis=-2) * multiplier
+
+
+def chain_vols(strategies, call_quotes, put_quotes):
+    """按执行价从期权链（QuoteIndex）取每条腿的隐含波动率，链里没有的为 NaN。"""
+    vols = []
+    for legs in strategies:
+        row = []
+        for leg in legs:
+            quotes = call_quotes if leg.kind == "call" else put_quotes if leg.kind == "put" else None
+            row.append(float(quotes.ivs([leg.strike])[0]) if quotes is not None else np.nan)
+        vols.append(row)
+    return vols
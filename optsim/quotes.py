@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class QuoteIndex:
+    """一条期权链（calls 或 puts）的按执行价索引，拉取后构建一次，各枚举器共用。
+
+    执行价升序存放，bid/ask/last/IV/volume 为对齐的数组；单个查找走字典 O(1)，
+    批量查找走 searchsorted O(log n)。与原 get_price 一致，缺失或 NaN 价格视为 0。
+    """
+
+    COLUMNS = {
+        "bid": "bid",
+        "ask": "ask",
+        "last": "lastPrice",
+        "iv": "impliedVolatility",
+        "volume": "volume",
+    }
+
+    def __init__(self, df):
+        df = df.sort_values("strike", kind="stable").drop_duplicates("strike")
+        self.strikes = df["strike"].to_numpy(dtype=float)
+        for attr, col in self.COLUMNS.items():
+            values = df[col].to_numpy(dtype=float) if col in df else np.full(len(df), np.nan)
+            setattr(self, attr, values)
+        # 买入用 ask、卖出用 bid
+        self._buy = np.nan_to_num(self.ask, nan=0.0)
+        self._sell = np.nan_to_num(self.bid, nan=0.0)
+        self._pos = {k: i for i, k in enumerate(self.strikes.tolist())}
+
+    def __len__(self):
+        return len(self.strikes)
+
+    def __contains__(self, strike):
+        return float(strike) in self._pos
+
+    def side(self, is_buy=True):
+        return self._buy if is_buy else self._sell
+
+    def changed(self, other):
+        """与同一条链更早的一份报价比较，返回 bid/ask 有变化的执行价掩码；执行价集合不同时返回 None。"""
+        if len(self.strikes) != len(other.strikes) or (self.strikes != other.strikes).any():
+            return None
+        return (self._buy != other._buy) | (self._sell != other._sell)
+
+    def price(self, strike, is_buy=True):
+        i = self._pos.get(float(strike))
+        return 0.0 if i is None else float(self.side(is_buy)[i])
+
+    def locate(self, strikes):
+        # 批量定位，找不到的执行价返回 -1
+        strikes = np.asarray(strikes, dtype=float)
+        if not len(self.strikes):
+            return np.full(strikes.shape, -1, dtype=np.intp)
+        pos = np.minimum(np.searchsorted(self.strikes, strikes), len(self.strikes) - 1)
+        return np.where(self.strikes[pos] == strikes, pos, -1)
+
+    def prices(self, strikes, is_buy=True):
+        pos = self.locate(strikes)
+        return np.where(pos >= 0, self.side(is_buy)[np.maximum(pos, 0)], 0.0)
+
+    def ivs(self, strikes):
+        # 批量取隐含波动率，找不到的为 NaN
+        pos = self.locate(strikes)
+        return np.where(pos >= 0, self.iv[np.maximum(pos, 0)], np.nan) if len(self.iv) else np.full(np.shape(strikes), np.nan)
+
+    def atm_iv(self, spot):
+        # 离现价最近、且隐含波动率有效的执行价上的 IV；整条链都没有时为 NaN
+        ok = np.isfinite(self.iv) & (self.iv > 0)
+        if not ok.any():
+            return np.nan
+        return float(self.iv[ok][np.argmin(np.abs(self.strikes[ok] - spot))])
+
+    def quote(self, strike):
+        i = self._pos.get(float(strike))
+        if i is None:
+            return None
+        return {"strike": self.strikes[i], **{a: getattr(self, a)[i] for a in self.COLUMNS}}
+
+
+def as_quote_index(chain):
+    if chain is None or isinstance(chain, QuoteIndex):
+        return chain
+    return QuoteIndex(chain)
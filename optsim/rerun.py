@@ -0,0 +1,54 @@
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def memo_step(state, name, deps, compute):
+    """显式声明依赖的计算步骤：deps 与上次相同就直接复用上次结果，否则重算并记下。
+
+    state 一般传 st.session_state（每个会话一份）；deps 为可用 == 比较的元组，
+    例如 (期权链快照键, 利率)。整页 rerun 时未受影响的步骤因此不再重复计算。
+    """
+    key = f"_step_{name}"
+    entry = state.get(key)
+    if entry is not None and entry[0] == deps:
+        return entry[1]
+    value = compute()
+    state[key] = (deps, value)
+    return value
+
+
+class LatencyLog:
+    """按作用域（full / chain / chart ...）记录每次整页或局部 rerun 的耗时。"""
+
+    def __init__(self, maxlen=50):
+        self._samples = defaultdict(lambda: deque(maxlen=maxlen))
+
+    def record(self, scope, seconds):
+        self._samples[scope].append(seconds)
+
+    @contextmanager
+    def timed(self, scope):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(scope, time.perf_counter() - t0)
+
+    def summary(self):
+        return {
+            scope: {"runs": len(s), "last_ms": s[-1] * 1e3, "median_ms": float(np.median(s)) * 1e3}
+            for scope, s in self._samples.items() if s
+        }
+
+    def caption(self):
+        return " · ".join(f"{scope} {stats['median_ms']:.0f} ms" for scope, stats in self.summary().items())
+
+
+def latency_log(state, name="latency"):
+    # 每个会话一份耗时记录
+    if name not in state:
+        state[name] = LatencyLog()
+    return state[name]
@@ -0,0 +1,178 @@
+import numpy as np
+
+from optsim.lognormal import lognormal_scores
+from optsim.payoffs import compile_legs
+from optsim.pricing import KIND_CALL, KIND_PUT
+from optsim.quotes import as_quote_index
+
+_WIDTH_TOL = 1e-6  # 执行价只到分，宽度比较留一点浮点余量
+
+
+def _side_arrays(chain):
+    index = as_quote_index(chain)
+    return index.strikes, index.side(is_buy=False), index.side(is_buy=True)
+
+
+def strike_pairs(strikes, max_width=None):
+    """升序执行价上所有 i < j 的下标对（上三角），宽度超过 max_width 的用掩码剔除。"""
+    i, j = np.triu_indices(len(strikes), k=1)
+    if max_width is not None:
+        keep = strikes[j] - strikes[i] <= max_width + _WIDTH_TOL
+        i, j = i[keep], j[keep]
+    return i, j
+
+
+def credit_spread_table(strikes, bids, asks, short_low, max_width=None):
+    """枚举一侧的信用价差：卖出 short 腿（取 bid）、买入 long 腿（取 ask）。
+
+    short_low=True 为 Call 侧（short < long），False 为 Put 侧（long < short）。
+    返回 (short_idx, long_idx, credit)，只保留两腿价格都有效的组合。
+    """
+    lo, hi = strike_pairs(strikes, max_width)  # 与价差枚举共用同一个宽度容差
+    short_idx, long_idx = (lo, hi) if short_low else (hi, lo)
+    ok = (bids[short_idx] > 0) & (asks[long_idx] > 0)
+    short_idx, long_idx = short_idx[ok], long_idx[ok]
+    credit = bids[short_idx] - asks[long_idx]
+    return short_idx, long_idx, credit
+
+
+def _suffix_top_k(group_keys, values, k):
+    # group_keys 升序；对每个分组起点 g 给出 values[g 及之后所有分组] 中最大的 k 个下标（-1 补齐）
+    uniq, starts = np.unique(group_keys, return_index=True)
+    ends = np.append(starts[1:], len(group_keys))
+    out = np.full((len(uniq) + 1, k), -1, dtype=np.intp)
+    running = np.empty(0, dtype=np.intp)
+    for g in range(len(uniq) - 1, -1, -1):
+        merged = np.concatenate([running, np.arange(starts[g], ends[g])])
+        if len(merged) > k:
+            merged = merged[np.argpartition(-values[merged], k - 1)[:k]]
+        running = merged
+        out[g, :len(running)] = running
+    return uniq, out
+
+
+def search_iron_condors(puts, calls, max_width=None, min_credit=0.0, top_k=10):
+    """按净权利金搜索 Iron Condor（long put < short put < short call < long call）。
+
+    puts / calls 可以是期权链 DataFrame，也可以是已建好的 QuoteIndex。
+
+    先分别建好 Put/Call 两侧的信用价差表，再利用 put_short < call_short 的顺序，
+    对每个 Put 价差只与“执行价更高的 Call 价差中权利金最高的 top_k 个”组合，
+    候选数从 O(n⁴) 降到 O(P·k)。返回按净权利金降序的列表。
+    """
+    puts, calls = as_quote_index(puts), as_quote_index(calls)
+    if puts is None or calls is None or not len(puts) or not len(calls) or top_k <= 0:
+        return []
+
+    pk, pb, pa = _side_arrays(puts)
+    ck, cb, ca = _side_arrays(calls)
+    p_short, p_long, p_credit = credit_spread_table(pk, pb, pa, short_low=False, max_width=max_width)
+    c_short, c_long, c_credit = credit_spread_table(ck, cb, ca, short_low=True, max_width=max_width)
+    if not len(p_credit) or not len(c_credit):
+        return []
+
+    # Call 价差按 short 执行价排序，预先算好每个起点之后的 top_k
+    order = np.argsort(ck[c_short], kind="stable")
+    c_short, c_long, c_credit = c_short[order], c_long[order], c_credit[order]
+    group_strikes, suffix = _suffix_top_k(ck[c_short], c_credit, top_k)
+
+    # 每个 Put 价差可搭配的第一组 Call 价差：short call 执行价严格大于 short put
+    g = np.searchsorted(group_strikes, pk[p_short], side="right")
+    cand = suffix[g]                                   # (P, top_k)
+    valid = cand >= 0
+    total = p_credit[:, None] + np.where(valid, c_credit[np.maximum(cand, 0)], 0.0)
+    valid &= total >= min_credit
+    if not valid.any():
+        return []
+
+    rows, cols = np.nonzero(valid)
+    scores = total[rows, cols]
+    if len(scores) > top_k:
+        keep = np.argpartition(-scores, top_k - 1)[:top_k]
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+    rank = np.argsort(-scores, kind="stable")
+
+    results = []
+    for r, c in zip(rows[rank], cols[rank]):
+        ci = cand[r, c]
+        results.append({
+            "strikes": [float(pk[p_long[r]]), float(pk[p_short[r]]), float(ck[c_short[ci]]), float(ck[c_long[ci]])],
+            "prices": [float(pa[p_long[r]]), float(pb[p_short[r]]), float(cb[c_short[ci]]), float(ca[c_long[ci]])],
+            "credit": float(p_credit[r] + c_credit[ci]),
+        })
+    return results
+
+
+def _credit_spread_expectation(kind, long_k, long_px, short_k, short_px, spot, vol, days, rate):
+    # 一侧信用价差（买 long、卖 short）每股的对数正态期望盈亏
+    n = len(long_k)
+    legs = {
+        "kind": np.full((n, 2), kind, dtype=np.int8),
+        "qty": np.broadcast_to(np.array([1.0, -1.0]), (n, 2)),
+        "strike": np.column_stack([long_k, short_k]),
+        "premium": np.column_stack([long_px, short_px]),
+    }
+    return lognormal_scores(compile_legs(legs, multiplier=1), spot, vol, days, drift=rate)["expected_pnl"]
+
+
+def search_iron_condors_by_expectation(puts, calls, spot, vol, days, rate=0.0, max_width=None, min_credit=0.0,
+                                       top_k=10, memory_budget=64 * 1024 * 1024):
+    """按到期价格对数正态分布下的期望盈亏取前 top_k 个 Iron Condor，返回格式同 search_iron_condors。
+
+    期望是线性的：铁鹰的期望 = Put 信用价差的期望 + Call 信用价差的期望，两侧各算一次即可。
+    每个 Put 价差的上界 = 自身期望 + 可搭配（short call 更高）的 Call 价差期望的后缀最大值；
+    按上界从高到低分块做 (块 × Call 价差) 的全组合，净权利金不足 min_credit 的掩掉，剩余上界
+    已不可能超过当前第 top_k 名时停止。结果与穷举全部组合一致，中间矩阵按 memory_budget 分块。
+    """
+    puts, calls = as_quote_index(puts), as_quote_index(calls)
+    if puts is None or calls is None or not len(puts) or not len(calls) or top_k <= 0:
+        return []
+
+    pk, pb, pa = _side_arrays(puts)
+    ck, cb, ca = _side_arrays(calls)
+    p_short, p_long, p_credit = credit_spread_table(pk, pb, pa, short_low=False, max_width=max_width)
+    c_short, c_long, c_credit = credit_spread_table(ck, cb, ca, short_low=True, max_width=max_width)
+    if not len(p_credit) or not len(c_credit):
+        return []
+
+    order = np.argsort(ck[c_short], kind="stable")
+    c_short, c_long, c_credit = c_short[order], c_long[order], c_credit[order]
+    p_exp = _credit_spread_expectation(KIND_PUT, pk[p_long], pa[p_long], pk[p_short], pb[p_short], spot, vol, days, rate)
+    c_exp = _credit_spread_expectation(KIND_CALL, ck[c_long], ca[c_long], ck[c_short], cb[c_short], spot, vol, days, rate)
+
+    # 每个 Put 价差可搭配的 Call 价差是排序后的一段后缀 [start, C)
+    start = np.searchsorted(ck[c_short], pk[p_short], side="right")
+    suffix_max = np.append(np.maximum.accumulate(c_exp[::-1])[::-1], -np.inf)
+    bound = p_exp + suffix_max[start]
+    visit = np.argsort(-bound, kind="stable")
+    visit = visit[np.isfinite(bound[visit])]
+
+    n_calls = len(c_exp)
+    chunk = max(int(memory_budget // (n_calls * 24)), 1)  # 每行：期望和、净权利金、掩码
+    cols = np.arange(n_calls)
+    rows, picks, scores = (np.empty(0, dtype=np.intp),) * 2 + (np.empty(0),)
+    for s in range(0, len(visit), chunk):
+        block = visit[s:s + chunk]
+        if len(scores) == top_k:
+            # 已有 top_k 名：上界不超过第 K 名的 Put 价差不可能再进榜（visit 按上界降序，后面的更低）
+            block = block[bound[block] > scores.min()]
+            if not len(block):
+                break
+        ok = (cols[None, :] >= start[block, None]) & (p_credit[block, None] + c_credit[None, :] >= min_credit)
+        r, c = np.nonzero(ok)
+        rows = np.concatenate([rows, block[r]])
+        picks = np.concatenate([picks, c])
+        scores = np.concatenate([scores, p_exp[block[r]] + c_exp[c]])
+        if len(scores) > top_k:
+            keep = np.argpartition(-scores, top_k - 1)[:top_k]
+            rows, picks, scores = rows[keep], picks[keep], scores[keep]
+    rank = np.argsort(-scores, kind="stable")
+
+    results = []
+    for r, ci in zip(rows[rank], picks[rank]):
+        results.append({
+            "strikes": [float(pk[p_long[r]]), float(pk[p_short[r]]), float(ck[c_short[ci]]), float(ck[c_long[ci]])],
+            "prices": [float(pa[p_long[r]]), float(pb[p_short[r]]), float(cb[c_short[ci]]), float(ca[c_long[ci]])],
+            "credit": float(p_credit[r] + c_credit[ci]),
+        })
+    return results
@@ -0,0 +1,190 @@
+"""进程内共享缓存：期权链、修复 IV 后的链、QuoteIndex、Greeks 等只读数据在所有会话之间去重，总字节数受同一个上限约束。"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def freeze(value):
+    """放进共享缓存前把其中的 NumPy 数组原地设为只读，返回 value 本身。
+
+    tuple / list / dict 逐项处理，普通对象（如 QuoteIndex）处理其数组属性。DataFrame 不动：
+    依赖 pandas 3 起默认的写时复制（requirements.txt 因此要求 pandas>=3.0），筛选出的新表和
+    to_numpy() 视图都不会写回，调用方只要不对共享表本身原地赋值即可。
+    """
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        pass
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            freeze(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item)
+    elif hasattr(value, "__dict__"):
+        for item in vars(value).values():
+            if isinstance(item, np.ndarray):
+                item.flags.writeable = False
+    return value
+
+
+def nbytes(value):
+    # 估算常驻字节：数组按 nbytes，DataFrame 按 memory_usage(deep=True)，容器和对象属性逐项累加
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(nbytes(item) for item in value.values())
+    if hasattr(value, "__dict__"):
+        return sum(nbytes(item) for item in vars(value).values())
+    return 0
+
+
+class SharedCache:
+    """进程内所有会话共用的只读缓存，按 (namespace, key) 存放，总字节数超过 max_bytes 时按 LRU 淘汰。
+
+    放入的值先 freeze，之后原样返回给每个会话，不按会话复制；namespace 区分数据种类
+    （chain / repaired_chain / greeks ...），命中率按种类统计。约定派生数据的 key 以
+    ChainCache.snapshot_key 开头，期权链重新拉取或失效时由 ChainCache 一并清掉旧版本。
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (namespace, key) -> (value, nbytes)
+        self._bytes = 0
+        self._counts = {}              # namespace -> {"hits", "misses", "evictions"}
+
+    def _count(self, namespace, field):
+        counts = self._counts.setdefault(namespace, {"hits": 0, "misses": 0, "evictions": 0})
+        counts[field] += 1
+
+    def get(self, namespace, key, valid=None):
+        """命中返回缓存的值，否则 None；valid(value) 为 False 的条目（如 TTL 过期）按未命中计。"""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and (valid is None or valid(entry[0])):
+                self._entries.move_to_end((namespace, key))
+                self._count(namespace, "hits")
+                return entry[0]
+            self._count(namespace, "misses")
+            return None
+
+    def peek(self, namespace, key):
+        # 只看不算：不计命中率、不调整 LRU 顺序
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            return None if entry is None else entry[0]
+
+    def put(self, namespace, key, value, size=None, replace=True):
+        """放入并返回 value；replace=False 时若已有同键条目（别的会话先算好了）则返回已有的那份。"""
+        freeze(value)
+        size = nbytes(value) if size is None else size
+        with self._lock:
+            old = self._entries.get((namespace, key))
+            if old is not None and not replace:
+                self._entries.move_to_end((namespace, key))
+                return old[0]
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[(namespace, key)] = (value, size)
+            self._entries.move_to_end((namespace, key))
+            self._bytes += size
+            # LRU：超出总字节上限时从最久未用的开始淘汰，至少保留刚放入的这条
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                (evicted_ns, _), (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._count(evicted_ns, "evictions")
+        return value
+
+    def memo(self, namespace, key, compute):
+        """按 key 取共享结果，没有就 compute() 后放入；key 为 None（例如期权链快照已被淘汰）时只计算不缓存。
+
+        多个会话同时未命中会各算一次，但只保留先放入的那份，大家拿到的是同一个对象。
+        """
+        if key is None:
+            return compute()
+        value = self.get(namespace, key)
+        if value is None:
+            value = self.put(namespace, key, compute(), replace=False)
+        return value
+
+    def discard(self, match):
+        """删除 match(namespace, key) 为真的全部条目，返回删除条数。"""
+        with self._lock:
+            doomed = [k for k in self._entries if match(*k)]
+            for k in doomed:
+                self._bytes -= self._entries.pop(k)[1]
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """常驻字节、条目数、命中率：总计和按 namespace 分项。"""
+        with self._lock:
+            namespaces = {}
+            for (namespace, _), (_, size) in self._entries.items():
+                ns = namespaces.setdefault(namespace, {"entries": 0, "bytes": 0})
+                ns["entries"] += 1
+                ns["bytes"] += size
+            for namespace, counts in self._counts.items():
+                ns = namespaces.setdefault(namespace, {"entries": 0, "bytes": 0})
+                lookups = counts["hits"] + counts["misses"]
+                ns.update(counts, hit_rate=counts["hits"] / lookups if lookups else 0.0)
+            hits = sum(c["hits"] for c in self._counts.values())
+            misses = sum(c["misses"] for c in self._counts.values())
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "evictions": sum(c["evictions"] for c in self._counts.values()),
+                "namespaces": {k: namespaces[k] for k in sorted(namespaces)},
+            }
+
+
+def serve_stats(cache, port, host="127.0.0.1"):
+    """在后台线程起一个只读 HTTP 端点，GET 任意路径返回 cache.stats() 的 JSON，供监控抓取。返回 server。"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(cache.stats()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="optsim-cache-stats", daemon=True).start()
+    return server
+
+
+# 模块只会被导入一次，所以这个实例在 Streamlit 的多次 rerun 和多个会话之间共享；
+# 上限用 OPTSIM_CACHE_MB（缺省 512 MB），设置 OPTSIM_CACHE_STATS_PORT 时另起统计端点
+shared_cache = SharedCache(int(float(os.environ.get("OPTSIM_CACHE_MB", 512)) * 1024 * 1024))
+stats_server = None
+if os.environ.get("OPTSIM_CACHE_STATS_PORT"):
+    try:
+        stats_server = serve_stats(shared_cache, int(os.environ["OPTSIM_CACHE_STATS_PORT"]))
+    except OSError:
+        # 端口已被占用（例如同机另一个进程已经在提供统计），不影响缓存本身
+        pass
@@ -0,0 +1,217 @@
+"""价格区间模拟器（app.py / app2.py 的计算部分），不依赖 Streamlit，也不拉取数据。"""
+import numpy as np
+import pandas as pd
+
+from optsim.lognormal import atm_vol, lognormal_scores
+from optsim.monte_carlo import TerminalDistribution, score_legs
+from optsim.payoffs import compile_legs, payoff_extremes, payoff_values, take_payoff
+from optsim.pricing import KIND_CALL, KIND_PUT
+from optsim.quotes import as_quote_index
+from optsim.topk import top_k_indices
+
+PNL_CHUNK = 4096  # 逐块计算 Avg Return，PnL 矩阵内存上限为 PNL_CHUNK × 价格点数 × 腿数
+MC_TAIL = 0.05   # 尾部亏损取最差 5% 路径的平均盈亏
+
+# 策略模拟函数（全部以 NumPy 广播批量计算，避免逐行 iloc / 逐价格循环）
+
+
+def _chain_arrays(df, *cols):
+    return [df[c].to_numpy(dtype=float) for c in cols]
+
+
+def _spread_legs(kind, qty, strike, premium):
+    # 每组合的腿按列排好：kind/qty 为每列常量，strike/premium 为 (组合数, 腿数)
+    strike = np.column_stack(strike)
+    n, width = strike.shape
+    return {
+        "kind": np.broadcast_to(np.asarray(kind, dtype=np.int8), (n, width)),
+        "qty": np.broadcast_to(np.asarray(qty, dtype=float), (n, width)),
+        "strike": strike,
+        "premium": np.column_stack(premium),
+    }
+
+
+def _grid_avg_return(payoff, prices, basis):
+    # 价格网格上的平均收益率；标的价格不低于 0
+    prices = np.maximum(prices, 0.0)
+    avg_return = np.empty_like(basis)
+    for s in range(0, len(basis), PNL_CHUNK):
+        sl = slice(s, s + PNL_CHUNK)
+        avg_return[sl] = (payoff_values(take_payoff(payoff, sl), prices) / basis[sl, None]).mean(axis=1)
+    return avg_return
+
+
+def _short_single_avg_return(strike, credit, prices, is_put):
+    """卖出单腿在价格网格上的平均收益率，闭式求出，不生成 (候选 × 价格点) 的矩阵。
+
+    每股盈亏 = 权利金 − 内在价值，网格上内在价值的均值用排序后价格的前缀和按执行价定位：
+    put 为 Σ_{p<K}(K − p)，call 为 Σ_{p>K}(p − K)。
+    """
+    p = np.sort(np.maximum(prices, 0.0))
+    cum = np.concatenate([[0.0], np.cumsum(p)])
+    if is_put:
+        below = np.searchsorted(p, strike, side="left")
+        intrinsic = strike * below - cum[below]
+    else:
+        above = np.searchsorted(p, strike, side="right")
+        intrinsic = (cum[-1] - cum[above]) - strike * (len(p) - above)
+    return (credit - intrinsic / len(p)) / credit
+
+
+def _expected_pnl(legs, payoff, model):
+    # model 为 (现价, 波动率, 天数) 时用对数正态闭式解，为 TerminalDistribution 时用蒙特卡洛
+    if isinstance(model, TerminalDistribution):
+        return score_legs(legs, model, tail=None)["expected_pnl"]
+    return lognormal_scores(payoff, *model)["expected_pnl"]
+
+
+def _model_details(legs, payoff, best, model):
+    # 排序阶段只算期望；盈利概率（蒙特卡洛还有尾部风险）仅对前 K 个再算一次
+    if isinstance(model, TerminalDistribution):
+        picked = {key: value[best] for key, value in legs.items()}
+        return score_legs(picked, model, tail=MC_TAIL)
+    return lognormal_scores(take_payoff(payoff, best), *model)
+
+
+def _rank(legs, prices, basis, top_k, model, avg_return=None):
+    """按平均收益率（网格平均或模型期望）取前 top_k，返回 (下标, 收益率, 前 K 的盈亏曲线, 极值, 模型指标)。
+
+    avg_return 已由调用方闭式算好时直接用来排名，不再逐块计算网格盈亏。
+    """
+    payoff = compile_legs(legs, multiplier=1)
+    if model is not None:
+        avg_return = _expected_pnl(legs, payoff, model) / basis
+    elif avg_return is None:
+        avg_return = _grid_avg_return(payoff, prices, basis)
+
+    # 只为前 top_k 个保留完整 PnL 曲线；并列顺序与稳定排序一致
+    best = top_k_indices(avg_return, top_k)
+    top = take_payoff(payoff, best)
+    details = _model_details(legs, payoff, best, model) if model is not None else None
+    return best, avg_return, payoff_values(top, np.maximum(prices, 0.0)), payoff_extremes(top), details
+
+
+def _add_model_columns(rows, details):
+    if details is None:
+        return
+    for r, row in enumerate(rows):
+        row["Expected PnL"] = details["expected_pnl"][r]
+        row["Win Prob"] = details["pop"][r]
+        if "tail_loss" in details:
+            row["Tail Loss"] = details["tail_loss"][r]
+
+
+def simulate_bull_call_spreads(calls, price_range, top_k=5, model=None, invest_limit=500.0):
+    strikes, asks, bids = _chain_arrays(calls, "strike", "ask", "bid")
+    prices = np.asarray(price_range, dtype=float)
+
+    # 上三角配对 (i < j)：买入 i，卖出 j
+    buy_idx, sell_idx = np.triu_indices(len(strikes), k=1)
+    debit = asks[buy_idx] - bids[sell_idx]
+    ok = ~np.isnan(debit) & (debit > 0) & (debit <= invest_limit)
+    buy_idx, sell_idx, debit = buy_idx[ok], sell_idx[ok], debit[ok]
+    if not len(debit):
+        return []
+
+    buy_k = strikes[buy_idx]
+    sell_k = strikes[sell_idx]
+    legs = _spread_legs([KIND_CALL, KIND_CALL], [1.0, -1.0], (buy_k, sell_k), (asks[buy_idx], bids[sell_idx]))
+    best, avg_return, pnl, extremes, details = _rank(legs, prices, debit, top_k, model)
+    rows = [{
+        "Buy Strike": buy_k[k],
+        "Sell Strike": sell_k[k],
+        "Cost": debit[k],
+        "Max Profit": extremes["max_profit"][r],
+        "Breakeven": extremes["breakevens"][r, 0],
+        "Avg Return": avg_return[k],
+        "PnL": pnl[r]
+    } for r, k in enumerate(best)]
+    _add_model_columns(rows, details)
+    return rows
+
+
+def _simulate_short_singles(df, price_range, is_put, top_k, model=None, invest_limit=500.0):
+    strikes, bids = _chain_arrays(df, "strike", "bid")
+    prices = np.asarray(price_range, dtype=float)
+
+    ok = ~np.isnan(bids) & (bids > 0) & (bids <= invest_limit)
+    strike, credit = strikes[ok], bids[ok]
+    if not len(credit):
+        return []
+
+    # 卖看跌最大亏损在标的跌至 0 时取得；卖看涨理论亏损无上限（inf）
+    legs = _spread_legs([KIND_PUT if is_put else KIND_CALL], [-1.0], (strike,), (credit,))
+    # 网格评分先闭式算出全部候选的平均收益率，只为前 top_k 个生成盈亏曲线
+    grid_return = _short_single_avg_return(strike, credit, prices, is_put) if model is None else None
+    best, avg_return, pnl, extremes, details = _rank(legs, prices, credit, top_k, model, grid_return)
+    rows = [{
+        "Strike": strike[n],
+        "Credit": credit[n],
+        "Max Loss": -extremes["max_loss"][r],
+        "Breakeven": extremes["breakevens"][r, 0],
+        "Avg Return": avg_return[n],
+        "PnL": pnl[r]
+    } for r, n in enumerate(best)]
+    _add_model_columns(rows, details)
+    return rows
+
+
+def simulate_sell_puts(puts, price_range, top_k=5, model=None, invest_limit=500.0):
+    return _simulate_short_singles(puts, price_range, True, top_k, model, invest_limit)
+
+
+def simulate_sell_calls(calls, price_range, top_k=5, model=None, invest_limit=500.0):
+    return _simulate_short_singles(calls, price_range, False, top_k, model, invest_limit)
+
+
+SIMULATED_STRATEGIES = ["Bull Call Spread", "Sell Put", "Sell Call"]
+
+
+def simulate(strategy_type, calls, puts, price_range, top_k=5, model=None, invest_limit=500.0):
+    """按策略类型分派到对应模拟器，返回前 top_k 个策略的行（含 PnL 曲线）。"""
+    if strategy_type == "Bull Call Spread":
+        return simulate_bull_call_spreads(calls, price_range, top_k, model, invest_limit)
+    if strategy_type == "Sell Put":
+        return simulate_sell_puts(puts, price_range, top_k, model, invest_limit)
+    if strategy_type == "Sell Call":
+        return simulate_sell_calls(calls, price_range, top_k, model, invest_limit)
+    raise ValueError(f"unknown strategy type: {strategy_type}")
+
+
+def model_inputs(spot, expiry, calls, puts, vol=0.0):
+    # 波动率缺省取平值隐含波动率；天数按到期日计算
+    if not vol:
+        vol = atm_vol(as_quote_index(calls), as_quote_index(puts), spot)
+    days = max((pd.Timestamp(expiry) - pd.Timestamp.today().normalize()).days, 1)
+    return spot, vol, days
+
+
+def generate_strategies(options_chain, kind="call"):
+    """app2 的策略表：每个执行价的单腿买入 + 相邻执行价的牛市价差（买低卖高），列名为中文。"""
+    df = options_chain[['strike', 'lastPrice', 'impliedVolatility']].dropna()
+    strike = df['strike'].to_numpy(dtype=float)
+    price = df['lastPrice'].to_numpy(dtype=float)
+
+    # 单腿策略：买入看涨 / 看跌期权
+    singles = pd.DataFrame({
+        "策略类型": "买入看涨期权" if kind == "call" else "买入看跌期权",
+        "买入执行价": strike,
+        "卖出执行价": np.nan,
+        "成本": price,
+        "最大收益": np.nan,
+        "最大亏损": price,
+        "盈亏平衡点": strike + price if kind == "call" else strike - price,
+    })
+
+    # 牛市价差：相邻两个执行价
+    cost = price[:-1] - price[1:]
+    spreads = pd.DataFrame({
+        "策略类型": "牛市价差",
+        "买入执行价": strike[:-1],
+        "卖出执行价": strike[1:],
+        "成本": cost,
+        "最大收益": strike[1:] - strike[:-1] - cost,
+        "最大亏损": cost,
+        "盈亏平衡点": strike[:-1] + cost,
+    })
+    return pd.concat([singles, spreads], ignore_index=True)
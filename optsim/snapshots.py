@@ -0,0 +1,153 @@
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from optsim.chains import OptionChain
+
+TS_FORMAT = "%Y%m%dT%H%M%S%fZ"
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime(TS_FORMAT)
+
+
+def _history_dir(period="1d", start=None):
+    # history 按请求的窗口分目录：给了 start 时 yfinance 忽略 period，按起始日区分
+    if start is not None:
+        return "_history_from_" + pd.Timestamp(start).strftime("%Y%m%d")
+    return "_history" if period == "1d" else "_history_" + period
+
+
+class SnapshotStore:
+    """按 symbol/expiry/时间戳 存放期权链 Parquet 快照。
+
+    目录结构：
+        root/AMD/2025-08-15/20250801T143000000000Z.parquet   calls + puts（side 列区分）
+        root/AMD/_history/20250801T143000000000Z.parquet     标的 history(period="1d")
+        root/AMD/_history_1y/...、_history_from_20150101/...   其他 period / start 的 history，互不覆盖
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, symbol, expiry):
+        return os.path.join(self.root, symbol.upper(), expiry)
+
+    @staticmethod
+    def _list(path):
+        if not os.path.isdir(path):
+            return []
+        return sorted(f[:-len(".parquet")] for f in os.listdir(path) if f.endswith(".parquet"))
+
+    def _pick(self, path, at):
+        # 取 at 时刻（含）之前最新的一份，at=None 取最新
+        stamps = [t for t in self._list(path) if at is None or t <= at]
+        if not stamps:
+            raise FileNotFoundError(f"no snapshot in {path}" + (f" at or before {at}" if at else ""))
+        return os.path.join(path, stamps[-1] + ".parquet")
+
+    # ---- 写入 ----
+    def save_chain(self, symbol, expiry, chain, timestamp=None):
+        timestamp = timestamp or _now()
+        df = pd.concat([chain.calls.assign(side="call"), chain.puts.assign(side="put")], ignore_index=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"symbol": symbol.upper().encode(),
+            b"expiry": expiry.encode(),
+            b"fetched_at": timestamp.encode(),
+        })
+        path = self._dir(symbol, expiry)
+        os.makedirs(path, exist_ok=True)
+        out = os.path.join(path, timestamp + ".parquet")
+        pq.write_table(table, out)
+        return out
+
+    def save_history(self, symbol, hist, timestamp=None, period="1d", start=None):
+        path = self._dir(symbol, _history_dir(period, start))
+        os.makedirs(path, exist_ok=True)
+        out = os.path.join(path, (timestamp or _now()) + ".parquet")
+        pq.write_table(pa.Table.from_pandas(hist), out)
+        return out
+
+    # ---- 读取（memory_map 避免先整体读入再解析） ----
+    def symbols(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def expirations(self, symbol, at=None):
+        base = os.path.join(self.root, symbol.upper())
+        if not os.path.isdir(base):
+            return ()
+        return tuple(sorted(
+            d for d in os.listdir(base)
+            if not d.startswith("_") and any(at is None or t <= at for t in self._list(os.path.join(base, d)))
+        ))
+
+    def timestamps(self, symbol, expiry):
+        return self._list(self._dir(symbol, expiry))
+
+    def load_chain(self, symbol, expiry, at=None):
+        table = pq.read_table(self._pick(self._dir(symbol, expiry), at), memory_map=True)
+        df = table.to_pandas()
+        calls = df[df["side"] == "call"].drop(columns="side").reset_index(drop=True)
+        puts = df[df["side"] == "put"].drop(columns="side").reset_index(drop=True)
+        return OptionChain(calls, puts)
+
+    def load_history(self, symbol, at=None, period="1d", start=None):
+        # 只回放同一窗口录下的 history；没录过这个窗口时返回空表，而不是拿别的窗口顶替
+        try:
+            path = self._pick(self._dir(symbol, _history_dir(period, start)), at)
+        except FileNotFoundError:
+            return pd.DataFrame(columns=["Close"])
+        return pq.read_table(path, memory_map=True).to_pandas()
+
+    def ticker(self, symbol, at=None):
+        return ReplayTicker(self, symbol, at)
+
+
+class ReplayTicker:
+    """与 yf.Ticker 相同接口（options / option_chain / history），数据来自快照目录。"""
+
+    def __init__(self, store, symbol, at=None):
+        self.store = store
+        self.symbol = symbol.upper()
+        self.at = at
+
+    @property
+    def options(self):
+        return self.store.expirations(self.symbol, self.at)
+
+    def option_chain(self, expiry):
+        return self.store.load_chain(self.symbol, expiry, self.at)
+
+    def history(self, period="1d", start=None, **kwargs):
+        return self.store.load_history(self.symbol, self.at, period, start)
+
+
+class RecordingTicker:
+    """包一层真实 Ticker，每次拉到的期权链和 history 都顺手写一份快照。"""
+
+    def __init__(self, symbol, ticker, store):
+        self.symbol = symbol.upper()
+        self._ticker = ticker
+        self.store = store
+
+    @property
+    def options(self):
+        return self._ticker.options
+
+    def option_chain(self, expiry):
+        chain = self._ticker.option_chain(expiry)
+        self.store.save_chain(self.symbol, expiry, chain)
+        return chain
+
+    def history(self, period="1d", start=None, **kwargs):
+        hist = self._ticker.history(period=period, start=start, **kwargs)
+        if not hist.empty:
+            self.store.save_history(self.symbol, hist, period=period, start=start)
+        return hist
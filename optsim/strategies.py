@@ -0,0 +1,181 @@
+import numpy as np
+
+from optsim.candidates import CandidateSet
+from optsim.lognormal import atm_vol, lognormal_scores
+from optsim.payoffs import BUTTERFLIES, LEG_TEMPLATES, candidate_legs, compile_legs
+from optsim.search import _WIDTH_TOL, search_iron_condors, search_iron_condors_by_expectation, strike_pairs
+
+STRATEGY_TYPES = [
+    "Sell Put", "Sell Call", "Bull Call Spread", "Straddle",
+    "Iron Condor", "Covered Call", "Bear Put Spread",
+    "Call Butterfly", "Put Butterfly", "Call Broken Wing Butterfly", "Put Broken Wing Butterfly",
+    "Call Ratio Spread", "Put Ratio Spread"
+]
+
+# 同一条链上的多腿组合：策略 → (链, 执行价组合方式)。
+#   pairs：k1 < k2；even：k1 < k2 < k3 且两翼等宽；wide_upper / wide_lower：上翼 / 下翼更宽
+SPREAD_FAMILIES = {
+    "Bull Call Spread": ("call", "pairs"),
+    "Bear Put Spread": ("put", "pairs"),
+    "Call Butterfly": ("call", "even"),
+    "Put Butterfly": ("put", "even"),
+    "Call Broken Wing Butterfly": ("call", "wide_upper"),
+    "Put Broken Wing Butterfly": ("put", "wide_lower"),
+    "Call Ratio Spread": ("call", "pairs"),
+    "Put Ratio Spread": ("put", "pairs"),
+}
+
+# 界面上提供翼宽上限的策略（Bull Call Spread 也接受 max_wing_width，但界面沿用不限宽）
+WING_LIMITED = ["Iron Condor"] + [t for t in SPREAD_FAMILIES if t != "Bull Call Spread"]
+
+def strike_triples(strikes, max_width=None, wings="even"):
+    """蝶式的 (i, j, k) 下标，i < j < k，两翼宽度都不超过 max_width。
+
+    不做 O(n³) 的全组合：先取满足下翼宽度的 (i, j)，对称上翼 k 直接按执行价定位；
+    不对称时 k 在升序执行价上是一段连续区间，用 searchsorted 求出区间端点再展开，
+    生成的组合数只与结果规模有关。
+    """
+    i, j = strike_pairs(strikes, max_width)
+    mirror = 2 * strikes[j] - strikes[i]  # 对称上翼的执行价
+    if wings == "even":
+        pos = np.minimum(np.searchsorted(strikes, mirror - _WIDTH_TOL), len(strikes) - 1)
+        keep = np.abs(strikes[pos] - mirror) <= _WIDTH_TOL if len(strikes) else np.zeros(0, dtype=bool)
+        return i[keep], j[keep], pos[keep]
+    if wings == "wide_upper":
+        # 上翼比下翼宽，且不超过 max_width
+        lo = np.searchsorted(strikes, mirror + _WIDTH_TOL, side="left")
+        hi = (np.searchsorted(strikes, strikes[j] + max_width + _WIDTH_TOL, side="right")
+              if max_width is not None else np.full(len(j), len(strikes)))
+    elif wings == "wide_lower":
+        # 下翼比上翼宽（下翼宽度已由 (i, j) 的掩码限制）
+        lo = j + 1
+        hi = np.searchsorted(strikes, mirror - _WIDTH_TOL, side="left")
+    else:
+        raise ValueError(f"unknown wing shape: {wings}")
+    counts = np.maximum(hi - lo, 0)
+    starts = np.repeat(lo - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+    k = starts + np.arange(counts.sum())
+    return np.repeat(i, counts), np.repeat(j, counts), k
+
+
+def _spread_family(strategy_type, call_quotes, put_quotes, max_wing_width=None):
+    # 按腿模板组合同一条链的执行价：买入腿取 ask、卖出腿取 bid，任何一腿无报价的组合丢弃
+    kind, wings = SPREAD_FAMILIES[strategy_type]
+    quotes = call_quotes if kind == "call" else put_quotes
+    if wings == "pairs":
+        columns = strike_pairs(quotes.strikes, max_wing_width)
+    else:
+        columns = strike_triples(quotes.strikes, max_wing_width, wings)
+    signs = [sign for _, sign, _, _ in LEG_TEMPLATES[strategy_type]]
+    prices = np.column_stack([quotes.side(is_buy=sign > 0)[c] for c, sign in zip(columns, signs)])
+    ok = (prices > 0).all(axis=1)
+    strikes = np.column_stack([quotes.strikes[c[ok]] for c in columns])
+    return strikes, prices[ok]
+
+
+def candidate_metrics(strategy_type, strikes, prices, mult):
+    # strategy_metrics 的批量版本：返回 (cost, expected_profit)，None 用 NaN 表示
+    if strategy_type in ("Sell Put", "Sell Call"):
+        cost = prices[:, 0] * mult
+        return cost, cost
+    if strategy_type == "Bull Call Spread":
+        cost = (prices[:, 0] - prices[:, 1]) * mult
+        return cost, (strikes[:, 1] - strikes[:, 0]) * mult - cost
+    if strategy_type == "Straddle":
+        return -(prices[:, 0] + prices[:, 1]) * mult, np.full(len(prices), np.nan)  # 卖出跨式，净收取权利金
+    if strategy_type == "Iron Condor":
+        cost = (prices[:, 0] - prices[:, 1] - prices[:, 2] + prices[:, 3]) * mult
+        return cost, -cost  # 净收取的权利金即最大收益
+    if strategy_type == "Covered Call":
+        return -prices[:, 1] * mult, np.full(len(prices), np.nan)
+    if strategy_type == "Bear Put Spread":
+        cost = (prices[:, 1] - prices[:, 0]) * mult
+        return cost, (strikes[:, 1] - strikes[:, 0]) * mult - cost
+    if strategy_type in BUTTERFLIES:
+        cost = (prices[:, 0] - 2 * prices[:, 1] + prices[:, 2]) * mult
+        # 最大收益在中间执行价：看涨为下翼宽，看跌为上翼宽
+        wing = strikes[:, 1] - strikes[:, 0] if strategy_type.startswith("Call") else strikes[:, 2] - strikes[:, 1]
+        return cost, wing * mult - cost
+    if strategy_type == "Call Ratio Spread":
+        cost = (prices[:, 0] - 2 * prices[:, 1]) * mult
+        return cost, (strikes[:, 1] - strikes[:, 0]) * mult - cost
+    if strategy_type == "Put Ratio Spread":
+        cost = (prices[:, 1] - 2 * prices[:, 0]) * mult
+        return cost, (strikes[:, 1] - strikes[:, 0]) * mult - cost
+    raise ValueError(f"unknown strategy type: {strategy_type}")
+
+
+def enumerate_candidates(strategy_type, call_quotes, put_quotes, underlying_price, qty=1,
+                         max_wing_width=None, min_credit=0.0, top_k=10, days=None, vol=None, rate=0.0):
+    """按策略类型从 QuoteIndex 批量生成全部候选，返回 CandidateSet（枚举顺序与原循环一致）。
+
+    max_wing_width 同时约束 Iron Condor 的翼宽和价差 / 蝶式 / 比例价差相邻执行价的间距。
+    给出 days（距到期天数）时，expected_profit 为到期价格服从对数正态分布下的精确期望盈亏，
+    并给出盈利概率 pop；vol 缺省取平值隐含波动率，rate 为漂移（风险中性）。
+    不给 days 时沿用静态估计（价差取最大收益），Straddle / Covered Call 不参与排名。
+    """
+    if days is not None and vol is None:
+        vol = atm_vol(call_quotes, put_quotes, underlying_price)
+    if strategy_type == "Sell Put":
+        # 遍历puts单腿卖出
+        px = put_quotes.side(is_buy=False)
+        ok = px > 0
+        strikes, prices = put_quotes.strikes[ok, None], px[ok, None]
+    elif strategy_type == "Sell Call":
+        px = call_quotes.side(is_buy=False)
+        ok = px > 0
+        strikes, prices = call_quotes.strikes[ok, None], px[ok, None]
+    elif strategy_type in SPREAD_FAMILIES:
+        # 价差 / 蝶式 / 比例价差：执行价组合和宽度约束都是数组掩码（Bull Call Spread 即所有 calls 两两组合，买低卖高）
+        strikes, prices = _spread_family(strategy_type, call_quotes, put_quotes, max_wing_width)
+    elif strategy_type == "Straddle":
+        # calls和puts相同strike组合卖出（与 LEG_TEMPLATES 一致为卖出跨式，两腿都按 bid 取价）
+        common = np.intersect1d(call_quotes.strikes, put_quotes.strikes)
+        call_px = call_quotes.prices(common, is_buy=False)
+        put_px = put_quotes.prices(common, is_buy=False)
+        ok = (call_px > 0) & (put_px > 0)
+        strikes, prices = common[ok, None], np.column_stack([call_px[ok], put_px[ok]])
+    elif strategy_type == "Iron Condor":
+        # 两侧信用价差表 + 剪枝搜索，本身就只返回 top_k：给出 days 时在全部组合上按期望盈亏取，
+        # 否则按净权利金取
+        if days is not None:
+            condors = search_iron_condors_by_expectation(put_quotes, call_quotes, underlying_price, vol, days, rate,
+                                                         max_width=max_wing_width, min_credit=min_credit, top_k=top_k)
+        else:
+            condors = search_iron_condors(put_quotes, call_quotes, max_width=max_wing_width,
+                                          min_credit=min_credit, top_k=top_k)
+        strikes = np.array([c["strikes"] for c in condors], dtype=float).reshape(-1, 4)
+        prices = np.array([c["prices"] for c in condors], dtype=float).reshape(-1, 4)
+    elif strategy_type == "Covered Call":
+        # 遍历call卖出执行价，第一腿为按现价持有的正股
+        px = call_quotes.side(is_buy=False)
+        ok = px > 0
+        n = int(ok.sum())
+        strikes = np.column_stack([np.full(n, underlying_price, dtype=float), call_quotes.strikes[ok]])
+        prices = np.column_stack([np.zeros(n), px[ok]])
+    else:
+        raise ValueError(f"unknown strategy type: {strategy_type}")
+
+    cost, expected_profit = candidate_metrics(strategy_type, strikes, prices, qty * 100)
+    qtys, pop = np.full(len(cost), qty), None
+    if days is not None and len(cost):
+        payoff = compile_legs(candidate_legs(strategy_type, strikes, prices, qtys))
+        scores = lognormal_scores(payoff, underlying_price, vol, days, drift=rate)
+        expected_profit, pop = scores["expected_pnl"], scores["pop"]
+    return CandidateSet(strategy_type, strikes, prices, qtys, cost, expected_profit, pop)
+
+
+def enumerate_strategies(strategy_type, call_quotes, put_quotes, underlying_price, qty=1,
+                         top_n=10, max_wing_width=None, min_credit=0.0, with_pnl=True,
+                         days=None, vol=None, rate=0.0):
+    """按预期收益返回前 top_n 个策略（dict 形式，供展示）。
+
+    全部候选只以 CandidateSet 的列数组存在，盈亏曲线（一次广播求出）、最大盈亏、
+    盈亏平衡点和 profit_range 字符串只为最后留下的 top_n 行生成。expected_profit 为 None 的策略不参与排名。
+    """
+    if call_quotes is None or put_quotes is None:
+        return []
+    candidates = enumerate_candidates(strategy_type, call_quotes, put_quotes, underlying_price, qty,
+                                      max_wing_width=max_wing_width, min_credit=min_credit, top_k=top_n,
+                                      days=days, vol=vol, rate=rate)
+    return candidates.top(top_n).rows(underlying_price if with_pnl else None)
@@ -0,0 +1,171 @@
+"""离线合成行情：与 yf.Ticker 相同接口（options / option_chain / history），可生成任意规模的期权链。"""
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from optsim.chains import OptionChain
+from optsim.implied_vol import implied_vol
+from optsim.pricing import DAYS_PER_YEAR, bs_price
+
+TRADING_DAYS = 252
+HISTORY_YEARS = 10  # 每个标的只生成一条 10 年日线，各 period 都从它的末尾截取，彼此一致
+
+_PERIOD_UNITS = {"d": 1, "wk": 5, "mo": 21, "y": TRADING_DAYS}
+
+
+def _period_days(period):
+    # yfinance 的 period 写法（1d / 5d / 1mo / 6mo / 1y / ytd / max）换算成交易日数
+    if period == "max":
+        return HISTORY_YEARS * TRADING_DAYS
+    if period == "ytd":
+        today = date.today()
+        return max(int((today - date(today.year, 1, 1)).days * TRADING_DAYS / 365), 1)
+    for unit, days in _PERIOD_UNITS.items():
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return int(period[:-len(unit)]) * days
+    raise ValueError(f"unsupported period: {period}")
+
+
+class SyntheticMarket:
+    """按参数生成期权链的离线行情源；同一 (symbol, expiry) 每次生成的链完全相同。
+
+    理论价格取两个对数正态分布（远期之和等于真实远期）的等权混合：混合密度本身就是
+    一个合法的风险中性分布，所以各执行价的看涨 / 看跌价格天然满足单调、凸性和平价关系；
+    两个分量的波动率不同产生微笑（smile），均值错开产生偏斜（skew）。bid 向下、ask 向上
+    取整到分，报价区间始终包住无套利价格。
+    """
+
+    def __init__(self, spot=150.0, n_strikes=150, strike_range=(0.5, 1.5), expiry_days=(7, 14, 30, 60, 90, 180),
+                 vol=0.4, smile=0.3, skew=0.05, spread=0.03, nan_frac=0.0, rate=0.0, seed=0, today=None,
+                 requote_frac=0.0):
+        self.spot = spot  # 数值，或 {symbol: 现价}
+        self.n_strikes = n_strikes
+        self.strike_range = strike_range
+        self.expiry_days = tuple(expiry_days)
+        self.vol = vol
+        self.smile = smile
+        self.skew = skew
+        self.spread = spread
+        self.nan_frac = nan_frac
+        self.rate = rate
+        self.seed = seed
+        self.today = today
+        # 盘中刷新：之后每次拉同一条链，约 requote_frac 比例的执行价重新报价（bid/ask 变、理论价不变）
+        self.requote_frac = requote_frac
+        self._ticks = {}
+        self._history = {}
+
+    def spot_for(self, symbol):
+        return float(self.spot[symbol] if isinstance(self.spot, dict) else self.spot)
+
+    def expirations(self):
+        today = self.today or date.today()
+        return tuple((today + timedelta(days=d)).isoformat() for d in self.expiry_days)
+
+    def ticker(self, symbol):
+        return SyntheticTicker(self, symbol)
+
+    def _rng(self, *parts):
+        return np.random.default_rng([self.seed, *(zlib.crc32(str(p).encode()) for p in parts)])
+
+    def theoretical(self, spot, strikes, years, is_call):
+        # 两个分量：高波动率分量远期偏低、低波动率分量远期偏高，等权后远期不变
+        hi = bs_price(spot * (1 - self.skew), strikes, years, self.vol * (1 + self.smile), is_call, self.rate)
+        lo = bs_price(spot * (1 + self.skew), strikes, years, self.vol * (1 - self.smile), is_call, self.rate)
+        return 0.5 * (hi + lo)
+
+    def option_chain(self, symbol, expiry):
+        spot = self.spot_for(symbol)
+        today = self.today or date.today()
+        expiry_date = date.fromisoformat(expiry)
+        years = max((expiry_date - today).days, 0) / DAYS_PER_YEAR
+        lo, hi = self.strike_range
+        strikes = np.unique(np.round(np.linspace(spot * lo, spot * hi, self.n_strikes), 2))
+        tag = expiry_date.strftime("%y%m%d")
+        self._ticks[(symbol, expiry)] = tick = self._ticks.get((symbol, expiry), -1) + 1
+        return OptionChain(
+            self._side(symbol, expiry, tag, spot, strikes, years, True, tick),
+            self._side(symbol, expiry, tag, spot, strikes, years, False, tick),
+        )
+
+    def _side(self, symbol, expiry, tag, spot, strikes, years, is_call, tick=0):
+        rng = self._rng(symbol, expiry, is_call)
+        n = len(strikes)
+        fair = self.theoretical(spot, strikes, years, is_call)
+        iv, _ = implied_vol(fair, spot, strikes, years, is_call, self.rate)
+
+        half = np.maximum(self.spread * fair, 0.01) * (0.25 + 0.5 * rng.random(n))
+        if self.requote_frac and tick:
+            # 每次刷新独立抽取重新报价的执行价，其余执行价的报价与第一次完全相同
+            requote = self._rng(symbol, expiry, is_call, "tick", tick)
+            moved = requote.random(n) < self.requote_frac
+            half[moved] = np.maximum(self.spread * fair[moved], 0.01) * (0.25 + 0.5 * requote.random(int(moved.sum())))
+        bid = np.maximum(np.floor((fair - half) * 100) / 100, 0.0)
+        ask = np.ceil((fair + half) * 100) / 100
+        last = np.round(bid + (ask - bid) * rng.random(n), 2)
+        # 成交量 / 持仓量集中在平值附近
+        activity = 1000 * np.exp(-((strikes / spot - 1) / 0.15) ** 2) + 5
+        volume = rng.poisson(activity).astype(float)
+        open_interest = rng.poisson(5 * activity).astype(float)
+
+        # 模拟 Yahoo 的缺失报价：按 nan_frac 随机置空
+        if self.nan_frac:
+            quote_gap = rng.random(n) < self.nan_frac
+            bid[quote_gap] = ask[quote_gap] = np.nan
+            iv = np.where(rng.random(n) < self.nan_frac, np.nan, iv)
+            volume[rng.random(n) < self.nan_frac] = np.nan
+
+        side = "C" if is_call else "P"
+        return pd.DataFrame({
+            "contractSymbol": [f"{symbol}{tag}{side}{round(k * 1000):08d}" for k in strikes],
+            "strike": strikes,
+            "lastPrice": last,
+            "bid": bid,
+            "ask": ask,
+            "volume": volume,
+            "openInterest": open_interest,
+            "impliedVolatility": iv,
+            "inTheMoney": strikes < spot if is_call else strikes > spot,
+        })
+
+    def history(self, symbol, period="1d", start=None, end=None):
+        """日线：几何布朗运动，最后一个收盘价等于 spot。"""
+        if symbol not in self._history:
+            n = HISTORY_YEARS * TRADING_DAYS
+            rng = self._rng(symbol, "history")
+            steps = rng.normal(-0.5 * self.vol ** 2 / TRADING_DAYS, self.vol / np.sqrt(TRADING_DAYS), n - 1)
+            close = self.spot_for(symbol) * np.exp(-np.concatenate([np.cumsum(steps[::-1])[::-1], [0.0]]))
+            open_ = close * np.exp(rng.normal(0, 0.2 * self.vol / np.sqrt(TRADING_DAYS), n))
+            wick = np.abs(rng.normal(0, 0.5 * self.vol / np.sqrt(TRADING_DAYS), (2, n)))
+            index = pd.bdate_range(end=self.today or date.today(), periods=n, name="Date")
+            self._history[symbol] = pd.DataFrame({
+                "Open": open_,
+                "High": np.maximum(open_, close) * np.exp(wick[0]),
+                "Low": np.minimum(open_, close) * np.exp(-wick[1]),
+                "Close": close,
+                "Volume": rng.poisson(5e6, n).astype(float),
+            }, index=index)
+        hist = self._history[symbol]
+        if start is not None or end is not None:
+            return hist.loc[start:end]
+        return hist.iloc[-_period_days(period):]
+
+
+class SyntheticTicker:
+    """SyntheticMarket 中单个标的的 yf.Ticker 替身。"""
+
+    def __init__(self, market, symbol):
+        self.market = market
+        self.symbol = symbol.upper()
+
+    @property
+    def options(self):
+        return self.market.expirations()
+
+    def option_chain(self, expiry):
+        return self.market.option_chain(self.symbol, expiry)
+
+    def history(self, period="1d", start=None, end=None, **kwargs):
+        return self.market.history(self.symbol, period, start, end)
@@ -0,0 +1,141 @@
+"""跨到期日的时间价差扫描：近月卖出、远月买入，同执行价为日历价差（calendar），执行价错开为对角价差（diagonal）。"""
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from optsim.chains import default_cache
+from optsim.loader import load_chains
+from optsim.lognormal import atm_vol
+from optsim.monte_carlo import TerminalDistribution
+from optsim.pricing import DAYS_PER_YEAR, bs_price
+from optsim.quotes import QuoteIndex
+from optsim.topk import top_k_indices
+
+# 一个到期日的期权链：calls / puts 为 QuoteIndex，整个扫描里每个到期日只建一次
+TermChain = namedtuple("TermChain", ["expiry", "days", "calls", "puts"])
+
+TIME_SPREAD_COLUMNS = ["type", "kind", "front_expiry", "back_expiry", "front_strike", "back_strike",
+                       "short_price", "long_price", "back_vol", "cost", "expected_profit", "pop"]
+
+_OFFSET_TOL = 1e-6
+
+
+def load_term_chains(symbol, min_days=1, max_days=None, cache=None, **kwargs):
+    """按 ticker.options 取 [min_days, max_days] 内的全部到期日，并发拉取一次，返回 (按天数升序的 TermChain 列表, 失败的到期日)。
+
+    之后所有前后月配对都复用这些 QuoteIndex，不会按配对重复拉链。
+    """
+    cache = cache or default_cache
+    today = date.today()
+    days = {e: (date.fromisoformat(e) - today).days for e in cache.expirations(symbol)}
+    expiries = [e for e, d in days.items() if d >= min_days and (max_days is None or d <= max_days)]
+    df = load_chains(symbol, expiries, cache=cache, **kwargs)
+    chains = []
+    for expiry, group in df.groupby("expiry", sort=False):
+        chains.append(TermChain(expiry, days[expiry], QuoteIndex(group[group["side"] == "call"]),
+                                QuoteIndex(group[group["side"] == "put"])))
+    chains.sort(key=lambda c: c.days)
+    return chains, df.attrs["errors"]
+
+
+def time_spread_values(spots, front_strike, back_strike, back_vol, years_left, is_call, rate=0.0):
+    """近月到期时每股的持仓价值：远月多头的 Black-Scholes 价值 − 近月空头的内在价值。
+
+    spots 为 (价格点,)，其余为 (配对,)；返回 (配对, 价格点)。
+    """
+    spots = np.asarray(spots, dtype=float)[None, :]
+    front_strike = np.asarray(front_strike, dtype=float)[:, None]
+    intrinsic = np.maximum(spots - front_strike, 0.0) if is_call else np.maximum(front_strike - spots, 0.0)
+    back = bs_price(spots, np.asarray(back_strike, dtype=float)[:, None], np.asarray(years_left, dtype=float)[:, None],
+                    np.asarray(back_vol, dtype=float)[:, None], is_call, rate)
+    return back - intrinsic
+
+
+def _pair_strikes(front, back, max_offset):
+    # 前后月执行价两两配对，|K远 − K近| ≤ max_offset 用掩码筛出；max_offset=0 即同执行价的日历价差
+    offset = back.strikes[None, :] - front.strikes[:, None]
+    fi, bi = np.nonzero(np.abs(offset) <= max_offset + _OFFSET_TOL)
+    short_px, long_px = front.side(is_buy=False)[fi], back.side(is_buy=True)[bi]
+    ok = (short_px > 0) & (long_px > 0)
+    return fi[ok], bi[ok], short_px[ok], long_px[ok]
+
+
+def scan_time_spreads(chains, spot, kind="call", max_offset=0.0, top_k=20, qty=1, rate=0.0,
+                      n_points=256, memory_budget=64 * 1024 * 1024):
+    """在所有 (近月, 远月) 到期日组合上枚举时间价差，按近月到期时的期望盈亏取前 top_k，返回 DataFrame。
+
+    近月到期时的标的价格取对数正态分布（近月平值 IV），用等概率网格求期望和盈利概率；远月腿
+    按其执行价在远月链上的 IV（缺失时用远月平值 IV）以 Black-Scholes 估值。每对到期日的全部
+    执行价配对一次性向量化打分，(配对 × 网格) 的中间矩阵按 memory_budget 分块。
+    """
+    is_call = kind == "call"
+    per_pair = 3 * n_points * 8  # 取出的远月价值、近月内在价值、盈亏各一行
+    chunk = max(int(memory_budget // per_pair), 1)
+    blocks = []
+    for a, front in enumerate(chains):
+        front_quotes = front.calls if is_call else front.puts
+        if not len(front_quotes):
+            continue
+        dist = TerminalDistribution.lognormal_grid(spot, atm_vol(front.calls, front.puts, spot), front.days,
+                                                   n_points, rate)
+        for back in chains[a + 1:]:
+            back_quotes = back.calls if is_call else back.puts
+            if back.days <= front.days or not len(back_quotes):
+                continue
+            fi, bi, short_px, long_px = _pair_strikes(front_quotes, back_quotes, max_offset)
+            if not len(fi):
+                continue
+            front_strike, back_strike = front_quotes.strikes[fi], back_quotes.strikes[bi]
+            vols = np.where(np.isfinite(back_quotes.iv) & (back_quotes.iv > 0), back_quotes.iv,
+                            atm_vol(back.calls, back.puts, spot))
+            back_vol = vols[bi]
+            cost = (long_px - short_px) * qty * 100
+            # 远月腿价值只取决于远月执行价，先按执行价 × 网格算一次，各配对按下标取用（对角价差里
+            # 一个远月执行价会和多个近月执行价配对）；近月内在价值同理
+            back_value = bs_price(dist.prices[None, :], back_quotes.strikes[:, None],
+                                  (back.days - front.days) / DAYS_PER_YEAR, vols[:, None], is_call, rate)
+            front_value = np.maximum((dist.prices[None, :] - front_quotes.strikes[:, None]) * (1 if is_call else -1), 0.0)
+            expected = np.empty(len(fi))
+            pop = np.empty(len(fi))
+            for start in range(0, len(fi), chunk):
+                part = slice(start, start + chunk)
+                pnl = (back_value[bi[part]] - front_value[fi[part]]) * qty * 100 - cost[part, None]
+                expected[part] = pnl.mean(axis=1)
+                pop[part] = (pnl > 1e-9 * (1 + np.abs(cost[part, None]))).mean(axis=1)
+            blocks.append(pd.DataFrame({
+                "type": np.where(np.abs(back_strike - front_strike) <= _OFFSET_TOL, "Calendar", "Diagonal"),
+                "kind": kind,
+                "front_expiry": front.expiry,
+                "back_expiry": back.expiry,
+                "front_strike": front_strike,
+                "back_strike": back_strike,
+                "short_price": short_px,
+                "long_price": long_px,
+                "back_vol": back_vol,
+                "cost": cost,
+                "expected_profit": expected,
+                "pop": pop,
+            }))
+    if not blocks:
+        return pd.DataFrame(columns=TIME_SPREAD_COLUMNS)
+    found = pd.concat(blocks, ignore_index=True)
+    ranked = found.iloc[top_k_indices(found["expected_profit"].to_numpy(), top_k)].reset_index(drop=True)
+    ranked.attrs["candidates"] = len(found)
+    return ranked
+
+
+def time_spread_curves(ranked, chains, spots, qty=1, rate=0.0):
+    """ranked 各行在近月到期时的盈亏曲线 (行, 价格点)，供画图。"""
+    days = {c.expiry: c.days for c in chains}
+    years_left = np.array([(days[b] - days[f]) / DAYS_PER_YEAR
+                           for f, b in zip(ranked["front_expiry"], ranked["back_expiry"])])
+    curves = np.empty((len(ranked), len(spots)))
+    for kind in ("call", "put"):
+        rows = (ranked["kind"] == kind).to_numpy()
+        if rows.any():
+            value = time_spread_values(spots, ranked["front_strike"].to_numpy()[rows], ranked["back_strike"].to_numpy()[rows],
+                                       ranked["back_vol"].to_numpy()[rows], years_left[rows], kind == "call", rate)
+            curves[rows] = value * qty * 100 - ranked["cost"].to_numpy()[rows, None]
+    return curves
@@ -0,0 +1,55 @@
+import heapq
+
+import numpy as np
+
+
+def top_k_indices(scores, k):
+    """scores 中最大的 k 个下标，按分数降序；并列时小下标在前（与稳定排序一致）。
+
+    用 np.partition 找第 k 大的分界值，只对入选的 k 个排序，O(n + k log k)。
+    NaN 视为最差。
+    """
+    scores = np.asarray(scores, dtype=float)
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    threshold = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+    idx = np.concatenate([above, ties])
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+
+class TopK:
+    """流式 top-k：逐个 push (分数, 数据)，内存始终 O(k)。并列时先 push 的排前面。"""
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def would_accept(self, score):
+        # 先判断再构造数据，被淘汰的候选就不必创建
+        if self.k <= 0:
+            return False
+        return len(self._heap) < self.k or score > self._heap[0][0]
+
+    def push(self, score, item):
+        if not self.would_accept(score):
+            return False
+        self._seq += 1
+        entry = (score, -self._seq, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+        return True
+
+    def items(self):
+        return [item for _, _, item in sorted(self._heap, key=lambda e: (-e[0], -e[1]))]